@@ -7,7 +7,6 @@ with open('README.rst') as f:
     long_description = f.read()
 
 install_requires = [
-    'paramiko >=1.10, <2',
     'sr.comp >=1.0, <2',
     'reportlab >=3.1.44, <4',
     'requests >=2.5.1, <3',
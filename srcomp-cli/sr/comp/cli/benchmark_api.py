@@ -0,0 +1,452 @@
+"""
+Load test the competition HTTP API with the requests real clients make.
+
+A number of simulated clients of each kind are run concurrently:
+
+* stream clients, which behave like ``srcomp-stream``: polling ``/state``
+  twice a second and ``/current`` every two seconds, and fetching the teams,
+  matches, last scored match, knockouts and tiebreaker whenever the state
+  changes;
+* screen clients, which behave like the ``srcomp-screens`` displays: every
+  five seconds fetching ``/current``, the upcoming matches in an arena and
+  the teams, and every thirty seconds the knockouts, config, arenas and
+  corners.
+
+Meanwhile, like the scorer does when scores are entered, the compstate's
+update file is touched periodically, which makes the API reload it.
+
+The API is served in-process from the Flask application, or can be any
+running server (in any of its serving modes) given by ``--url``, so long as
+it is serving the given compstate. Throughput, latency percentiles by route
+and the latencies of requests made in the wake of each reload (where
+requests stall behind the reload) are reported.
+"""
+
+from __future__ import print_function, division
+
+
+STREAM_STATE_PERIOD = 0.5
+STREAM_CURRENT_PERIOD = 2
+STREAM_RELOAD_PATHS = ('/teams', '/matches', '/matches/last_scored',
+                       '/knockout', '/tiebreaker')
+
+SCREEN_PERIOD = 5
+SCREEN_SLOW_PERIOD = 30
+SCREEN_SLOW_PATHS = ('/knockout', '/config', '/arenas', '/corners')
+
+STALL_WINDOW = 10
+"""How long, in seconds, after each reload is triggered to attribute the
+latency of requests to it."""
+
+
+class LocalTransport(object):
+    """Makes requests of the Flask application, in-process."""
+
+    def __init__(self, compstate):
+        try:
+            from sr.comp.http import app
+        except ImportError:
+            print("sr.comp.http not installed.")
+            exit(1)
+
+        app.config['COMPSTATE'] = compstate
+        self.app = app
+
+    def client(self):
+        """Get a function which gets a path, for use by a single thread."""
+        client = self.app.test_client()
+
+        def get(path):
+            response = client.get(path)
+            return response.status_code, response.get_data()
+
+        return get
+
+
+class HTTPTransport(object):
+    """Makes requests of a running server."""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def client(self):
+        """Get a function which gets a path, for use by a single thread."""
+        import requests
+
+        session = requests.Session()
+
+        def get(path):
+            response = session.get(self.url + path)
+            return response.status_code, response.content
+
+        return get
+
+
+class Recorder(object):
+    """Collects the outcome of each request, from many threads."""
+
+    def __init__(self, timer):
+        import threading
+
+        self.timer = timer
+        self.start = timer()
+        self.requests = []
+        """The (start, route, latency, ok) of each request, with times in
+        seconds relative to the start of the run."""
+
+        self.reloads = []
+        """The times, relative to the start of the run, at which reloads
+        were triggered."""
+
+        self._lock = threading.Lock()
+
+    def elapsed(self):
+        return self.timer() - self.start
+
+    def get(self, get, path):
+        """
+        Get the given path using the given client, recording the request.
+
+        :return: The decoded JSON body of the response, or ``None`` if the
+                 request wasn't successful.
+        """
+        import json
+
+        start = self.timer()
+        try:
+            status, body = get(path)
+        except Exception:
+            status = None
+        latency = self.timer() - start
+
+        # Client errors are expected, such as when there's no tiebreaker
+        ok = status is not None and status < 500
+
+        route = path.split('?')[0]
+        with self._lock:
+            self.requests.append((start - self.start, route, latency, ok))
+
+        if status != 200:
+            return None
+        return json.loads(body.decode('utf-8'))
+
+    def record_reload(self):
+        with self._lock:
+            self.reloads.append(self.elapsed())
+
+
+def run_periodically(stop, timer, tasks):
+    """
+    Run each of the given tasks at its own period until ``stop`` is set.
+    Each task first runs at a random point within its period, so that
+    clients started together don't make their requests in lockstep.
+
+    :param tasks: A list of pairs of a period (in seconds) and a callable.
+    """
+    import random
+
+    start = timer()
+    due = [start + random.random() * period for period, _ in tasks]
+    while not stop.is_set():
+        now = timer()
+        for n, (period, task) in enumerate(tasks):
+            if now >= due[n]:
+                task()
+                due[n] += period
+        stop.wait(max(0, min(due) - timer()))
+
+
+def stream_client(transport, recorder, stop, speed):
+    """Behave like an ``srcomp-stream`` instance until ``stop`` is set."""
+    get = transport.client()
+    known = {'state': None}
+
+    def poll_state():
+        result = recorder.get(get, '/state')
+        if result is not None and result['state'] != known['state']:
+            known['state'] = result['state']
+            for path in STREAM_RELOAD_PATHS:
+                recorder.get(get, path)
+
+    def poll_current():
+        recorder.get(get, '/current')
+
+    run_periodically(stop, recorder.timer,
+                     [(STREAM_STATE_PERIOD / speed, poll_state),
+                      (STREAM_CURRENT_PERIOD / speed, poll_current)])
+
+
+def screen_client(transport, recorder, stop, speed, arena):
+    """
+    Behave like an ``srcomp-screens`` display for the given arena until
+    ``stop`` is set.
+    """
+    import datetime
+
+    from dateutil.tz import tzlocal
+    from six.moves.urllib.parse import urlencode
+
+    get = transport.client()
+
+    def poll():
+        now = datetime.datetime.now(tzlocal()).replace(microsecond=0)
+        query = urlencode({'slot_start_time': now.isoformat() + '..',
+                           'arena': arena})
+        recorder.get(get, '/current')
+        recorder.get(get, '/matches?' + query)
+        recorder.get(get, '/teams')
+
+    def poll_slow():
+        for path in SCREEN_SLOW_PATHS:
+            recorder.get(get, path)
+
+    run_periodically(stop, recorder.timer,
+                     [(SCREEN_PERIOD / speed, poll),
+                      (SCREEN_SLOW_PERIOD / speed, poll_slow)])
+
+
+def trigger_reload(compstate, commit):
+    """
+    Make the API reload the compstate, as the scorer does after entering a
+    score. If ``commit`` is set, first make an (empty) commit so that the
+    state changes.
+    """
+    import os.path
+    import subprocess
+
+    if commit:
+        subprocess.check_call(('git', '-c', 'user.name=SRComp',
+                               '-c', 'user.email=srcomp@localhost',
+                               'commit', '--quiet', '--allow-empty',
+                               '-m', 'Load test'), cwd=compstate)
+
+    with open(os.path.join(compstate, '.update-pls'), 'w'):
+        pass
+
+
+def percentile(values, fraction):
+    """Get the given percentile (as a fraction) of sorted values."""
+    if not values:
+        return None
+    index = min(len(values) - 1, int(fraction * len(values)))
+    return values[index]
+
+
+def summarise_latencies(latencies):
+    latencies = sorted(latencies)
+    return {
+        'count': len(latencies),
+        'p50': percentile(latencies, 0.5),
+        'p90': percentile(latencies, 0.9),
+        'p99': percentile(latencies, 0.99),
+        'max': latencies[-1] if latencies else None,
+    }
+
+
+def summarise(recorder, duration, stall_window=STALL_WINDOW):
+    """
+    Summarise the requests made during a run.
+
+    The requests started within ``stall_window`` seconds after a reload was
+    triggered (and before the next) are attributed to that reload.
+    """
+    requests = recorder.requests
+    routes = sorted(set(route for _, route, _, _ in requests))
+
+    windows = []
+    for n, reload_time in enumerate(recorder.reloads):
+        end = reload_time + stall_window
+        if n + 1 < len(recorder.reloads):
+            end = min(end, recorder.reloads[n + 1])
+        windows.append((reload_time, end))
+
+    def in_window(start, window):
+        return window[0] <= start < window[1]
+
+    reloads = []
+    for window in windows:
+        summary = summarise_latencies([latency
+                                       for start, _, latency, _ in requests
+                                       if in_window(start, window)])
+        summary['time'] = window[0]
+        reloads.append(summary)
+
+    steady = [latency for start, _, latency, _ in requests
+              if not any(in_window(start, window) for window in windows)]
+
+    return {
+        'duration': duration,
+        'requests': len(requests),
+        'errors': sum(1 for _, _, _, ok in requests if not ok),
+        'throughput': len(requests) / duration,
+        'latency': summarise_latencies([r[2] for r in requests]),
+        'routes': {route: summarise_latencies([latency
+                                               for _, r, latency, _ in requests
+                                               if r == route])
+                   for route in routes},
+        'steady': summarise_latencies(steady),
+        'reloads': reloads,
+    }
+
+
+def format_summary(summary):
+    def ms(value):
+        return '-' if value is None else '{0:.1f}'.format(value * 1000)
+
+    def row(label, latencies):
+        return '{0:<24} {1:>7} {2:>8} {3:>8} {4:>8} {5:>8}'.format(
+            label, latencies['count'], ms(latencies['p50']),
+            ms(latencies['p90']), ms(latencies['p99']), ms(latencies['max']))
+
+    lines = [
+        '{0} requests in {1:.0f}s ({2:.1f}/s), {3} server errors'.format(
+            summary['requests'], summary['duration'], summary['throughput'],
+            summary['errors']),
+        '',
+        '{0:<24} {1:>7} {2:>8} {3:>8} {4:>8} {5:>8}'.format(
+            'latency (ms)', 'count', 'p50', 'p90', 'p99', 'max'),
+        row('all', summary['latency']),
+        row('outside reloads', summary['steady']),
+    ]
+    for reload_summary in summary['reloads']:
+        lines.append(row('reload at {0:.1f}s'.format(reload_summary['time']),
+                         reload_summary))
+    lines.append('')
+    for route, latencies in sorted(summary['routes'].items()):
+        lines.append(row(route, latencies))
+    return '\n'.join(lines)
+
+
+def run(transport, compstate, arenas, duration, streams, screens,
+        reload_period, commit, speed=1):
+    """
+    Run the simulated clients against the given transport.
+
+    :return: The :class:`Recorder` of the run.
+    """
+    import itertools
+    import threading
+
+    from sr.comp.cli.benchmark_schedulers import get_timer
+
+    timer = get_timer()
+    recorder = Recorder(timer)
+    stop = threading.Event()
+
+    threads = []
+    for _ in range(streams):
+        threads.append(threading.Thread(
+            target=stream_client, args=(transport, recorder, stop, speed)))
+    arena_cycle = itertools.cycle(arenas)
+    for _ in range(screens):
+        threads.append(threading.Thread(
+            target=screen_client,
+            args=(transport, recorder, stop, speed, next(arena_cycle))))
+
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    try:
+        next_reload = reload_period
+        while recorder.elapsed() < duration:
+            if reload_period and recorder.elapsed() >= next_reload:
+                trigger_reload(compstate, commit)
+                recorder.record_reload()
+                next_reload += reload_period
+            stop.wait(min(0.1, max(0, duration - recorder.elapsed())))
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    return recorder
+
+
+def command(settings):
+    import json
+    import os.path
+    import shutil
+    import tempfile
+
+    from sr.comp import yaml_loader
+    from sr.comp.cli.synthetic_compstate import generate
+
+    if (settings.compstate is None) == (settings.synthetic is None):
+        print("Exactly one of a compstate or --synthetic must be given.")
+        exit(1)
+
+    work_dir = None
+    commit = settings.commit
+    compstate = settings.compstate
+    if settings.synthetic is not None:
+        work_dir = tempfile.mkdtemp(prefix='srcomp-bench-api-')
+        compstate = os.path.join(work_dir, 'compstate')
+        generate(compstate, num_teams=settings.synthetic,
+                 num_arenas=settings.arenas)
+        # It's ours to change
+        commit = True
+
+    try:
+        arenas = sorted(yaml_loader.load(os.path.join(compstate,
+                                                      'arenas.yaml'))['arenas'])
+
+        if settings.url:
+            transport = HTTPTransport(settings.url)
+        else:
+            transport = LocalTransport(os.path.abspath(compstate))
+
+        recorder = run(transport, compstate, arenas,
+                       duration=settings.duration,
+                       streams=settings.streams,
+                       screens=settings.screens,
+                       reload_period=settings.reload_period,
+                       commit=commit,
+                       speed=settings.speed)
+        summary = summarise(recorder, settings.duration)
+    finally:
+        if work_dir is not None:
+            shutil.rmtree(work_dir)
+
+    if settings.json:
+        print(json.dumps(summary, indent=2, sort_keys=True))
+    else:
+        print(format_summary(summary))
+
+
+def add_subparser(subparsers):
+    help_msg = 'Load test the HTTP API with a realistic mix of clients'
+    parser = subparsers.add_parser('benchmark-api', help=help_msg,
+                                   description=__doc__.strip())
+    parser.add_argument('compstate', nargs='?',
+                        help='competition state repository being served')
+    parser.add_argument('--synthetic', type=int, metavar='TEAMS',
+                        help='generate a synthetic compstate with this many '
+                             'teams to use instead')
+    parser.add_argument('-a', '--arenas', type=int, default=2,
+                        help='number of arenas in the synthetic compstate '
+                             '(default: %(default)s)')
+    parser.add_argument('-u', '--url',
+                        help='URL of a running server to test, rather than '
+                             'serving the API in-process')
+    parser.add_argument('-d', '--duration', type=float, default=60,
+                        help='seconds to run for (default: %(default)s)')
+    parser.add_argument('-s', '--streams', type=int, default=4,
+                        help='number of srcomp-stream clients '
+                             '(default: %(default)s)')
+    parser.add_argument('-c', '--screens', type=int, default=16,
+                        help='number of srcomp-screens clients '
+                             '(default: %(default)s)')
+    parser.add_argument('-r', '--reload-period', type=float, default=15,
+                        help='seconds between triggering reloads, or 0 for '
+                             'none (default: %(default)s)')
+    parser.add_argument('--commit', action='store_true',
+                        help='make an empty commit in the compstate before '
+                             'each reload, so that its state changes '
+                             '(always done for synthetic compstates)')
+    parser.add_argument('--speed', type=float, default=1,
+                        help='multiplier for the rate at which clients make '
+                             'requests (default: %(default)s)')
+    parser.add_argument('--json', action='store_true',
+                        help='output the results as JSON')
+    parser.set_defaults(func=command)
@@ -0,0 +1,395 @@
+"""
+Benchmark the schedulers against synthetic competitions.
+
+Each of the scheduling engines is run against generated compstates of
+various sizes, recording the wall time and peak memory allocation of each
+run. Results are emitted as JSON so that they can be compared between
+releases.
+"""
+
+from __future__ import print_function, division
+
+
+ENGINES = ('league', 'knockout', 'static', 'import')
+DEFAULT_TEAMS = (16, 64, 256, 1000)
+DEFAULT_ARENAS = (1, 2, 4)
+TEAMS_PER_GAME = 4
+
+
+def get_timer():
+    import time
+
+    try:
+        return time.perf_counter
+    except AttributeError:
+        # Python 2
+        return time.time
+
+
+def measure(func, repeat, setup=None):
+    """
+    Run ``func`` ``repeat`` times, measuring the wall time of each run and
+    the peak memory allocated during the first.
+
+    :param func: A callable which does the work to be measured. It may
+                 return a :class:`dict` of extra information about the run,
+                 which is included in the result.
+    :param int repeat: The number of times to run ``func``.
+    :param setup: An optional callable, run (without being measured) before
+                  each run of ``func``. Its return value is passed to
+                  ``func`` as its only argument.
+    :return: A :class:`dict` of measurements.
+    """
+
+    try:
+        import tracemalloc
+    except ImportError:
+        # Python 2
+        tracemalloc = None
+
+    timer = get_timer()
+    times = []
+    peak_memory = None
+    extra = None
+
+    for n in range(repeat):
+        args = () if setup is None else (setup(),)
+
+        if tracemalloc is not None and n == 0:
+            tracemalloc.start()
+
+        start = timer()
+        info = func(*args)
+        times.append(timer() - start)
+
+        if tracemalloc is not None and n == 0:
+            _, peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        if extra is None:
+            extra = info
+
+    times.sort()
+    result = {
+        'wall_time': {
+            'min': times[0],
+            'median': times[len(times) // 2],
+            'max': times[-1],
+            'runs': len(times),
+        },
+        'peak_memory': peak_memory,
+    }
+    if extra:
+        result.update(extra)
+    return result
+
+
+def load_config(compstate):
+    import os.path
+
+    from sr.comp import yaml_loader
+
+    return yaml_loader.load(os.path.join(compstate, 'schedule.yaml'))
+
+
+def bench_league(compstate, repeat):
+    import os.path
+    import random
+
+    from sr.comp.cli.league_scheduler import Scheduler
+    from sr.comp.cli.schedule_league import max_possible_match_periods
+    from sr.comp import yaml_loader
+
+    arenas_db = yaml_loader.load(os.path.join(compstate, 'arenas.yaml'))
+    arenas = sorted(arenas_db['arenas'].keys())
+    num_corners = len(arenas_db['corners'])
+    teams = sorted(yaml_loader.load(os.path.join(compstate,
+                                                 'teams.yaml'))['teams'].keys())
+
+    max_periods = max_possible_match_periods(load_config(compstate))
+
+    def run():
+        scheduler = Scheduler(teams=teams,
+                              max_match_periods=max_periods,
+                              arenas=arenas,
+                              num_corners=num_corners,
+                              random=random.Random(0))
+        scheduler.run()
+        return {'attempts_per_round': scheduler.round_attempts}
+
+    return measure(run, repeat)
+
+
+def _load_for_knockouts(compstate):
+    import os.path
+
+    from sr.comp import arenas, scores, teams, yaml_loader
+    from sr.comp.comp import load_scorer
+
+    comp_teams = teams.load_teams(os.path.join(compstate, 'teams.yaml'))
+    comp_scores = scores.Scores(compstate, comp_teams.keys(),
+                                load_scorer(compstate))
+    comp_arenas = arenas.load_arenas(os.path.join(compstate, 'arenas.yaml'))
+    league = yaml_loader.load(os.path.join(compstate, 'league.yaml'))['matches']
+    return comp_teams, comp_scores, comp_arenas, league
+
+
+def _bench_knockout_scheduler(compstate, repeat, scheduler_cls, config):
+    from sr.comp.matches import MatchSchedule
+
+    teams, scores, arenas, league = _load_for_knockouts(compstate)
+
+    def setup():
+        # The knockout scheduler adds its matches to the league schedule,
+        # so needs a fresh one each time.
+        return MatchSchedule(config, league, teams)
+
+    def run(schedule):
+        scheduler = scheduler_cls(schedule, scores, arenas, teams, config)
+        scheduler.add_knockouts()
+        return {'rounds': [len(r) for r in scheduler.knockout_rounds]}
+
+    return measure(run, repeat, setup)
+
+
+def bench_knockout(compstate, repeat):
+    from sr.comp.knockout_scheduler import KnockoutScheduler
+
+    config = load_config(compstate)
+    return _bench_knockout_scheduler(compstate, repeat, KnockoutScheduler,
+                                     config)
+
+
+def bench_static(compstate, repeat):
+    from sr.comp.cli.synthetic_compstate import build_static_knockout
+    from sr.comp.static_knockout_scheduler import StaticScheduler
+
+    config = load_config(compstate)
+    if 'static_knockout' not in config:
+        period = config['match_periods']['knockout'][0]
+        arena = config['knockout']['single_arena']['arenas'][0]
+        config['static_knockout'] = build_static_knockout(arena,
+                                                          period['start_time'])
+
+    return _bench_knockout_scheduler(compstate, repeat, StaticScheduler,
+                                     config)
+
+
+def build_seed_schedule(num_ids, num_arenas, num_rounds, random):
+    """
+    Build the lines of a seed schedule (as consumed by ``import-schedule``)
+    which uses ``num_ids`` ids, each appearing at least ``num_rounds`` times.
+    """
+
+    ids = [str(n) for n in range(num_ids)]
+    lines = []
+    for _ in range(num_rounds):
+        random.shuffle(ids)
+        games = [ids[n:n + TEAMS_PER_GAME]
+                 for n in range(0, len(ids), TEAMS_PER_GAME)]
+
+        for n in range(0, len(games), num_arenas):
+            line = sum(games[n:n + num_arenas], [])
+            # Complete any partial game with ids not already in the line
+            for id_ in ids:
+                if len(line) % TEAMS_PER_GAME == 0:
+                    break
+                if id_ not in line:
+                    line.append(id_)
+            lines.append('|'.join(line))
+
+    return lines
+
+
+def bench_import(compstate, repeat, surplus=2, num_rounds=3):
+    import os.path
+
+    from sr.comp.cli.import_schedule import get_best_fit, load_ids_schedule
+    from sr.comp import yaml_loader
+    from sr.comp.stable_random import Random
+
+    arenas_db = yaml_loader.load(os.path.join(compstate, 'arenas.yaml'))
+    arena_ids = sorted(arenas_db['arenas'].keys())
+    team_ids = sorted(yaml_loader.load(os.path.join(compstate,
+                                                    'teams.yaml'))['teams'].keys())
+
+    random = Random()
+    random.seed(b'seed-schedule')
+    lines = build_seed_schedule(len(team_ids) + surplus, len(arena_ids),
+                                num_rounds, random)
+
+    def run():
+        ids, schedule = load_ids_schedule(lines)
+        _, bad_matches = get_best_fit(ids, team_ids, schedule, arena_ids)
+        return {'surplus_ids': surplus, 'bad_matches': len(bad_matches)}
+
+    return measure(run, repeat)
+
+
+BENCHMARKS = {
+    'league': bench_league,
+    'knockout': bench_knockout,
+    'static': bench_static,
+    'import': bench_import,
+}
+
+
+def run_case(engine, compstate, repeat, quiet):
+    """Run a single benchmark case. Intended to be run in a subprocess."""
+    import os
+    import sys
+
+    if quiet:
+        # The schedulers are chatty; keep the output clean
+        sys.stderr = open(os.devnull, 'w')
+
+    return BENCHMARKS[engine](compstate, repeat)
+
+
+def run_in_subprocess(engine, compstate, repeat, timeout, quiet):
+    """
+    Run a benchmark case in a separate process, such that a case which takes
+    too long can be abandoned and memory measurements are independent.
+    """
+
+    from multiprocessing import Pool, TimeoutError
+
+    pool = Pool(1)
+    try:
+        async_result = pool.apply_async(run_case,
+                                        (engine, compstate, repeat, quiet))
+        result = async_result.get(timeout)
+    except TimeoutError:
+        return {'status': 'timeout', 'timeout': timeout}
+    except Exception as e:
+        return {'status': 'error', 'error': str(e)}
+    finally:
+        pool.terminate()
+        pool.join()
+
+    result['status'] = 'ok'
+    return result
+
+
+def get_metadata():
+    from datetime import datetime
+    import platform
+    from pkg_resources import working_set
+
+    versions = {}
+    for library in ('sr.comp', 'sr.comp.cli', 'sr.comp.ranker'):
+        try:
+            versions[library] = working_set.by_key[library].version
+        except KeyError:
+            versions[library] = None
+
+    return {
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'versions': versions,
+    }
+
+
+def case_key(case):
+    return case['engine'], case['teams'], case['arenas']
+
+
+def print_comparison(baseline, results):
+    """Print the relative change in times between two sets of results."""
+    baseline_cases = {case_key(case): case for case in baseline['results']}
+
+    for case in results['results']:
+        old = baseline_cases.get(case_key(case))
+        label = '{0:>8} {1:>5} teams {2} arenas'.format(*case_key(case))
+        if old is None or 'ok' not in (old['status'], case['status']):
+            print(label, 'no comparison')
+        elif old['status'] != case['status']:
+            print(label, '{0} -> {1}'.format(old['status'], case['status']))
+        else:
+            old_time = old['wall_time']['median']
+            new_time = case['wall_time']['median']
+            print(label, '{0:.3f}s -> {1:.3f}s ({2:+.0%})'.format(
+                old_time, new_time, (new_time - old_time) / old_time))
+
+
+def command(settings):
+    import json
+    import shutil
+    import sys
+    import tempfile
+    import os.path
+
+    from sr.comp.cli.synthetic_compstate import generate
+
+    work_dir = tempfile.mkdtemp(prefix='srcomp-bench-')
+
+    results = {'meta': get_metadata(), 'results': []}
+    try:
+        for num_teams in settings.teams:
+            for num_arenas in settings.arenas:
+                compstate = os.path.join(work_dir, '{0}-{1}'.format(num_teams,
+                                                                    num_arenas))
+                generate(compstate, num_teams=num_teams, num_arenas=num_arenas,
+                         num_delays=settings.delays)
+
+                for engine in settings.engines:
+                    print("Running {0} with {1} teams in {2} arenas..."
+                          .format(engine, num_teams, num_arenas),
+                          file=sys.stderr)
+                    case = run_in_subprocess(engine, compstate,
+                                             settings.repeat,
+                                             settings.timeout,
+                                             not settings.verbose)
+                    case.update(engine=engine, teams=num_teams,
+                                arenas=num_arenas)
+                    results['results'].append(case)
+    finally:
+        shutil.rmtree(work_dir)
+
+    if settings.output:
+        with open(settings.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+    if settings.compare:
+        with open(settings.compare) as f:
+            baseline = json.load(f)
+        print_comparison(baseline, results)
+
+
+def add_subparser(subparsers):
+    help_msg = 'Benchmark the schedulers against synthetic competitions'
+    parser = subparsers.add_parser('benchmark-schedulers', help=help_msg,
+                                   description=__doc__.strip())
+    parser.add_argument('-e', '--engines', nargs='+', choices=ENGINES,
+                        default=ENGINES,
+                        help='scheduling engines to benchmark '
+                             '(default: all)')
+    parser.add_argument('-t', '--teams', type=int, nargs='+',
+                        default=DEFAULT_TEAMS,
+                        help='numbers of teams to benchmark with '
+                             '(default: %(default)s)')
+    parser.add_argument('-a', '--arenas', type=int, nargs='+',
+                        default=DEFAULT_ARENAS,
+                        help='numbers of arenas to benchmark with '
+                             '(default: %(default)s)')
+    parser.add_argument('-d', '--delays', type=int, default=3,
+                        help='number of delays in each competition '
+                             '(default: %(default)s)')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='number of runs of each case '
+                             '(default: %(default)s)')
+    parser.add_argument('--timeout', type=float, default=120,
+                        help='seconds after which to abandon a case '
+                             '(default: %(default)s)')
+    parser.add_argument('-o', '--output',
+                        help='file to write the JSON results to '
+                             '(default: stdout)')
+    parser.add_argument('-c', '--compare',
+                        help='previous results to compare against')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='show output from the schedulers')
+    parser.set_defaults(func=command)
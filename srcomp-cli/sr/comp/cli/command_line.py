@@ -7,8 +7,11 @@ import sys
 
 from . import add_delay
 from . import awards
+from . import benchmark_api
+from . import benchmark_schedulers
 from . import delay
 from . import deploy
+from . import export_scores
 from . import import_schedule
 from . import import_teams
 from . import knocked_out_teams
@@ -16,11 +19,14 @@ from . import lighting_controller
 from . import list_midi_ports
 from . import match_order_teams
 from . import print_schedule
+from . import profile_load
+from . import project_knockouts
 from . import schedule_league
 from . import scorer
 from . import shift_matches
 from . import show_schedule
 from . import summary
+from . import synthetic_compstate
 from . import update_layout
 from . import validate
 from . import yaml_round_trip
@@ -46,8 +52,11 @@ def argument_parser():
 
     add_delay.add_subparser(subparsers)
     awards.add_subparser(subparsers)
+    benchmark_api.add_subparser(subparsers)
+    benchmark_schedulers.add_subparser(subparsers)
     delay.add_subparser(subparsers)
     deploy.add_subparser(subparsers)
+    export_scores.add_subparser(subparsers)
     import_schedule.add_subparser(subparsers)
     import_teams.add_subparser(subparsers)
     knocked_out_teams.add_subparser(subparsers)
@@ -55,11 +64,14 @@ def argument_parser():
     lighting_controller.add_subparser(subparsers)
     match_order_teams.add_subparser(subparsers)
     print_schedule.add_subparser(subparsers)
+    profile_load.add_subparser(subparsers)
+    project_knockouts.add_subparser(subparsers)
     schedule_league.add_subparser(subparsers)
     scorer.add_subparser(subparsers)
     shift_matches.add_subparser(subparsers)
     show_schedule.add_subparser(subparsers)
     summary.add_subparser(subparsers)
+    synthetic_compstate.add_subparser(subparsers)
     update_layout.add_subparser(subparsers)
     validate.add_subparser(subparsers)
     yaml_round_trip.add_subparser(subparsers)
@@ -1,10 +1,15 @@
 from __future__ import print_function
 
+from collections import namedtuple
 from contextlib import contextmanager
+import sys
+
+from sr.comp.cli.ssh_connections import DEFAULT_PERSIST_SECONDS, \
+    SSHConnections
 
 
 API_TIMEOUT_SECONDS = 3
-SSH_TIMEOUT_SECONDS = 2
+DEFAULT_JOBS = 1
 DEPLOY_USER = 'srcomp'
 BOLD = '\033[1m'
 FAIL = '\033[91m'
@@ -19,16 +24,6 @@ except NameError:
     pass
 
 
-def ssh_connection(host):
-    from paramiko import AutoAddPolicy, SSHClient
-
-    client = SSHClient()
-    client.load_system_host_keys()
-    client.set_missing_host_key_policy(AutoAddPolicy())
-    client.connect(host, username=DEPLOY_USER, timeout=SSH_TIMEOUT_SECONDS)
-    return client
-
-
 def format_fail(*args):
     msg = ' '.join(map(str, args))
     return BOLD + FAIL + msg + ENDC
@@ -47,9 +42,9 @@ def print_fail(*args, **kargs):
     print(format_fail(*args), **kargs)
 
 
-def print_buffer(buf):
+def print_output(text, file=None):
     prefix = '> '
-    print(prefix + prefix.join(buf.readlines()).strip())
+    print(prefix + prefix.join(text.splitlines(True)).strip(), file=file)
 
 
 def get_input(prompt):
@@ -101,35 +96,55 @@ def ref_compstate(host):
     return url
 
 
-def deploy_to(compstate, host, revision, verbose):
-    print(BOLD + "Deploying to {0}:".format(host) + ENDC)
+def deploy_to(compstate, connections, host, revision, verbose, output=None):
+    """
+    Deploy a revision to a host.
+
+    :param connections: The :class:`.SSHConnections` to the hosts, which
+                        the push and the update share.
+    :param output: A stream to write the progress to, which defaults to
+                   standard output. The output of the connection, the push
+                   and the update is captured and written there too.
+    :return: The exit status of updating the host.
+    """
+    print(BOLD + "Deploying to {0}:".format(host) + ENDC, file=output)
 
     # Make connection early to check if host is up.
-    with ssh_connection(host) as client:
-        # Push the repo
-        url = ref_compstate(host)
-        # Make a new branch for this revision so that it's visible to
-        # anything which fetches the repo; use the revision id in the
-        # branch name to avoid race conditions without needing to come
-        # up with our own unique identifier.
-        # This also means we don't need to worry about whether or not the
-        # revision exists in the target, since this push will simply no-op
-        # if it's already present
-        revspec = "{0}:refs/heads/deploy-{0}".format(revision)
-        with exit_on_exception(kind=RuntimeError):
-            compstate.push(url, revspec,
-                           err_msg="Failed to push to {0}.".format(host))
+    connect_output = connections.connect(host)
+    if connect_output:
+        print_output(connect_output, file=output)
+
+    # Push the repo
+    url = ref_compstate(host)
+    # Make a new branch for this revision so that it's visible to
+    # anything which fetches the repo; use the revision id in the
+    # branch name to avoid race conditions without needing to come
+    # up with our own unique identifier.
+    # This also means we don't need to worry about whether or not the
+    # revision exists in the target, since this push will simply no-op
+    # if it's already present
+    revspec = "{0}:refs/heads/deploy-{0}".format(revision)
+    err_msg = "Failed to push to {0}.".format(host)
+    try:
+        push_output = compstate.push(url, revspec, err_msg=err_msg,
+                                     env=connections.git_env,
+                                     return_output=True)
+    except RuntimeError as e:
+        print_fail(e, file=output)
+        return 1
+
+    if verbose:
+        print_output(push_output, file=output)
 
-        cmd = "./update '{0}'".format(revision)
-        _, stdout, stderr = client.exec_command(cmd)
-        retcode = stdout.channel.recv_exit_status()
+    cmd = "./update '{0}'".format(revision)
+    retcode, stdout, stderr = connections.run(host, cmd)
 
-        if verbose or retcode != 0:
-            print_buffer(stdout)
+    if verbose or retcode != 0:
+        print_output(stdout, file=output)
 
-        print_buffer(stderr)
+    print_output(stderr, file=output)
 
-        return retcode
+    return retcode
 
 
 def get_deployments(compstate):
@@ -146,13 +161,40 @@ def get_current_state(host):
         page = urlopen(url, timeout=API_TIMEOUT_SECONDS)
         raw_state = json.load(page)
     except Exception as e:
-        print(e)
+        # Checked from several threads at once, so in a single line which
+        # says which host it's about
+        print_fail("Failed to get state for {0}: {1}".format(host, e))
         return None
     else:
         return raw_state['state']
 
 
-def check_host_state(compstate, host, revision, verbose):
+def get_current_states(hosts, jobs, verbose):
+    """
+    Get the current state of each host, checking up to ``jobs`` hosts at
+    once.
+
+    :return: A list of the states of the hosts, with ``None`` for those
+             whose state couldn't be got.
+    """
+    from multiprocessing.pool import ThreadPool
+
+    if verbose:
+        print("Checking host states for {0} (timeout {1} seconds)."
+              .format(', '.join(hosts), API_TIMEOUT_SECONDS))
+
+    if not hosts:
+        return []
+
+    pool = ThreadPool(min(jobs, len(hosts)))
+    try:
+        return pool.map(get_current_state, hosts)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def check_host_state(compstate, host, revision, state):
     """
     Compares the host state to the revision we want to deploy. If the
     host's state isn't in the history of the deploy revision then various
@@ -162,10 +204,6 @@ def check_host_state(compstate, host, revision, verbose):
     """
     SKIP = True
     UPDATE = False
-    if verbose:
-        print("Checking host state for {0} (timeout {1} seconds)."
-              .format(host, API_TIMEOUT_SECONDS))
-    state = get_current_state(host)
     if not state:
         tpl = "Failed to get state for {0}, cannot advise about history." \
               " Deploy anyway?"
@@ -223,32 +261,134 @@ def require_no_changes(compstate):
 
 
 def require_valid(compstate):
-    from sr.comp.validation import validate
+    from sr.comp.validation import count_errors, report_findings
+    from sr.comp.validation_cache import find_problems_since_cached
 
+    # Only what has changed since the last validated commit is re-checked,
+    # so that deploying small changes (such as delays) is quick
     with exit_on_exception("State cannot be loaded: {0}"):
-        comp = compstate.load()
+        findings = find_problems_since_cached(compstate)
 
-    num_errors = validate(comp)
+    report_findings(findings)
+    num_errors = count_errors(findings)
     if num_errors:
         query_warn("State has validation errors (see above)")
 
 
+DeployResult = namedtuple('DeployResult', ['host', 'retcode', 'output'])
+"""
+The outcome of deploying to a host: the exit status (``None`` if the deploy
+wasn't attempted) and the progress written while deploying.
+"""
+
+
+def deploy_to_hosts(compstate, connections, hosts, revision, verbose, jobs,
+                    keep_going):
+    """
+    Deploy a revision to some hosts, up to ``jobs`` at once.
+
+    Unless ``keep_going``, no more deploys are started once one has failed,
+    though those already under way are finished.
+
+    :return: A generator of :class:`DeployResult` s, in the order in which
+             the deploys finish.
+    """
+    from multiprocessing.pool import ThreadPool
+    from six import StringIO
+    import threading
+
+    failed = threading.Event()
+
+    def deploy(host):
+        if failed.is_set() and not keep_going:
+            return DeployResult(host, None, '')
+
+        output = StringIO()
+        try:
+            retcode = deploy_to(compstate, connections, host, revision,
+                                verbose, output)
+        except Exception as e:
+            print_fail("Failed to deploy to '{0}': {1}".format(host, e),
+                       file=output)
+            retcode = 1
+
+        if retcode != 0:
+            failed.set()
+        return DeployResult(host, retcode, output.getvalue())
+
+    if not hosts:
+        return
+
+    pool = ThreadPool(min(jobs, len(hosts)))
+    try:
+        for result in pool.imap_unordered(deploy, hosts):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def format_summary(results, skipped):
+    """Format a summary of the outcome of deploying to each host."""
+    lines = []
+    for result in results:
+        if result.retcode == 0:
+            status = "deployed"
+        elif result.retcode is None:
+            status = "not attempted"
+        else:
+            status = format_fail("failed (exit status: {0})"
+                                 .format(result.retcode))
+        lines.append("  {0}: {1}".format(result.host, status))
+
+    for host in skipped:
+        lines.append("  {0}: skipped".format(host))
+
+    return lines
+
+
 def run_deployments(args, compstate, hosts):
     revision = compstate.rev_parse('HEAD')
-    for host in hosts:
-        if not args.skip_host_check:
-            skip_host = check_host_state(compstate, host, revision,
-                                         args.verbose)
-            if skip_host:
+    jobs = max(1, args.jobs)
+
+    skipped = []
+    if not args.skip_host_check:
+        states = get_current_states(hosts, jobs, args.verbose)
+        deploy_hosts = []
+        for host, state in zip(hosts, states):
+            if check_host_state(compstate, host, revision, state):
                 print(BOLD + "Skipping {0}.".format(host) + ENDC)
-                continue
-
-        retcode = deploy_to(compstate, host, revision, args.verbose)
-        if retcode != 0:
-            # TODO: work out if it makes sense to try to rollback here?
+                skipped.append(host)
+            else:
+                deploy_hosts.append(host)
+        hosts = deploy_hosts
+
+    with exit_on_exception(kind=RuntimeError):
+        connections = SSHConnections(DEPLOY_USER, persist=args.ssh_persist)
+
+    results = []
+    with connections:
+        for result in deploy_to_hosts(compstate, connections, hosts,
+                                      revision, args.verbose, jobs,
+                                      args.keep_going):
+            if result.retcode is not None:
+                sys.stdout.write(result.output)
+            results.append(result)
+
+    failures = [result for result in results
+                if result.retcode not in (0, None)]
+
+    if len(hosts) > 1 or skipped:
+        print(BOLD + "Summary:" + ENDC)
+        for line in format_summary(results, skipped):
+            print(line)
+
+    if failures:
+        # TODO: work out if it makes sense to try to rollback here?
+        for result in failures:
             print_fail("Failed to deploy to '{0}' (exit status: {1})."
-                       .format(host, retcode))
-            exit(retcode)
+                       .format(result.host, result.retcode))
+        exit(failures[0].retcode)
 
     print(BOLD + OKBLUE + "Done" + ENDC)
 
@@ -269,6 +409,17 @@ def add_options(parser):
     parser.add_argument('--verbose', action='store_true')
     parser.add_argument('--skip-host-check', action='store_true',
                         help='skips checking the current state of the hosts')
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_JOBS,
+                        help='the number of hosts to check and deploy to at '
+                             'once (default: %(default)s)')
+    parser.add_argument('--keep-going', action='store_true',
+                        help='carry on deploying to the other hosts after a '
+                             'deploy fails')
+    parser.add_argument('--ssh-persist', type=int, metavar='SECONDS',
+                        default=DEFAULT_PERSIST_SECONDS,
+                        help='how long to keep idle SSH connections to the '
+                             'hosts open for, to be reused by later deploys; '
+                             '0 closes them once done (default: %(default)s)')
 
 
 def add_subparser(subparsers):
@@ -0,0 +1,88 @@
+"""
+Export the score of each team in each match, as a table.
+
+Each row of the table is one team's result in one match: the type, arena and
+number of the match, the team's TLA, its game and league (aka normalised)
+points, its position in the match by game points and whether it was
+disqualified. This is convenient for analysing the scores of a competition
+with other tools, such as spreadsheets or data frames.
+"""
+
+from __future__ import print_function
+
+
+FORMATS = ('csv', 'json', 'arrow')
+
+
+def export_scores(table, format_, output):
+    """
+    Write a :class:`sr.comp.score_table.ScoreTable` in the given format.
+
+    :param str format_: One of :data:`FORMATS`.
+    :param output: A text stream for the ``csv`` and ``json`` formats, or a
+                   path for the ``arrow`` format.
+    """
+    import json
+
+    if format_ == 'csv':
+        table.write_csv(output)
+    elif format_ == 'json':
+        json.dump(table.to_columns(), output)
+        output.write('\n')
+    elif format_ == 'arrow':
+        table.write_arrow(output)
+    else:
+        raise ValueError("Unknown format '{0}'.".format(format_))
+
+
+def command(settings):
+    import os.path
+    import sys
+
+    from sr.comp.comp import SRComp
+    from sr.comp.score_table import ScoreTable
+
+    if settings.format == 'arrow':
+        if settings.output is None:
+            print("An output file is required for the 'arrow' format.",
+                  file=sys.stderr)
+            exit(1)
+        try:
+            import pyarrow
+        except ImportError:
+            print("'pyarrow' is required for the 'arrow' format.",
+                  file=sys.stderr)
+            exit(1)
+
+    comp = SRComp(os.path.realpath(settings.compstate))
+
+    types = settings.types or ['league', 'knockout', 'tiebreaker']
+    table = ScoreTable.concat([getattr(comp.scores, type_).table
+                               for type_ in types])
+
+    if settings.format == 'arrow':
+        export_scores(table, settings.format, settings.output)
+    elif settings.output is None:
+        export_scores(table, settings.format, sys.stdout)
+    else:
+        with open(settings.output, 'w') as f:
+            export_scores(table, settings.format, f)
+
+
+def add_subparser(subparsers):
+    help_msg = 'Export the score of each team in each match, as a table'
+    parser = subparsers.add_parser('export-scores', help=help_msg,
+                                   description=__doc__.strip())
+    parser.add_argument('compstate', help='competition state repository')
+    parser.add_argument('-f', '--format', choices=FORMATS, default='csv',
+                        help="the format to export in; 'arrow' (an Arrow "
+                             "IPC, aka Feather, file) requires 'pyarrow' "
+                             "(default: %(default)s)")
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help='the file to write to (default: standard output)')
+    parser.add_argument('-t', '--type', dest='types', action='append',
+                        choices=('league', 'knockout', 'tiebreaker'),
+                        help='only export the scores of the given type of '
+                             'match; may be given more than once (default: '
+                             'all types)')
+    parser.set_defaults(func=command)
@@ -3,6 +3,10 @@ from __future__ import print_function
 import argparse
 
 TEAMS_PER_GAME = 4
+# Matches with this many teams or fewer are considered 'bad'
+MAX_TEAMS_IN_BAD_MATCH = 2
+# The maximum number of steps to take searching for ids to exclude
+SEARCH_BUDGET = 100000
 
 def tidy(lines):
     "Strip comments and trailing whitespace"
@@ -86,55 +90,17 @@ def ignore_ids(ids, ids_to_remove):
         ids.remove(i)
 
 def get_id_subsets(ids, limit):
-    num_ids = len(ids)
+    from itertools import combinations
 
+    num_ids = len(ids)
     extra = num_ids - limit
 
-    if extra == 0:
-        # Only one posibility -- use all of them
-        yield ids
-
-    elif extra == 1:
-        for idx in range(len(ids)):
-            ids_clone = ids[:]
+    # Explore removing each combination of ids, in order
+    for indices in combinations(range(num_ids), extra):
+        ids_clone = ids[:]
+        for idx in reversed(indices):
             ids_clone.pop(idx)
-            yield ids_clone
-
-    elif extra == 2:
-        for idx1 in range(len(ids)):
-            for idx2 in range(idx1+1, len(ids)):
-                ids_clone = ids[:]
-                ids_clone.pop(idx2)
-                ids_clone.pop(idx1)
-                yield ids_clone
-
-    elif extra == 3:
-        for idx1 in range(len(ids)):
-            for idx2 in range(idx1+1, len(ids)):
-                for idx3 in range(idx2+1, len(ids)):
-                    ids_clone = ids[:]
-                    ids_clone.pop(idx3)
-                    ids_clone.pop(idx2)
-                    ids_clone.pop(idx1)
-                    yield ids_clone
-
-    else:
-        # TODO: consider generalising the above or adding more handling
-        raise Exception("Too many empty slots to compensate for ({0}).".format(extra))
-
-def build_id_team_maps(ids, team_ids):
-    # If there are more ids than team_ids we want to ensure that we minimize
-    # the number of matches which have empty places and also the number of
-    # empty places in any given match.
-    # This function generates possible mappings of ids to teams as needed
-    # in order to explore excluding different ids.
-    #
-    # Note: this function does _not_ explore mapping the same subset of
-    # ids to the given teams since that doesn't achieve any changes in
-    # which matches have empty spaces.
-
-    for id_subset in get_id_subsets(ids, len(team_ids)):
-        yield dict(zip(id_subset, team_ids))
+        yield ids_clone
 
 def build_matches(id_team_map, schedule, arena_ids):
     from collections import namedtuple
@@ -158,20 +124,21 @@ def build_matches(id_team_map, schedule, arena_ids):
         # Check that the match has enough actual teams; warn if not
         for arena, teams in match.items():
             num_teams = len(set(teams) - set([None]))
-            if num_teams <= 2:
+            if num_teams <= MAX_TEAMS_IN_BAD_MATCH:
                 bad_matches.append(BadMatch(arena, match_num, num_teams))
 
     return matches, bad_matches
 
-def are_better_matches(best, new):
+def get_empty_places_map(bad_matches):
     from collections import Counter
-    def get_empty_places_map(bad_matches):
-        empty_places_map = Counter()
-        for bad_match in bad_matches:
-            num_empty = TEAMS_PER_GAME - bad_match.num_teams
-            empty_places_map[num_empty] += 1
-        return empty_places_map
 
+    empty_places_map = Counter()
+    for bad_match in bad_matches:
+        num_empty = TEAMS_PER_GAME - bad_match.num_teams
+        empty_places_map[num_empty] += 1
+    return empty_places_map
+
+def are_better_matches(best, new):
     best_map = get_empty_places_map(best)
     new_map  = get_empty_places_map(new)
 
@@ -179,27 +146,175 @@ def are_better_matches(best, new):
 
     # Even single matches with lots of empty slots are bad
     for num_empty_places in sorted(possible_empty_places, reverse=True):
-        if new_map[num_empty_places] < best_map[num_empty_places]:
-            return True
+        if new_map[num_empty_places] != best_map[num_empty_places]:
+            return new_map[num_empty_places] < best_map[num_empty_places]
 
     return False
 
+class ExclusionSearch(object):
+    """
+    Search for the ids to exclude from a schedule such that we minimize the
+    number of matches which have empty places and also the number of empty
+    places in any given match.
 
-def get_best_fit(ids, team_ids, schedule, arena_ids):
-    best = None
-    for id_team_map in build_id_team_maps(ids, team_ids):
-        matches, bad_matches = build_matches(id_team_map, schedule, arena_ids)
+    Candidate exclusions are scored incrementally from the games each id
+    appears in, using the same ordering as ``are_better_matches``. Since
+    excluding another id can never make a set of exclusions better, any
+    partial set which is already worse than the best known is pruned.
 
-        if len(bad_matches) == 0:
-            # Nothing bad about these, ship them
-            return matches, bad_matches
+    Note: this does _not_ explore mapping the same subset of ids to the
+    given teams since that doesn't achieve any changes in which matches
+    have empty spaces.
 
-        if best is None or are_better_matches(best[1], bad_matches):
-            best = (matches, bad_matches)
+    :param list ids: The ids which may be excluded.
+    :param list schedule: A list of lists of ids in each match.
+    """
+
+    def __init__(self, ids, schedule):
+        self.ids = ids
+
+        known_ids = set(ids)
+        self._id_games = {id_: [] for id_ in ids}
+
+        # The number of empty places in each game. Ids which aren't candidates
+        # (for example those which have been ignored) are always empty.
+        self._empty = []
+        for match_ids in schedule:
+            for n in range(0, len(match_ids), TEAMS_PER_GAME):
+                game_num = len(self._empty)
+                empty = 0
+                for id_ in match_ids[n:n + TEAMS_PER_GAME]:
+                    if id_ in known_ids:
+                        self._id_games[id_].append(game_num)
+                    else:
+                        empty += 1
+                self._empty.append(empty)
+
+        # The number of games with each number of empty places
+        self._counts = [0] * (TEAMS_PER_GAME + 1)
+        for empty in self._empty:
+            self._counts[empty] += 1
+
+        self.nodes = 0
+
+    @property
+    def key(self):
+        """
+        A key for the current exclusions; smaller is better. This is the
+        number of bad games with each number of empty places, most first.
+        """
+        min_empty = TEAMS_PER_GAME - MAX_TEAMS_IN_BAD_MATCH
+        return tuple(self._counts[TEAMS_PER_GAME:min_empty - 1:-1])
+
+    def _move(self, id_, change):
+        empty = self._empty
+        counts = self._counts
+        for game_num in self._id_games[id_]:
+            counts[empty[game_num]] -= 1
+            empty[game_num] += change
+            counts[empty[game_num]] += 1
+
+    def exclude(self, id_):
+        self._move(id_, 1)
+
+    def include(self, id_):
+        self._move(id_, -1)
+
+    def greedy(self, num_excluded):
+        """
+        Greedily pick ``num_excluded`` ids, each time choosing whichever is
+        least bad to exclude.
+
+        :return: A tuple of the key and the list of excluded ids.
+        """
+
+        excluded = []
+        remaining = list(self.ids)
+        for _ in range(num_excluded):
+            best = None
+            for idx, id_ in enumerate(remaining):
+                self.exclude(id_)
+                key = self.key
+                self.include(id_)
+                if best is None or key < best[0]:
+                    best = (key, idx)
+            excluded.append(remaining.pop(best[1]))
+            self.exclude(excluded[-1])
+
+        key = self.key
+        for id_ in excluded:
+            self.include(id_)
+
+        return key, excluded
+
+    def search(self, num_excluded, budget=SEARCH_BUDGET):
+        """
+        Find the best ``num_excluded`` ids to exclude. Where several sets of
+        exclusions are equally good the one which comes first (by the order
+        of the ids) is chosen.
+
+        If the search is too large to complete within ``budget`` steps
+        then the best exclusions found by then are returned.
+
+        :return: A list of the ids to exclude.
+        """
+
+        ids = self.ids
+        num_ids = len(ids)
+
+        # Start from a greedy solution so that we can prune early
+        best_key, best = self.greedy(num_excluded)
+        found = False
+        no_bad_games = (0,) * len(best_key)
+
+        def is_pruned(key):
+            return key > best_key or (found and key >= best_key)
+
+        chosen = []
+        idx = 0
+        while True:
+            remaining = num_excluded - len(chosen)
+
+            if remaining == 0 or idx > num_ids - remaining:
+                if remaining == 0:
+                    key = self.key
+                    if not is_pruned(key):
+                        best_key, best = key, [ids[n] for n in chosen]
+                        found = True
+                        if best_key == no_bad_games:
+                            break
+
+                # Done at this level, backtrack
+                if not chosen:
+                    break
+                idx = chosen.pop()
+                self.include(ids[idx])
+                idx += 1
+                continue
+
+            self.nodes += 1
+            if self.nodes > budget:
+                break
+
+            self.exclude(ids[idx])
+            if is_pruned(self.key):
+                self.include(ids[idx])
+            else:
+                chosen.append(idx)
+            idx += 1
+
+        for idx in chosen:
+            self.include(ids[idx])
+
+        return best
 
-    assert best is not None
+def get_best_fit(ids, team_ids, schedule, arena_ids):
+    num_excluded = len(ids) - len(team_ids)
+    excluded = set(ExclusionSearch(ids, schedule).search(num_excluded))
 
-    return best
+    id_subset = [id_ for id_ in ids if id_ not in excluded]
+    id_team_map = dict(zip(id_subset, team_ids))
+    return build_matches(id_team_map, schedule, arena_ids)
 
 
 def order_teams(compstate_path, team_ids):
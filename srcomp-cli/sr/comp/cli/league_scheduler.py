@@ -4,7 +4,12 @@ import random
 import sys
 from collections import Counter
 from itertools import product
-from fractions import gcd
+
+try:
+    from math import gcd
+except ImportError:
+    # Python < 3.5
+    from fractions import gcd
 
 class PatienceCounter(object):
     def __init__(self, threshold):
@@ -43,6 +48,9 @@ class Scheduler(object):
                  enable_lcg=True,
                  base_matches=()):
         self.tag = ''
+        # The number of attempts taken for each round, in the order they
+        # were scheduled (including any which were later backtracked)
+        self.round_attempts = []
         self.num_corners = num_corners
         self.random = random
         self.arenas = tuple(arenas)
@@ -207,6 +215,7 @@ class Scheduler(object):
                 matches_prime = matches + self._match_partition(lcg_round)
                 if self._validate(matches_prime, max_matchups, matchup_impatience.bump):
                     matches = matches_prime
+                    self.round_attempts.append(1)
                     self.lprint('  completed via LCG permutation')
                     continue
             for tick in range(10000):
@@ -218,8 +227,10 @@ class Scheduler(object):
                 matches_prime = matches + self._match_partition(teams)
                 if self._validate(matches_prime, max_matchups, matchup_impatience.bump):
                     matches = matches_prime
+                    self.round_attempts.append(tick + 1)
                     break
             else:
+                self.round_attempts.append(tick + 1)
                 if len(matches) > len(self._base_matches):
                     self.lprint('  backtracking')
                     matches = matches[:-self.round_length]
@@ -0,0 +1,186 @@
+"""
+Profile the loading of a compstate.
+
+Each phase of loading the compstate (reading the teams, each category of
+scores, building the schedule and knockouts, computing the awards and so on)
+is instrumented, reporting its wall time, the number of files it opened and
+the peak memory it allocated. This shows which part of a compstate (or its
+scorer) is making loading it slow.
+
+Tracing memory allocations slows loading down considerably, so the times are
+most representative when run with ``--no-memory``.
+"""
+
+from __future__ import print_function, division
+
+
+class PhaseProfiler(object):
+    """
+    Instruments the phases of loading a compstate, as a hook for
+    :class:`sr.comp.timing.PhaseTimer`.
+
+    The number of files opened is only measured on Python 3.8 and later and
+    the peak memory only on Python 3.9 and later, while :mod:`tracemalloc`
+    is tracing.
+
+    :param str cprofile_dir: A directory to write the :mod:`cProfile`
+                             statistics of each phase to, if any.
+    """
+
+    def __init__(self, cprofile_dir=None):
+        self.cprofile_dir = cprofile_dir
+
+        self.files = {}
+        """A :class:`dict` mapping phase names to the number of files they
+        opened."""
+
+        self.peak_memory = {}
+        """A :class:`dict` mapping phase names to the peak memory, in bytes,
+        they allocated beyond what was already allocated."""
+
+        self._current = None
+        self._auditing = False
+
+    def _audit(self, event, args):
+        if event == 'open' and self._current is not None:
+            self.files[self._current] += 1
+
+    def _start_auditing(self):
+        import sys
+
+        if not self._auditing and hasattr(sys, 'addaudithook'):
+            # Audit hooks can't be removed, so this one stays idle between
+            # phases
+            sys.addaudithook(self._audit)
+            self._auditing = True
+
+    def phase(self, name):
+        import contextlib
+        import os.path
+
+        try:
+            import tracemalloc
+        except ImportError:
+            # Python 2
+            tracemalloc = None
+
+        @contextlib.contextmanager
+        def profile():
+            self._start_auditing()
+
+            tracing = tracemalloc is not None and \
+                tracemalloc.is_tracing() and \
+                hasattr(tracemalloc, 'reset_peak')
+            if tracing:
+                start_memory, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+
+            if self.cprofile_dir is not None:
+                import cProfile
+                profiler = cProfile.Profile()
+                profiler.enable()
+
+            if self._auditing:
+                self.files[name] = 0
+            self._current = name
+            try:
+                yield
+            finally:
+                self._current = None
+
+                if self.cprofile_dir is not None:
+                    profiler.disable()
+                    profiler.dump_stats(os.path.join(self.cprofile_dir,
+                                                     name + '.prof'))
+
+                if tracing:
+                    _, peak_memory = tracemalloc.get_traced_memory()
+                    self.peak_memory[name] = peak_memory - start_memory
+
+        return profile()
+
+
+def profile_load(compstate, profiler):
+    """
+    Load the compstate at the given path, instrumented by the given
+    :class:`PhaseProfiler`.
+
+    :return: A :class:`list` of a :class:`dict` of the measurements of each
+             phase.
+    """
+    from sr.comp.comp import SRComp
+
+    comp = SRComp(compstate, hooks=[profiler.phase])
+
+    return [{
+        'phase': phase,
+        'wall_time': duration,
+        'files': profiler.files.get(phase),
+        'peak_memory': profiler.peak_memory.get(phase),
+    } for phase, duration in comp.load_times.items()]
+
+
+def format_phases(phases):
+    """Format the measurements of the phases as a table."""
+
+    def format_optional(value, scale=1):
+        if value is None:
+            return '-'
+        return '{0:.0f}'.format(value / scale)
+
+    total = sum(p['wall_time'] for p in phases)
+    lines = ['{0:<20} {1:>10} {2:>6} {3:>6} {4:>14}'.format(
+        'phase', 'time (ms)', '%', 'files', 'peak mem (KiB)')]
+    for p in phases:
+        lines.append('{0:<20} {1:>10.1f} {2:>6.1f} {3:>6} {4:>14}'.format(
+            p['phase'], p['wall_time'] * 1000,
+            100 * p['wall_time'] / total if total else 0,
+            format_optional(p['files']),
+            format_optional(p['peak_memory'], 1024)))
+    lines.append('{0:<20} {1:>10.1f}'.format('total', total * 1000))
+    return '\n'.join(lines)
+
+
+def command(settings):
+    import json
+    import os
+
+    try:
+        import tracemalloc
+    except ImportError:
+        # Python 2
+        tracemalloc = None
+
+    if settings.cprofile is not None and not os.path.isdir(settings.cprofile):
+        os.makedirs(settings.cprofile)
+
+    profiler = PhaseProfiler(settings.cprofile)
+
+    trace_memory = tracemalloc is not None and not settings.no_memory
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        phases = profile_load(settings.compstate, profiler)
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    if settings.json:
+        print(json.dumps(phases, indent=2))
+    else:
+        print(format_phases(phases))
+
+
+def add_subparser(subparsers):
+    help_msg = 'Profile the loading of a compstate, phase by phase'
+    parser = subparsers.add_parser('profile-load', help=help_msg,
+                                   description=__doc__.strip())
+    parser.add_argument('compstate', help='competition state repository')
+    parser.add_argument('--no-memory', action='store_true',
+                        help="don't measure the peak memory of each phase")
+    parser.add_argument('--cprofile', metavar='DIRECTORY',
+                        help='write cProfile statistics for each phase to '
+                             'DIRECTORY/<phase>.prof')
+    parser.add_argument('--json', action='store_true',
+                        help='output the measurements as JSON')
+    parser.set_defaults(func=command)
@@ -0,0 +1,87 @@
+"""
+Project how far each team is likely to get in the knockouts.
+
+The rest of the competition (any unscored league matches, then the
+knockouts) is simulated many times, with the game points of each team in
+each match drawn from those it has scored so far. The probability of each
+team playing in each round of the knockouts, and of winning the final, is
+then shown, for the teams with any chance of reaching the knockouts.
+"""
+
+from __future__ import print_function
+
+
+def round_heading(rounds_left):
+    if rounds_left == 0:
+        return "Final"
+    elif rounds_left == 1:
+        return "Semi"
+    elif rounds_left == 2:
+        return "Quarter"
+    return "Round"
+
+
+def format_projection(projection, n_rounds):
+    """
+    Format a projection, from
+    :meth:`sr.comp.projection.KnockoutProjection.project`, as lines of a
+    table of percentages.
+    """
+    headings = ['TLA']
+    for round_num in range(n_rounds):
+        headings.append(round_heading(n_rounds - round_num - 1))
+    headings.append('Win')
+
+    lines = ['  '.join('{0:>7}'.format(h) for h in headings)]
+    for tla, probabilities in projection.items():
+        if not any(probabilities):
+            continue
+        cells = ['{0:>7}'.format(tla)]
+        cells += ['{0:>6.1f}%'.format(p * 100) for p in probabilities]
+        lines.append('  '.join(cells))
+    return lines
+
+
+def command(settings):
+    import json
+    import os.path
+    import time
+
+    from sr.comp.comp import SRComp
+    from sr.comp.projection import KnockoutProjection
+
+    comp = SRComp(os.path.realpath(settings.compstate))
+    projector = KnockoutProjection(comp.schedule, comp.scores)
+
+    start = time.time()
+    projection = projector.project(settings.simulations, seed=settings.seed,
+                                   processes=settings.processes)
+    duration = time.time() - start
+
+    if settings.json:
+        print(json.dumps(projection))
+        return
+
+    for line in format_projection(projection, len(projector.bracket)):
+        print(line)
+    print()
+    print("{0} simulations in {1:.2f}s".format(settings.simulations,
+                                                duration))
+
+
+def add_subparser(subparsers):
+    help_msg = 'Project how far each team is likely to get in the knockouts'
+    parser = subparsers.add_parser('project-knockouts', help=help_msg,
+                                   description=__doc__.strip())
+    parser.add_argument('compstate', help='competition state repository')
+    parser.add_argument('-n', '--simulations', type=int, default=10000,
+                        help='the number of simulations to run (default: '
+                             '%(default)s)')
+    parser.add_argument('--seed', type=int,
+                        help='seed the simulations, for repeatable results')
+    parser.add_argument('-j', '--processes', type=int, default=1,
+                        help='the number of processes to run the simulations '
+                             'in (default: %(default)s)')
+    parser.add_argument('--json', action='store_true',
+                        help='output the probabilities of each team as JSON')
+    parser.set_defaults(func=command)
@@ -0,0 +1,184 @@
+"""
+Shared SSH connections to the hosts a competition is deployed to.
+
+Each host gets a single OpenSSH "master" connection, which both the
+``git push`` to the host and the commands run on it are multiplexed over,
+so that each deploy step doesn't need its own connection and handshake.
+The master connections can also be left running for a while after the
+command exits, so that repeated deploys (such as for a series of delays)
+don't need to reconnect either.
+
+Since several hosts may be connected to at once, ssh never prompts: it
+authenticates only with keys (or an agent), and host keys are handled by
+:data:`HOST_KEY_POLICY`.
+"""
+
+import os
+import stat
+import subprocess
+import threading
+
+from six.moves import shlex_quote
+
+
+CONNECT_TIMEOUT_SECONDS = 2
+DEFAULT_PERSIST_SECONDS = 300
+"""How long idle master connections are left running for by default."""
+
+HOST_KEY_POLICY = 'accept-new'
+"""
+The ``StrictHostKeyChecking`` policy: the keys of hosts which haven't been
+connected to before are trusted and remembered (as the deploy did when it
+used paramiko), while connections to hosts whose keys have changed fail
+rather than prompting.
+"""
+
+
+def _make_private_dir(path):
+    if not os.path.isdir(path):
+        os.mkdir(path, 0o700)
+
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or \
+            stat.S_IMODE(info.st_mode) & 0o077:
+        msg = "{0} must be a directory which only you can access."
+        raise RuntimeError(msg.format(path))
+
+
+def get_control_dir():
+    """
+    Get the directory in which the master connections' sockets live. It's
+    within ``~/.ssh``, since anyone who can reach a socket can use its
+    connection, and the sockets are named by a hash of the connection's
+    details (``%C``) to keep their paths within the limit on the length of
+    socket paths.
+
+    :raise RuntimeError: If the directory isn't private to the current user.
+    """
+    ssh_dir = os.path.join(os.path.expanduser('~'), '.ssh')
+    path = os.path.join(ssh_dir, 'srcomp')
+    _make_private_dir(ssh_dir)
+    _make_private_dir(path)
+    return path
+
+
+class SSHConnections(object):
+    """
+    A manager of shared SSH connections to hosts, for use as a context
+    manager. Connections are made when first needed and closed on exit,
+    unless they're to persist.
+
+    :param str user: The user to connect as.
+    :param int persist: How long, in seconds, to leave each master
+                        connection running once it's idle, or 0 to close
+                        them on exit.
+    :param str control_dir: The directory for the masters' sockets, which
+                            defaults to :func:`get_control_dir`.
+    """
+
+    def __init__(self, user, persist=DEFAULT_PERSIST_SECONDS,
+                 control_dir=None):
+        self.user = user
+        self.persist = persist
+        self._control_dir = control_dir or get_control_dir()
+        self._connected = set()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def ssh_command(self):
+        """
+        The ``ssh`` command, with the options to share connections. Master
+        connections which are to be closed on exit persist until then.
+        """
+        control_path = os.path.join(self._control_dir, '%C')
+        return [
+            'ssh',
+            '-o', 'ControlMaster=auto',
+            '-o', 'ControlPath={0}'.format(control_path),
+            '-o', 'ControlPersist={0}'.format(self.persist or 'yes'),
+            '-o', 'ConnectTimeout={0}'.format(CONNECT_TIMEOUT_SECONDS),
+            '-o', 'BatchMode=yes',
+            '-o', 'StrictHostKeyChecking={0}'.format(HOST_KEY_POLICY),
+        ]
+
+    @property
+    def git_env(self):
+        """The environment for git commands to use the shared connections."""
+        env = dict(os.environ)
+        env['GIT_SSH_COMMAND'] = ' '.join(shlex_quote(piece)
+                                          for piece in self.ssh_command)
+        return env
+
+    def _target(self, host):
+        return '{0}@{1}'.format(self.user, host)
+
+    def connect(self, host):
+        """
+        Make sure there's a master connection to a host, reusing any which
+        is already running.
+
+        :return: Any output from making the connection, as text.
+        :raise RuntimeError: If the host can't be connected to.
+        """
+        target = self._target(host)
+
+        with self._lock:
+            if host in self._connected:
+                return ''
+
+        output = ''
+        check = self.ssh_command + ['-O', 'check', target]
+        if subprocess.call(check, stdout=subprocess.PIPE,
+                           stderr=subprocess.PIPE) != 0:
+            # The master stays in the background once this has finished,
+            # but its output is only that of this command
+            process = subprocess.Popen(self.ssh_command + [target, 'true'],
+                                       stdout=subprocess.PIPE,
+                                       stderr=subprocess.STDOUT,
+                                       universal_newlines=True)
+            output, _ = process.communicate()
+            if process.returncode != 0:
+                msg = "Failed to connect to {0}.".format(host)
+                if output:
+                    msg += '\n\n' + output
+                raise RuntimeError(msg)
+
+        with self._lock:
+            self._connected.add(host)
+
+        return output
+
+    def run(self, host, command):
+        """
+        Run a command on a host, over its master connection.
+
+        :return: A tuple of the command's exit status and its output and
+                 errors, as text.
+        """
+        self.connect(host)
+        process = subprocess.Popen(self.ssh_command + [self._target(host),
+                                                       command],
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE,
+                                   universal_newlines=True)
+        stdout, stderr = process.communicate()
+        return process.returncode, stdout, stderr
+
+    def close(self):
+        """Close the master connections, unless they're to persist."""
+        with self._lock:
+            hosts, self._connected = self._connected, set()
+
+        if self.persist:
+            return
+
+        for host in hosts:
+            subprocess.call(self.ssh_command + ['-O', 'exit',
+                                                self._target(host)],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
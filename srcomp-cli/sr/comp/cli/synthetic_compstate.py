@@ -0,0 +1,349 @@
+"""
+Generation of synthetic compstate repositories.
+
+The generated states are valid compstates which load as an ``SRComp``
+instance, but are otherwise meaningless. They are intended for measuring
+how the various parts of the system behave at scale.
+"""
+
+from __future__ import print_function, division
+
+from datetime import datetime, timedelta
+from itertools import product
+import string
+
+from dateutil.tz import tzutc
+
+
+TEAMS_PER_GAME = 4
+MATCH_SLOT_LENGTHS = {
+    'pre': 60,
+    'match': 180,
+    'post': 60,
+    'total': 300,
+}
+SHEPHERDING_AREAS = ('Blue', 'Green')
+DEFAULT_START = datetime(2016, 4, 16, 10, tzinfo=tzutc())
+
+SCORER_SOURCE = '''
+class Scorer(object):
+    def __init__(self, teams_data, arena_data):
+        self._teams_data = teams_data
+
+    def calculate_scores(self):
+        return {tla: info['score'] for tla, info in self._teams_data.items()}
+'''.lstrip()
+
+
+def make_tlas(num_teams):
+    """
+    Generate ``num_teams`` unique three letter team identifiers.
+
+    :param int num_teams: The number of identifiers to generate.
+    :return: A list of TLAs, in sorted order.
+    """
+
+    letters = string.ascii_uppercase
+    max_teams = len(letters) ** 3
+    if num_teams > max_teams:
+        raise ValueError("Cannot generate more than {0} TLAs.".format(max_teams))
+
+    tlas = (''.join(p) for p in product(letters, repeat=3))
+    return [tla for _, tla in zip(range(num_teams), tlas)]
+
+
+def make_arena_names(num_arenas):
+    """Generate ``num_arenas`` arena names (``A``, ``B``, etc.)."""
+    if not 0 < num_arenas <= len(string.ascii_uppercase):
+        raise ValueError("Unsupported number of arenas ({0}).".format(num_arenas))
+    return list(string.ascii_uppercase[:num_arenas])
+
+
+def build_league_matches(tlas, arena_names, rounds, random):
+    """
+    Build a simple league schedule in which each team appears once per
+    round. This makes no attempt to satisfy the constraints which the
+    league scheduler does; it only needs to be valid.
+
+    :return: A dict suitable for the ``matches`` key of ``league.yaml``.
+    """
+
+    per_slot = TEAMS_PER_GAME * len(arena_names)
+
+    matches = {}
+    for _ in range(rounds):
+        teams = list(tlas)
+        random.shuffle(teams)
+        overflow = -len(teams) % per_slot
+        teams += [None] * overflow
+
+        for n in range(0, len(teams), per_slot):
+            slot_teams = teams[n:n + per_slot]
+            slot = {}
+            for idx, arena in enumerate(arena_names):
+                game = slot_teams[idx * TEAMS_PER_GAME:(idx + 1) * TEAMS_PER_GAME]
+                if any(game):
+                    slot[arena] = game
+            matches[len(matches)] = slot
+
+    return matches
+
+
+def build_static_knockout(arena, start_time):
+    """
+    Build a static knockout configuration for a sixteen team, single arena
+    knockout: four quarter finals, two semi finals and a final.
+    """
+
+    slot = timedelta(seconds=MATCH_SLOT_LENGTHS['total'])
+    seeds = [['S1', 'S8', 'S9', 'S16'],
+             ['S4', 'S5', 'S12', 'S13'],
+             ['S2', 'S7', 'S10', 'S15'],
+             ['S3', 'S6', 'S11', 'S14']]
+    rounds = [
+        seeds,
+        [['000', '001', '010', '011'], ['020', '021', '030', '031']],
+        [['100', '101', '110', '111']],
+    ]
+
+    config = {}
+    time = start_time
+    for round_num, round_teams in enumerate(rounds):
+        config[round_num] = {}
+        for match_num, teams in enumerate(round_teams):
+            config[round_num][match_num] = {
+                'arena': arena,
+                'start_time': time,
+                'teams': teams,
+            }
+            time += slot
+        time += slot
+
+    return config
+
+
+def build_schedule(arena_names, num_slots, num_knockout_matches, num_delays,
+                   static_knockout=False, start=DEFAULT_START):
+    """
+    Build the content of a ``schedule.yaml`` with enough time for the given
+    numbers of league slots and knockout matches.
+    """
+
+    slot = timedelta(seconds=MATCH_SLOT_LENGTHS['total'])
+
+    league_start = start
+    league_end = league_start + slot * num_slots
+    league_max_end = league_end + timedelta(hours=1)
+
+    delays = []
+    if num_delays:
+        step = (league_end - league_start) / (num_delays + 1)
+        for n in range(1, num_delays + 1):
+            delays.append({'delay': 30, 'time': league_start + step * n})
+
+    knockout_start = league_max_end + timedelta(hours=1)
+    # Be generous; the knockout scheduler refuses to overrun its period
+    knockout_end = knockout_start + slot * (2 * num_knockout_matches + 20)
+
+    schedule = {
+        'timezone': 'UTC',
+        'match_slot_lengths': dict(MATCH_SLOT_LENGTHS),
+        'staging': {
+            'opens': 300,
+            'closes': 120,
+            'duration': 180,
+            'signal_shepherds': {area: 241 for area in SHEPHERDING_AREAS},
+            'signal_teams': 240,
+        },
+        'delays': delays,
+        'match_periods': {
+            'league': [{
+                'description': 'League',
+                'start_time': league_start,
+                'end_time': league_end,
+                'max_end_time': league_max_end,
+            }],
+            'knockout': [{
+                'description': 'Knockouts',
+                'start_time': knockout_start,
+                'end_time': knockout_end,
+            }],
+        },
+        'league': {'extra_spacing': []},
+        'knockout': {
+            'round_spacing': 300,
+            'final_delay': 300,
+            'single_arena': {
+                'rounds': 3,
+                'arenas': [arena_names[0]],
+            },
+        },
+    }
+
+    if static_knockout:
+        schedule['knockout']['static'] = True
+        schedule['static_knockout'] = build_static_knockout(arena_names[0],
+                                                            knockout_start)
+
+    return schedule
+
+
+def build_score_sheet(arena, num, teams, random):
+    """Build a score sheet for the given game, with arbitrary scores."""
+    sheet_teams = {}
+    for zone, tla in enumerate(teams):
+        if tla is None:
+            continue
+        sheet_teams[tla] = {
+            'zone': zone,
+            'score': int(random.random() * 20),
+            'present': True,
+        }
+    return {
+        'arena_id': arena,
+        'match_number': num,
+        'teams': sheet_teams,
+    }
+
+
+def count_knockout_matches(num_teams):
+    from sr.comp.knockout import first_round_seeding
+
+    matches = len(first_round_seeding(num_teams))
+    total = matches
+    while matches > 1:
+        matches //= 2
+        total += matches
+    return total
+
+
+def generate(path, num_teams=32, num_arenas=2, rounds=3, num_delays=3,
+             scored_fraction=1.0, static_knockout=False, seed='synthetic'):
+    """
+    Generate a synthetic compstate in a new git repository at ``path``.
+
+    :param str path: Where to create the compstate. Must not already contain
+                     a git repository.
+    :param int num_teams: The number of teams in the competition.
+    :param int num_arenas: The number of arenas in the competition.
+    :param int rounds: The number of times each team appears in the league.
+    :param int num_delays: The number of delays to spread over the league.
+    :param float scored_fraction: The fraction of league matches, counting
+                                  from the start, to generate scores for.
+    :param bool static_knockout: Whether to use a static knockout.
+    :param str seed: Seed for the generation of schedules and scores.
+    :return: The commit id of the generated state.
+    """
+
+    import os
+    import subprocess
+    import yaml
+
+    from sr.comp.stable_random import Random
+
+    if static_knockout and num_teams < 16:
+        raise ValueError("Static knockouts require at least 16 teams.")
+
+    random = Random()
+    random.seed(seed.encode('utf-8'))
+
+    tlas = make_tlas(num_teams)
+    arena_names = make_arena_names(num_arenas)
+    league = build_league_matches(tlas, arena_names, rounds, random)
+
+    num_knockout = count_knockout_matches(num_teams)
+    schedule = build_schedule(arena_names, len(league), num_knockout,
+                              num_delays, static_knockout)
+
+    if not os.path.exists(path):
+        os.makedirs(path)
+
+    def dump(relpath, data):
+        full_path = os.path.join(path, relpath)
+        dirname = os.path.dirname(full_path)
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+        with open(full_path, 'w') as f:
+            yaml.safe_dump(data, f, default_flow_style=False)
+
+    dump('teams.yaml', {'teams': {tla: {'name': 'Team {0}'.format(tla),
+                                        'rookie': n % 5 == 0}
+                                  for n, tla in enumerate(tlas)}})
+    dump('arenas.yaml', {
+        'arenas': {name: {'display_name': 'Arena {0}'.format(name)}
+                   for name in arena_names},
+        'corners': {n: {'colour': colour} for n, colour
+                    in enumerate(('#00ff00', '#ff6600', '#ff00ff', '#ffff00'))},
+    })
+    dump('schedule.yaml', schedule)
+    dump('league.yaml', {'matches': league})
+
+    # Split the teams evenly over the shepherding areas
+    n_areas = len(SHEPHERDING_AREAS)
+    regions = []
+    for idx, area in enumerate(SHEPHERDING_AREAS):
+        regions.append({'name': 'region-{0}'.format(area.lower()),
+                        'display_name': '{0} Region'.format(area),
+                        'teams': tlas[idx::n_areas]})
+    dump('layout.yaml', {'teams': regions})
+    dump('shepherding.yaml', {'shepherds': [
+        {'name': area, 'colour': area.lower(), 'regions': [region['name']]}
+        for area, region in zip(SHEPHERDING_AREAS, regions)
+    ]})
+
+    scored = int(len(league) * scored_fraction)
+    for num in range(scored):
+        for arena, teams in league[num].items():
+            sheet = build_score_sheet(arena, num, teams, random)
+            dump(os.path.join('league', arena, '{0:0>3}.yaml'.format(num)),
+                 sheet)
+
+    scoring_dir = os.path.join(path, 'scoring')
+    if not os.path.exists(scoring_dir):
+        os.makedirs(scoring_dir)
+    with open(os.path.join(scoring_dir, 'score.py'), 'w') as f:
+        f.write(SCORER_SOURCE)
+
+    def git(*args):
+        command = ('git', '-c', 'user.name=SRComp',
+                   '-c', 'user.email=srcomp@localhost') + args
+        return subprocess.check_output(command, cwd=path,
+                                       stderr=subprocess.STDOUT)
+
+    git('init', '--quiet')
+    git('add', '--all')
+    git('commit', '--quiet', '-m', 'Synthetic compstate')
+    return git('rev-parse', 'HEAD').decode('utf-8').strip()
+
+
+def command(settings):
+    state = generate(settings.path,
+                     num_teams=settings.teams,
+                     num_arenas=settings.arenas,
+                     rounds=settings.rounds,
+                     num_delays=settings.delays,
+                     scored_fraction=settings.scored,
+                     static_knockout=settings.static_knockout)
+    print("Generated synthetic compstate at {0} ({1}).".format(settings.path,
+                                                               state[:8]))
+
+
+def add_subparser(subparsers):
+    parser = subparsers.add_parser('make-synthetic',
+                                   help='generate a synthetic compstate, '
+                                        'for testing and benchmarking')
+    parser.add_argument('path', help='where to create the compstate')
+    parser.add_argument('-t', '--teams', type=int, default=32,
+                        help='number of teams (default: %(default)s)')
+    parser.add_argument('-a', '--arenas', type=int, default=2,
+                        help='number of arenas (default: %(default)s)')
+    parser.add_argument('-r', '--rounds', type=int, default=3,
+                        help='number of league rounds (default: %(default)s)')
+    parser.add_argument('-d', '--delays', type=int, default=3,
+                        help='number of delays (default: %(default)s)')
+    parser.add_argument('--scored', type=float, default=1.0,
+                        help='fraction of league matches to score '
+                             '(default: %(default)s)')
+    parser.add_argument('--static-knockout', action='store_true',
+                        help='use a static knockout')
+    parser.set_defaults(func=command)
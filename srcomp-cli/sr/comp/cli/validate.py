@@ -1,16 +1,30 @@
 
 def command(settings):
+    import json
+
     from sr.comp.comp import SRComp
-    from sr.comp.validation import validate
+    from sr.comp.raw_compstate import RawCompstate
+    from sr.comp.validation import count_errors, find_problems, \
+        report_findings
+    from sr.comp.validation_cache import find_problems_since_cached
+
+    if settings.incremental:
+        compstate = RawCompstate(settings.compstate, local_only=True)
+        findings = find_problems_since_cached(compstate)
+    else:
+        comp = SRComp(settings.compstate)
 
-    comp = SRComp(settings.compstate)
+        if settings.lax:
+            findings = []
+        else:
+            findings = find_problems(comp)
 
-    if settings.lax:
-        error_count = 0
+    if settings.json:
+        print(json.dumps([finding.as_dict() for finding in findings]))
     else:
-        error_count = validate(comp)
+        report_findings(findings)
 
-    exit(error_count)
+    exit(count_errors(findings))
 
 def add_subparser(subparsers):
     parser = subparsers.add_parser('validate',
@@ -19,4 +33,11 @@ def add_subparser(subparsers):
     parser.add_argument('-l', '--lax',
                         action='store_true',
                         help='only check if it loads, rather than run a validation')
+    parser.add_argument('-i', '--incremental',
+                        action='store_true',
+                        help='only re-check what has changed since the last '
+                             'validated commit, where possible')
+    parser.add_argument('--json',
+                        action='store_true',
+                        help='output the problems found as JSON')
     parser.set_defaults(func=command)
@@ -0,0 +1,60 @@
+import shutil
+import tempfile
+
+from nose.plugins.skip import SkipTest
+from nose.tools import eq_
+
+from sr.comp.cli.benchmark_api import (format_summary, percentile, Recorder,
+                                       run, summarise)
+from sr.comp.cli.synthetic_compstate import generate
+
+
+def test_percentile():
+    values = list(range(100))
+    eq_(percentile(values, 0.5), 50)
+    eq_(percentile(values, 0.99), 99)
+    eq_(percentile(values, 1), 99)
+    eq_(percentile([], 0.5), None)
+
+def test_summarise_attributes_requests_to_reloads():
+    times = iter([0])
+    recorder = Recorder(lambda: next(times))
+    recorder.requests = [
+        (0.5, '/state', 0.001, True),
+        (2.5, '/teams', 0.5, True),
+        (3.5, '/teams', 0.25, True),
+        (5.5, '/state', 0.002, False),
+    ]
+    recorder.reloads = [2, 3]
+
+    summary = summarise(recorder, duration=8, stall_window=2)
+
+    eq_(summary['requests'], 4)
+    eq_(summary['errors'], 1)
+    eq_(summary['throughput'], 0.5)
+    eq_(summary['steady']['count'], 2)
+    eq_([(r['time'], r['count'], r['max']) for r in summary['reloads']],
+        [(2, 1, 0.5), (3, 1, 0.25)])
+    eq_(summary['routes']['/teams']['max'], 0.5)
+
+    assert 'reload at 2.0s' in format_summary(summary)
+
+def test_run_in_process():
+    try:
+        from sr.comp.cli.benchmark_api import LocalTransport
+        import sr.comp.http
+    except ImportError:
+        raise SkipTest("sr.comp.http not installed")
+
+    path = tempfile.mkdtemp()
+    try:
+        generate(path, num_teams=8, num_arenas=1)
+        recorder = run(LocalTransport(path), path, ['A'], duration=1,
+                       streams=1, screens=1, reload_period=0.5, commit=True,
+                       speed=10)
+    finally:
+        shutil.rmtree(path)
+
+    routes = set(route for _, route, _, _ in recorder.requests)
+    assert {'/state', '/current', '/teams', '/matches'} <= routes, routes
+    eq_(len(recorder.reloads), 1)
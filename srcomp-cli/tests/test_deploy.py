@@ -0,0 +1,145 @@
+import threading
+
+from six import StringIO
+
+import mock
+from nose.tools import eq_, raises
+
+from sr.comp.cli.deploy import deploy_to, deploy_to_hosts, DeployResult, \
+    format_summary, get_current_state, run_deployments
+
+
+HOSTS = ['alpha', 'beta', 'gamma', 'delta']
+
+
+def fake_deploy_to(retcodes):
+    def deploy_to(compstate, connections, host, revision, verbose, output):
+        output.write("Deployed {0} to {1}\n".format(revision, host))
+        return retcodes.get(host, 0)
+    return deploy_to
+
+
+@mock.patch('sr.comp.cli.deploy.deploy_to', fake_deploy_to({}))
+def test_deploy_to_hosts():
+    results = list(deploy_to_hosts(None, None, HOSTS, 'abc', False, jobs=3,
+                                   keep_going=False))
+
+    eq_(sorted(results), sorted(
+        DeployResult(host, 0, "Deployed abc to {0}\n".format(host))
+        for host in HOSTS))
+
+
+def test_deploy_to_hosts_concurrently():
+    barrier = threading.Condition()
+    waiting = []
+
+    def deploy_to(compstate, connections, host, revision, verbose, output):
+        # Only succeeds if both deploys are under way at once
+        with barrier:
+            waiting.append(host)
+            barrier.notify_all()
+            if len(waiting) < 2:
+                barrier.wait(5)
+            return 0 if len(waiting) == 2 else 1
+
+    with mock.patch('sr.comp.cli.deploy.deploy_to', deploy_to):
+        results = list(deploy_to_hosts(None, None, HOSTS[:2], 'abc', False,
+                                       jobs=2, keep_going=False))
+
+    eq_(set(result.retcode for result in results), set([0]))
+
+
+@mock.patch('sr.comp.cli.deploy.deploy_to', fake_deploy_to({'alpha': 3}))
+def test_deploy_to_hosts_stops_after_failure():
+    results = list(deploy_to_hosts(None, None, HOSTS, 'abc', False, jobs=1,
+                                   keep_going=False))
+
+    eq_([(result.host, result.retcode) for result in results],
+        [('alpha', 3), ('beta', None), ('gamma', None), ('delta', None)])
+
+
+@mock.patch('sr.comp.cli.deploy.deploy_to', fake_deploy_to({'alpha': 3}))
+def test_deploy_to_hosts_keep_going():
+    results = list(deploy_to_hosts(None, None, HOSTS, 'abc', False, jobs=1,
+                                   keep_going=True))
+
+    eq_([(result.host, result.retcode) for result in results],
+        [('alpha', 3), ('beta', 0), ('gamma', 0), ('delta', 0)])
+
+
+def test_deploy_to_hosts_error():
+    deploy_to = mock.Mock(side_effect=IOError("Host unreachable"))
+
+    with mock.patch('sr.comp.cli.deploy.deploy_to', deploy_to):
+        result, = deploy_to_hosts(None, None, ['alpha'], 'abc', False,
+                                  jobs=1, keep_going=False)
+
+    eq_(result.retcode, 1)
+    assert "Host unreachable" in result.output, result.output
+
+
+def test_deploy_to_captures_output():
+    compstate = mock.Mock()
+    compstate.push.return_value = "To alpha\n * [new branch] abc\n"
+    connections = mock.Mock()
+    connections.connect.return_value = "Warning: added alpha\n"
+    connections.run.return_value = (0, "Updated\n", "")
+    output = StringIO()
+
+    retcode = deploy_to(compstate, connections, 'alpha', 'abc', True, output)
+
+    eq_(retcode, 0)
+    eq_(compstate.push.call_args[1]['return_output'], True)
+    text = output.getvalue()
+    for expected in ("added alpha", "new branch", "Updated"):
+        assert expected in text, text
+
+
+def test_deploy_to_push_fails():
+    compstate = mock.Mock()
+    compstate.push.side_effect = RuntimeError("Failed to push to alpha.\n\n"
+                                              "rejected")
+    connections = mock.Mock()
+    connections.connect.return_value = ''
+    output = StringIO()
+
+    retcode = deploy_to(compstate, connections, 'alpha', 'abc', False, output)
+
+    eq_(retcode, 1)
+    assert "rejected" in output.getvalue(), output.getvalue()
+
+
+@mock.patch('six.moves.urllib.request.urlopen',
+            mock.Mock(side_effect=IOError("timed out")))
+def test_get_current_state_failure():
+    with mock.patch('sys.stdout', StringIO()) as stdout:
+        eq_(get_current_state('alpha'), None)
+
+    assert "Failed to get state for alpha: timed out" in stdout.getvalue(), \
+        stdout.getvalue()
+
+
+def test_format_summary():
+    results = [DeployResult('alpha', 0, ''), DeployResult('beta', 2, ''),
+               DeployResult('gamma', None, '')]
+
+    lines = format_summary(results, ['delta'])
+
+    eq_(len(lines), 4)
+    assert 'alpha: deployed' in lines[0], lines
+    assert 'exit status: 2' in lines[1], lines
+    assert 'gamma: not attempted' in lines[2], lines
+    assert 'delta: skipped' in lines[3], lines
+
+
+@raises(SystemExit)
+@mock.patch('sr.comp.cli.deploy.deploy_to', fake_deploy_to({'beta': 2}))
+@mock.patch('sr.comp.cli.ssh_connections.get_control_dir',
+            mock.Mock(return_value='/tmp/ctl'))
+def test_run_deployments_failure():
+    args = mock.Mock(jobs=4, keep_going=True, skip_host_check=True,
+                     verbose=False, ssh_persist=0)
+    compstate = mock.Mock()
+    compstate.rev_parse.return_value = 'abc'
+
+    run_deployments(args, compstate, HOSTS)
@@ -0,0 +1,48 @@
+import json
+import shutil
+import tempfile
+
+from nose.tools import eq_
+
+from sr.comp.cli.export_scores import export_scores
+from sr.comp.cli.synthetic_compstate import generate
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+def load_table():
+    from sr.comp.comp import SRComp
+
+    path = tempfile.mkdtemp()
+    try:
+        generate(path, num_teams=8, num_arenas=1, scored_fraction=0.5)
+        return SRComp(path).scores.table
+    finally:
+        shutil.rmtree(path)
+
+
+def test_export_csv():
+    table = load_table()
+    assert len(table) > 0
+
+    output = StringIO()
+    export_scores(table, 'csv', output)
+
+    lines = output.getvalue().splitlines()
+    eq_(lines[0].split(','), ['type', 'arena', 'num', 'team', 'game_points',
+                              'league_points', 'position', 'disqualified'])
+    eq_(len(lines), len(table) + 1)
+
+
+def test_export_json():
+    table = load_table()
+
+    output = StringIO()
+    export_scores(table, 'json', output)
+
+    columns = json.loads(output.getvalue())
+    eq_(columns['team'], list(table.column('team')))
+    eq_(set(columns['type']), set(['league']))
@@ -1,5 +1,6 @@
 
-from sr.comp.cli.import_schedule import get_id_subsets, build_schedule
+from sr.comp.cli.import_schedule import (build_schedule, get_id_subsets,
+                                         load_ids_schedule)
 
 
 def test_num_ids_equasl_num_teams():
@@ -83,3 +84,46 @@ def test_build_schedule_appaerance_order():
     assert expected_matches == matches, "Wrong matches"
 
     assert bad == [], "Should not be any 'bad' matches"
+
+def test_four_spare_ids():
+    ids = list(range(6))
+    num_teams = 2
+
+    subsets = list(get_id_subsets(ids, num_teams))
+
+    assert len(subsets) == 15, "Should have as many maps as valid permutations"
+    assert len(set(tuple(s) for s in subsets)) == 15, "Subsets should be unique"
+
+def test_build_schedule_many_spare_ids():
+    lines = ['0|1|2|3|4|5|6|7', '8|9|10|11|12|13|14|15',
+             '0|4|8|12|1|5|9|13', '2|6|10|14|3|7|11|15']
+    teams = ['ABC', 'DEF', 'GHI', 'JKL', 'MNO', 'PQR', 'STU', 'VWX']
+
+    matches, bad = build_schedule(lines, '', teams, ['A', 'B'])
+
+    # Each of the teams must be placed exactly twice
+    placed = [tla for match in matches.values()
+                  for game in match.values()
+                  for tla in game if tla]
+    assert sorted(placed) == sorted(teams * 2), placed
+
+    # Every id appears in two of the eight games, so excluding eight ids
+    # leaves 16 empty places. The best we can do is spread them evenly.
+    assert len(bad) == 8, bad
+    assert all(b.num_teams == 2 for b in bad), bad
+
+def test_best_fit_matches_exhaustive_search():
+    from sr.comp.cli.import_schedule import (are_better_matches,
+                                             build_matches, get_best_fit)
+
+    lines = ['0|1|2|3', '4|5|6|7', '0|2|4|6', '1|3|5|7', '0|5|3|6']
+    teams = ['ABC', 'DEF', 'GHI', 'JKL', 'MNO']
+    ids, schedule = load_ids_schedule(lines)
+
+    best = None
+    for subset in get_id_subsets(ids, len(teams)):
+        candidate = build_matches(dict(zip(subset, teams)), schedule, ['A'])
+        if best is None or are_better_matches(best[1], candidate[1]):
+            best = candidate
+
+    assert best == get_best_fit(ids, teams, schedule, ['A'])
@@ -0,0 +1,28 @@
+import shutil
+import sys
+import tempfile
+
+from sr.comp.cli.profile_load import PhaseProfiler, format_phases, profile_load
+from sr.comp.cli.synthetic_compstate import generate
+
+
+def test_profile_load():
+    path = tempfile.mkdtemp()
+    try:
+        generate(path, num_teams=8, num_arenas=1, scored_fraction=0.5)
+        phases = profile_load(path, PhaseProfiler())
+    finally:
+        shutil.rmtree(path)
+
+    names = [p['phase'] for p in phases]
+    for name in ('teams', 'scores.league', 'schedule', 'knockout', 'awards',
+                 'venue'):
+        assert name in names, names
+
+    by_name = {p['phase']: p for p in phases}
+    if hasattr(sys, 'addaudithook'):
+        assert by_name['teams']['files'] == 1, by_name['teams']
+    assert by_name['teams']['peak_memory'] is None, "Memory wasn't traced"
+
+    table = format_phases(phases)
+    assert table.splitlines()[-1].startswith('total'), table
@@ -0,0 +1,48 @@
+from collections import OrderedDict
+import shutil
+import tempfile
+
+from nose.tools import eq_
+
+from sr.comp.cli.project_knockouts import format_projection
+from sr.comp.cli.synthetic_compstate import generate
+
+
+def test_format_projection():
+    projection = OrderedDict([
+        ('ABC', [1, 0.75, 0.5]),
+        ('DEF', [0.5, 0.25, 0]),
+        ('GHI', [0, 0, 0]),
+    ])
+
+    lines = format_projection(projection, 2)
+
+    eq_(lines, [
+        '    TLA     Semi    Final      Win',
+        '    ABC   100.0%    75.0%    50.0%',
+        '    DEF    50.0%    25.0%     0.0%',
+    ])
+
+
+def test_project_synthetic():
+    from sr.comp.comp import SRComp
+    from sr.comp.projection import KnockoutProjection
+
+    path = tempfile.mkdtemp()
+    try:
+        generate(path, num_teams=16, num_arenas=2, scored_fraction=0.5)
+        comp = SRComp(path)
+    finally:
+        shutil.rmtree(path)
+
+    projector = KnockoutProjection(comp.schedule, comp.scores)
+    projection = projector.project(200, seed=1)
+
+    eq_(len(projection), 16)
+    win = len(projector.bracket)
+    total = sum(probabilities[win] for probabilities in projection.values())
+    assert abs(total - 1) < 1e-9, total
+
+    first_round = sum(len(match) for match in projector.bracket[0])
+    total = sum(probabilities[0] for probabilities in projection.values())
+    assert abs(total - first_round) < 1e-9, total
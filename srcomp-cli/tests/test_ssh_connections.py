@@ -0,0 +1,145 @@
+import os
+import shutil
+import tempfile
+
+import mock
+from nose.tools import eq_
+
+from sr.comp.cli.ssh_connections import get_control_dir, HOST_KEY_POLICY, \
+    SSHConnections
+
+
+def build_connections(persist=0):
+    return SSHConnections('srcomp', persist=persist, control_dir='/tmp/ctl')
+
+
+def test_ssh_command():
+    command = build_connections(persist=60).ssh_command
+
+    eq_(command[0], 'ssh')
+    assert 'ControlMaster=auto' in command, command
+    assert 'ControlPath=/tmp/ctl/%C' in command, command
+    assert 'ControlPersist=60' in command, command
+
+
+def test_ssh_command_never_prompts():
+    command = build_connections().ssh_command
+
+    assert 'BatchMode=yes' in command, command
+    assert 'StrictHostKeyChecking={0}'.format(HOST_KEY_POLICY) in command, \
+        command
+
+
+def test_ssh_command_no_persist():
+    assert 'ControlPersist=yes' in build_connections().ssh_command
+
+
+def test_git_env():
+    env = build_connections().git_env
+    assert env['GIT_SSH_COMMAND'].startswith('ssh -o ControlMaster=auto')
+    assert 'ControlPath=/tmp/ctl/%C' in env['GIT_SSH_COMMAND']
+
+
+def mock_process(returncode, output=''):
+    process = mock.Mock(returncode=returncode)
+    process.communicate.return_value = (output, None)
+    return process
+
+
+@mock.patch('subprocess.Popen')
+@mock.patch('subprocess.call')
+def test_connect_once(mock_call, mock_popen):
+    # No master yet, then starting one works
+    mock_call.return_value = 1
+    mock_popen.return_value = mock_process(0, "Warning: bees.\n")
+    connections = build_connections()
+
+    eq_(connections.connect('alpha'), "Warning: bees.\n")
+    eq_(connections.connect('alpha'), '')
+
+    eq_(mock_call.call_count, 1)
+    eq_(mock_call.call_args[0][0][-3:], ['-O', 'check', 'srcomp@alpha'])
+    eq_(mock_popen.call_count, 1)
+    eq_(mock_popen.call_args[0][0][-2:], ['srcomp@alpha', 'true'])
+
+
+@mock.patch('subprocess.call')
+def test_connect_existing_master(mock_call):
+    mock_call.return_value = 0
+
+    build_connections().connect('alpha')
+
+    eq_(mock_call.call_count, 1)
+
+
+@mock.patch('subprocess.Popen')
+@mock.patch('subprocess.call')
+def test_connect_fails(mock_call, mock_popen):
+    mock_call.return_value = 255
+    mock_popen.return_value = mock_process(255, "Connection refused\n")
+
+    try:
+        build_connections().connect('alpha')
+    except RuntimeError as e:
+        assert "Connection refused" in str(e), e
+    else:
+        raise AssertionError("Should have failed to connect.")
+
+
+@mock.patch('subprocess.call')
+def test_close(mock_call):
+    mock_call.return_value = 0
+
+    with build_connections() as connections:
+        connections.connect('alpha')
+
+    eq_(mock_call.call_count, 2)
+    eq_(mock_call.call_args[0][0][-3:], ['-O', 'exit', 'srcomp@alpha'])
+
+
+@mock.patch('subprocess.call')
+def test_close_persist(mock_call):
+    mock_call.return_value = 0
+
+    with build_connections(persist=60) as connections:
+        connections.connect('alpha')
+
+    eq_(mock_call.call_count, 1)
+
+
+class TempHome(object):
+    def __enter__(self):
+        self.path = tempfile.mkdtemp()
+        self.patch = mock.patch('os.path.expanduser',
+                                mock.Mock(return_value=self.path))
+        self.patch.start()
+        return self
+
+    def __exit__(self, *args):
+        self.patch.stop()
+        shutil.rmtree(self.path)
+
+
+def test_get_control_dir():
+    with TempHome() as home:
+        path = get_control_dir()
+
+        eq_(path, os.path.join(home.path, '.ssh', 'srcomp'))
+        eq_(os.stat(path).st_mode & 0o777, 0o700)
+        eq_(os.stat(os.path.dirname(path)).st_mode & 0o777, 0o700)
+        eq_(get_control_dir(), path)
+
+
+def test_get_control_dir_not_private():
+    with TempHome() as home:
+        path = os.path.join(home.path, '.ssh', 'srcomp')
+        os.makedirs(path)
+        os.chmod(os.path.dirname(path), 0o700)
+        os.chmod(path, 0o777)
+
+        try:
+            get_control_dir()
+        except RuntimeError as e:
+            assert path in str(e), e
+        else:
+            raise AssertionError("Should have refused the directory.")
@@ -0,0 +1,59 @@
+
+import shutil
+import tempfile
+
+from sr.comp.cli.benchmark_schedulers import build_seed_schedule
+from sr.comp.cli.import_schedule import load_ids_schedule
+from sr.comp.cli.synthetic_compstate import generate, make_tlas
+from sr.comp.stable_random import Random
+
+
+def test_make_tlas():
+    tlas = make_tlas(1000)
+    assert len(tlas) == 1000
+    assert len(set(tlas)) == 1000, "TLAs should be unique"
+    assert all(len(tla) == 3 for tla in tlas)
+
+def test_generate_loads_and_validates():
+    from sr.comp.comp import SRComp
+    from sr.comp.validation import validate
+
+    path = tempfile.mkdtemp()
+    try:
+        state = generate(path, num_teams=20, num_arenas=2, rounds=2,
+                         num_delays=2, scored_fraction=0.5)
+        comp = SRComp(path)
+
+        assert comp.state == state
+        assert len(comp.teams) == 20
+        assert list(comp.arenas.keys()) == ['A', 'B']
+        assert len(comp.schedule.delays) == 2
+        assert len(comp.scores.league.game_points) > 0
+        assert validate(comp) == 0
+    finally:
+        shutil.rmtree(path)
+
+def test_generate_static_knockout():
+    from sr.comp.comp import SRComp
+
+    path = tempfile.mkdtemp()
+    try:
+        generate(path, num_teams=16, num_arenas=1, static_knockout=True)
+        comp = SRComp(path)
+
+        rounds = [len(r) for r in comp.schedule.knockout_rounds]
+        assert rounds == [4, 2, 1], rounds
+    finally:
+        shutil.rmtree(path)
+
+def test_build_seed_schedule():
+    random = Random()
+    random.seed(b'test')
+    lines = build_seed_schedule(18, 2, 3, random)
+
+    ids, schedule = load_ids_schedule(lines)
+
+    assert len(ids) == 18, "All ids should be used"
+    for match_ids in schedule:
+        assert len(match_ids) % 4 == 0, match_ids
+        assert len(match_ids) <= 8, match_ids
@@ -22,6 +22,9 @@ setup(
         'simplejson >=3.6, <4',
         'python-dateutil >=2.2, <3',
     ],
+    extras_require={
+        'async': ['uvicorn'],
+    },
     setup_requires=[
         'nose >=1.3, <2',
         'Sphinx >=1.3, <2',
@@ -11,10 +11,25 @@ parser.add_argument("-p", "--port", type=int, default=5112,
                     help="Port to listen on.")
 parser.add_argument("--no-reloader", action="store_false", default=True,
                     dest="reloader", help="Disable the reloader.")
+parser.add_argument("--async", action="store_true", dest="async_",
+                    help="Serve using asyncio (requires Python 3.5+ and "
+                         "uvicorn), for many long-lived connections.")
+parser.add_argument("-w", "--workers", type=int,
+                    help="Serve using this many worker processes, which "
+                         "share a single loader of the compstate.")
 args = parser.parse_args()
 
 config.configure_logging_relative('logging-stdout.ini')
 
-app.config["COMPSTATE"] = args.compstate
-app.debug = True
-app.run(host='0.0.0.0', port=args.port, use_reloader=args.reloader)
+if args.async_:
+    from sr.comp.http import asgi
+    asgi.run(args.compstate, port=args.port)
+elif args.workers:
+    from sr.comp.http import prefork
+    prefork.run(args.compstate, port=args.port, workers=args.workers)
+else:
+    app.config["COMPSTATE"] = args.compstate
+    app.debug = True
+    # Threaded, so that requests which wait for a new state don't block
+    app.run(host='0.0.0.0', port=args.port, use_reloader=args.reloader,
+            threaded=True)
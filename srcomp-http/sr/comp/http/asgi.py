@@ -0,0 +1,327 @@
+"""
+An asyncio (ASGI) serving mode for the competition API.
+
+This serves the same routes as :mod:`sr.comp.http.server`, but from a single
+process which can hold open many long-lived connections (such as those of
+the ``/stream`` endpoint) without needing a thread for each of them.
+
+All requests are served from a shared snapshot of the competition, which is
+kept up to date by a background task. Loading new states is done in an
+executor, so it never blocks the event loop. Requests for the regular routes
+are handled by the Flask application, also in an executor, since building
+their responses is CPU bound.
+
+This module requires Python 3.5 or later.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import io
+import json
+import logging
+import os.path
+import sys
+from urllib.parse import parse_qs, urlencode
+
+from werkzeug.exceptions import BadRequest
+
+from sr.comp.http.server import (app, comp_man, get_state_wait_timeout,
+                                 SNAPSHOT_ENVIRON_KEY)
+
+
+POLL_PERIOD = 1
+"""How often, in seconds, to check for a new state of the competition."""
+
+STREAM_KEEPALIVE = 15
+"""How often, in seconds, to send a comment to idle ``/stream`` clients."""
+
+
+def build_environ(scope, body):
+    """Build a WSGI environ from an ASGI HTTP connection scope."""
+
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    # WSGI uses 'bytes-as-latin-1' strings for the path
+    path = scope['path'].encode('utf-8').decode('latin-1')
+
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': path,
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': 'HTTP/{0}'.format(scope['http_version']),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        if name in environ:
+            value = environ[name] + ',' + value
+        environ[name] = value
+
+    return environ
+
+
+def call_wsgi(wsgi_app, environ):
+    """
+    Call a WSGI application, returning its status code, headers and body.
+    """
+
+    response = []
+
+    def start_response(status, headers, exc_info=None):
+        response[:] = [status, headers]
+
+    result = wsgi_app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+
+    status, headers = response
+    headers = [(name.encode('latin-1'), value.encode('latin-1'))
+               for name, value in headers]
+    return int(status.split(' ')[0]), headers, body
+
+
+async def wait_for_disconnect(receive):
+    """Wait until the client of an ASGI HTTP connection disconnects."""
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+class AsyncServer(object):
+    """
+    An ASGI application serving the competition API.
+
+    :param wsgi_app: The WSGI application which serves the regular routes.
+    :param comp_man: The :class:`sr.comp.http.manager.SRCompManager` which
+                     loads the competition.
+    :param float poll_period: How often to check for a new state.
+    :param int max_workers: The maximum number of threads used for handling
+                            regular requests.
+    """
+
+    def __init__(self, wsgi_app=app, comp_man=comp_man,
+                 poll_period=POLL_PERIOD, max_workers=None):
+        self.wsgi_app = wsgi_app
+        self.comp_man = comp_man
+        self.poll_period = poll_period
+
+        self.snapshot = None
+        """The :class:`sr.comp.http.manager.SnapshotManager` being served."""
+
+        self._request_executor = ThreadPoolExecutor(max_workers=max_workers)
+        # Separate from the requests, so that they can't delay a reload
+        self._reload_executor = ThreadPoolExecutor(max_workers=1)
+
+        self._started = None
+        self._watcher = None
+        self._changed = None
+
+    async def _reload(self):
+        loop = asyncio.get_event_loop()
+        snapshot = await loop.run_in_executor(self._reload_executor,
+                                              self.comp_man.snapshot)
+
+        previous = self.snapshot
+        if previous is None or snapshot.comp is not previous.comp:
+            self.snapshot = snapshot
+
+            # Wake everything waiting for the state to change
+            changed, self._changed = self._changed, asyncio.Event()
+            if changed is not None:
+                changed.set()
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.poll_period)
+            try:
+                await self._reload()
+            except Exception:
+                logging.exception("Failed to load new compstate")
+
+    async def start(self):
+        """Load the competition and start watching for changes to it."""
+        if self._started is None:
+            self._started = asyncio.ensure_future(self._reload())
+            self._started.add_done_callback(self._start_watching)
+        await asyncio.shield(self._started)
+
+    def _start_watching(self, future):
+        if future.cancelled() or future.exception() is not None:
+            # Try again on the next request
+            self._started = None
+            return
+        self._watcher = asyncio.ensure_future(self._watch())
+
+    async def stop(self):
+        """Stop watching for changes and release the executors."""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+        self._started = None
+        self._request_executor.shutdown(wait=False)
+        self._reload_executor.shutdown(wait=False)
+
+    async def wait_for_change(self, state, timeout):
+        """
+        Wait until the state being served differs from the given one, or
+        until the timeout (in seconds) expires.
+
+        :return: The state being served.
+        """
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout
+        while self.snapshot.comp.state == state:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return self.snapshot.comp.state
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.start()
+            if scope['path'] == '/stream':
+                await self._stream(scope, receive, send)
+            else:
+                if scope['path'] == '/state':
+                    scope = await self._wait_for_state(scope)
+                await self._wsgi(scope, receive, send)
+        else:
+            raise ValueError("Unsupported connection type {0!r}."
+                             .format(scope['type']))
+
+    async def _wait_for_state(self, scope):
+        """
+        Do the waiting for a new state requested of ``/state`` here, rather
+        than tying up a thread with it.
+
+        :return: The scope with which to complete the request.
+        """
+        query = parse_qs(scope['query_string'].decode('latin-1'))
+        if 'wait' not in query:
+            return scope
+
+        args = {key: values[0] for key, values in query.items()}
+        try:
+            timeout = get_state_wait_timeout(args)
+        except BadRequest:
+            # Let the application report it
+            return scope
+
+        await self.wait_for_change(args['wait'], timeout)
+
+        del query['wait']
+        scope = dict(scope)
+        scope['query_string'] = urlencode(query, doseq=True).encode('latin-1')
+        return scope
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.start()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed',
+                                'message': str(e)})
+                else:
+                    await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _wsgi(self, scope, receive, send):
+        body = b''
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get('body', b'')
+            more_body = message.get('more_body', False)
+
+        environ = build_environ(scope, body)
+        environ[SNAPSHOT_ENVIRON_KEY] = self.snapshot
+
+        loop = asyncio.get_event_loop()
+        status, headers, body = await loop.run_in_executor(
+            self._request_executor, call_wsgi, self.wsgi_app, environ)
+
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _stream(self, scope, receive, send):
+        """
+        Send a server-sent event each time the state of the competition
+        changes, starting with the current state.
+        """
+
+        headers = [(b'content-type', b'text/event-stream'),
+                   (b'cache-control', b'no-cache')]
+        for name, _ in scope['headers']:
+            if name.lower() == b'origin':
+                headers.append((b'access-control-allow-origin', b'*'))
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': headers})
+
+        disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+        try:
+            state = None
+            while True:
+                waiter = asyncio.ensure_future(
+                    self.wait_for_change(state, STREAM_KEEPALIVE))
+                await asyncio.wait([waiter, disconnected],
+                                   return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.done():
+                    waiter.cancel()
+                    return
+
+                new_state = waiter.result()
+                if new_state != state:
+                    state = new_state
+                    data = json.dumps({'state': state})
+                    event = 'event: state\ndata: {0}\n\n'.format(data)
+                else:
+                    event = ': keepalive\n\n'
+                await send({'type': 'http.response.body',
+                            'body': event.encode('utf-8'),
+                            'more_body': True})
+        finally:
+            disconnected.cancel()
+
+
+def run(compstate, host='0.0.0.0', port=5112):
+    """Serve the competition at the given path, using ``uvicorn``."""
+    try:
+        import uvicorn
+    except ImportError:
+        print("'uvicorn' is required for the asynchronous server.")
+        exit(1)
+
+    app.config['COMPSTATE'] = compstate
+    comp_man.root_dir = os.path.realpath(compstate)
+    uvicorn.run(AsyncServer(), host=host, port=port, log_config=None)
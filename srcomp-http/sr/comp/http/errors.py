@@ -1,4 +1,4 @@
-from werkzeug.exceptions import BadRequest
+from werkzeug.exceptions import BadRequest, NotFound
 
 
 # 400
@@ -7,3 +7,18 @@ class UnknownMatchFilter(BadRequest):
 
     def __init__(self, name):
         self.details = {'name': name}
+
+
+class InvalidScenario(BadRequest):
+    description = 'Invalid what-if scenario.'
+
+    def __init__(self, index, error):
+        self.details = {'scenario': index, 'error': str(error)}
+
+
+# 404
+class UnknownState(NotFound):
+    description = 'Unknown or expired state.'
+
+    def __init__(self, state):
+        self.details = {'state': state}
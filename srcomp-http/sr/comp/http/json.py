@@ -6,7 +6,8 @@ from flask import g
 import flask.json
 
 from sr.comp.match_period import Match
-from sr.comp.http.query_utils import match_json_info
+from sr.comp.scores import TeamMapping
+from sr.comp.http.metrics import metrics, JSON_ENCODE_DURATION
 
 
 class JsonEncoder(flask.json.JSONEncoder):
@@ -26,11 +27,17 @@ class JsonEncoder(flask.json.JSONEncoder):
                                           tuple_as_array=False,
                                           **kwargs)
 
+    def encode(self, obj):
+        with metrics.time(JSON_ENCODE_DURATION):
+            return super(JsonEncoder, self).encode(obj)
+
     def default(self, obj):
         if isinstance(obj, Enum):
             return obj.value
         elif isinstance(obj, Match):
             comp = g.comp_man.get_comp()
-            return match_json_info(comp, obj)
+            return g.comp_man.get_match_infos(comp).get(obj)
+        elif isinstance(obj, TeamMapping):
+            return dict(obj)
         else:
             return super(JsonEncoder, self).default(obj)
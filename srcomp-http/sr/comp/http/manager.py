@@ -1,17 +1,34 @@
 """Routines for managing a Compstate instance."""
 
+from collections import OrderedDict
 import contextlib
 import errno
 import fcntl
 import logging
 import os
+import threading
 import time
 
+try:
+    from time import monotonic
+except ImportError:
+    # Python 2
+    from time import time as monotonic
+
 from sr.comp.comp import SRComp
+from sr.comp.http.metrics import metrics, RELOAD_CHECK_DURATION
+from sr.comp.http.query_utils import MatchInfoCache
+from sr.comp.raw_compstate import UPDATE_FILE
+from sr.comp.timing import PhaseTimer
 
 
 LOCK_FILE = ".update-lock"
-UPDATE_FILE = ".update-pls"
+
+SNAPSHOT_HISTORY = 10
+"""The number of recently loaded states to keep."""
+
+WAIT_POLL_PERIOD = 1
+"""How often, in seconds, to check for updates while waiting for one."""
 
 
 def update_lock_path(compstate_path):
@@ -75,13 +92,53 @@ class SRCompManager(object):
         self._update_pls_time = None
         """The time the update pls file was last modified."""
 
+        self.comp = None
+        """The most recently loaded competition, if any."""
+
+        self.match_infos = None
+        """The cached JSON information about the matches in ``comp``."""
+
+        self._snapshots = OrderedDict()
+        """The recently loaded states, mapped to their comp and match infos."""
+
+        self.diffs = {}
+        """Cached differences between pairs of the recently loaded states."""
+
+        self._lock = threading.Lock()
+        self._reloaded = threading.Condition()
+
     def _load(self):
         lock_path = update_lock_path(self.root_dir)
         with share_lock(lock_path):
             "grab a lock & reload"
             logging.info("Loading compstate from {0}".format(self.root_dir))
-            self.comp = SRComp(self.root_dir)
+            # Parts of the previous state which are unaffected by the changes
+            # since are reused, rather than rebuilt
+            comp = SRComp(self.root_dir, previous=self.comp)
+            timer = PhaseTimer()
+            with timer.phase('match_infos'):
+                self.match_infos = MatchInfoCache(comp, self.match_infos)
+            self.comp = comp
             self.update_time = time.time()
+            self._remember(comp, self.match_infos)
+
+        phases = OrderedDict(comp.load_times)
+        phases.update(timer.durations)
+        metrics.observe_reload(phases)
+
+    def _remember(self, comp, match_infos):
+        state = comp.state
+        self._snapshots.pop(state, None)
+        self._snapshots[state] = (comp, match_infos)
+
+        while len(self._snapshots) > SNAPSHOT_HISTORY:
+            old_state, _ = self._snapshots.popitem(last=False)
+            for key in list(self.diffs.keys()):
+                if old_state in key:
+                    del self.diffs[key]
+
+        with self._reloaded:
+            self._reloaded.notify_all()
 
     def _state_changed(self):
         update_path = update_pls_path(self.root_dir)
@@ -98,12 +155,117 @@ class SRCompManager(object):
 
         return False
 
-    def get_comp(self):
+    def _needs_load(self):
         if self.update_time is None:
-            self._load()
+            return True
+
+        # reload if the data is more than 5 seconds old and the state has
+        # changed
+        return time.time() - self.update_time > 5 and self._state_changed()
+
+    def get_comp(self):
+        with self._lock:
+            with metrics.time(RELOAD_CHECK_DURATION):
+                needs_load = self._needs_load()
+            if needs_load:
+                self._load()
+
+            return self.comp
+
+    def wait_for_change(self, state, timeout):
+        """
+        Wait until the state of the competition differs from the given one.
 
-        elif time.time() - self.update_time > 5 and self._state_changed():
-            # data is more than 5 seconds old and the state has changed, reload
-            self._load()
+        :param str state: The commit of the known state.
+        :param float timeout: The maximum time to wait, in seconds.
+        :return: The ``SRComp`` instance for the current state, which will
+                 be for the given state if the timeout expired.
+        """
+        deadline = monotonic() + timeout
+        comp = self.get_comp()
+        while comp.state == state:
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                break
 
+            with self._reloaded:
+                # Updates are only noticed when checked for, so wake up
+                # periodically to do so
+                self._reloaded.wait(min(remaining, WAIT_POLL_PERIOD))
+
+            comp = self.get_comp()
+
+        return comp
+
+    def get_match_infos(self, comp):
+        """
+        Get the cached JSON information about the matches in the given
+        competition, which should have come from :meth:`get_comp`.
+        """
+        match_infos = self.match_infos
+        if match_infos is None or match_infos.comp is not comp:
+            match_infos = MatchInfoCache(comp)
+        return match_infos
+
+    def snapshot(self, state=None):
+        """
+        Get a manager for a single state of the competition.
+
+        :param str state: The commit of a recently loaded state, or ``None``
+                          for the current state.
+        :return: A :class:`SnapshotManager` for the state.
+        :raise KeyError: If the state is not one which was recently loaded.
+        """
+        comp = self.get_comp()
+        if state is None:
+            state = comp.state
+        return self.recent_snapshot(state)
+
+    def recent_snapshot(self, state):
+        """
+        Get a manager for a recently loaded state of the competition, without
+        checking for updates to the state.
+
+        :param str state: The commit of the state.
+        :return: A :class:`SnapshotManager` for the state.
+        :raise KeyError: If the state is not one which was recently loaded.
+        """
+        comp, match_infos = self._snapshots[state]
+        return SnapshotManager(self, comp, match_infos)
+
+
+class SnapshotManager(object):
+    """
+    A manager which always returns the same ``SRComp`` instance. This allows
+    several resources to be built from a single consistent state of the
+    competition. Instances are obtained from :meth:`SRCompManager.snapshot`.
+    """
+
+    def __init__(self, comp_man, comp, match_infos):
+        self._comp_man = comp_man
+        self.root_dir = comp_man.root_dir
+        self.comp = comp
+        self.match_infos = match_infos
+
+    @property
+    def diffs(self):
+        return self._comp_man.diffs
+
+    def get_comp(self):
         return self.comp
+
+    def get_match_infos(self, comp):
+        return self.match_infos
+
+    def wait_for_change(self, state, timeout):
+        """See :meth:`SRCompManager.wait_for_change`."""
+        if state != self.comp.state:
+            return self.comp
+        return self._comp_man.wait_for_change(state, timeout)
+
+    def snapshot(self, state=None):
+        """See :meth:`SRCompManager.snapshot`, for which ``None`` refers to
+        the state of this snapshot."""
+        if state is None or state == self.comp.state:
+            return self
+        return self._comp_man.recent_snapshot(state)
@@ -0,0 +1,207 @@
+"""
+Instrumentation of the serving of the competition API.
+
+Measurements are kept in memory, per process, and can be fetched from the
+``/metrics`` endpoint in the Prometheus text format, so that they can either
+be read directly or scraped.
+"""
+
+from bisect import bisect_left
+from collections import OrderedDict
+import contextlib
+import threading
+from timeit import default_timer
+
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+"""The upper bounds, in seconds, of the buckets of the histograms."""
+
+REQUEST_DURATION = 'srcomp_http_request_duration_seconds'
+RELOAD_CHECK_DURATION = 'srcomp_http_reload_check_duration_seconds'
+RELOAD_DURATION = 'srcomp_http_reload_duration_seconds'
+RELOAD_PHASE_DURATION = 'srcomp_http_reload_phase_duration_seconds'
+JSON_ENCODE_DURATION = 'srcomp_http_json_encode_duration_seconds'
+CACHE_HITS = 'srcomp_http_cache_hits_total'
+CACHE_MISSES = 'srcomp_http_cache_misses_total'
+CACHE_HIT_RATIO = 'srcomp_http_cache_hit_ratio'
+
+DESCRIPTIONS = {
+    REQUEST_DURATION: 'Time taken to handle requests, by route.',
+    RELOAD_CHECK_DURATION: 'Time taken checking whether to reload the '
+                           'compstate.',
+    RELOAD_DURATION: 'Time taken to reload the compstate.',
+    RELOAD_PHASE_DURATION: 'Time taken by each phase of reloading the '
+                           'compstate.',
+    JSON_ENCODE_DURATION: 'Time taken to encode responses as JSON.',
+    CACHE_HITS: 'Lookups which were found in a cache, by cache.',
+    CACHE_MISSES: 'Lookups which were not found in a cache, by cache.',
+    CACHE_HIT_RATIO: 'Proportion of the lookups in a cache which were '
+                     'found, by cache.',
+}
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"') \
+                         .replace('\n', '\\n')
+
+    return '{' + ','.join('{0}="{1}"'.format(name, escape(value))
+                          for name, value in labels) + '}'
+
+
+class Histogram(object):
+    """
+    Counts of observed values, in buckets.
+
+    :param buckets: The (sorted) upper bounds of the buckets.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        """The number of values in each bucket, the last of which is for
+        values larger than all of the bounds."""
+
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        """
+        Get the number of values at most each bound, as pairs of the bound
+        and the count. The last bound is ``+Inf``.
+        """
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class Metrics(object):
+    """
+    A thread-safe collection of histograms and counters, each identified by
+    a name and a set of labels.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = OrderedDict()
+        self._counters = OrderedDict()
+
+    def reset(self):
+        """Forget all the measurements."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def observe(self, name, value, **labels):
+        """Record a value in the histogram with the given name and labels."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        """Increment the counter with the given name and labels."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @contextlib.contextmanager
+    def time(self, name, **labels):
+        """
+        A context manager which records how long its body takes, in the
+        histogram with the given name and labels.
+        """
+        start = default_timer()
+        try:
+            yield
+        finally:
+            self.observe(name, default_timer() - start, **labels)
+
+    def count_cache(self, cache, hit):
+        """
+        Record a lookup in a cache.
+
+        :param str cache: The name of the cache.
+        :param bool hit: Whether the lookup was found in the cache.
+        """
+        self.increment(CACHE_HITS if hit else CACHE_MISSES, cache=cache)
+
+    def observe_reload(self, phases):
+        """
+        Record a reload of the compstate.
+
+        :param phases: A mapping of the names of the phases of the reload to
+                       how long each took, in seconds.
+        """
+        self.observe(RELOAD_DURATION, sum(phases.values()))
+        for phase, duration in phases.items():
+            self.observe(RELOAD_PHASE_DURATION, duration, phase=phase)
+
+    def _cache_hit_ratios(self):
+        ratios = OrderedDict()
+        for (name, labels), value in self._counters.items():
+            if name not in (CACHE_HITS, CACHE_MISSES):
+                continue
+            hits = self._counters.get((CACHE_HITS, labels), 0)
+            misses = self._counters.get((CACHE_MISSES, labels), 0)
+            ratios[(CACHE_HIT_RATIO, labels)] = float(hits) / (hits + misses)
+        return ratios
+
+    def render(self):
+        """Render the measurements in the Prometheus text format."""
+
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name in described:
+                return
+            described.add(name)
+            if name in DESCRIPTIONS:
+                lines.append('# HELP {0} {1}'.format(name, DESCRIPTIONS[name]))
+            lines.append('# TYPE {0} {1}'.format(name, kind))
+
+        def add(name, labels, value):
+            lines.append('{0}{1} {2}'.format(name, format_labels(labels),
+                                             format_value(value)))
+
+        with self._lock:
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                describe(name, 'histogram')
+                for bound, count in histogram.cumulative_counts():
+                    add(name + '_bucket',
+                        labels + (('le', format_value(bound)),), count)
+                add(name + '_sum', labels, histogram.sum)
+                add(name + '_count', labels, histogram.count)
+
+            for (name, labels), value in sorted(self._counters.items()):
+                describe(name, 'counter')
+                add(name, labels, value)
+
+            for (name, labels), value in sorted(self._cache_hit_ratios().items()):
+                describe(name, 'gauge')
+                add(name, labels, value)
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+"""The measurements of this process."""
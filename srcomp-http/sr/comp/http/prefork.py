@@ -0,0 +1,237 @@
+"""
+Pre-fork, multi-process serving of the competition API.
+
+A single loader process watches for new states of the competition, loads
+them and publishes each as a serialised snapshot, alongside a generation
+counter in memory shared with the worker processes. The workers, which are
+forked from a common parent holding the listening socket, check the counter
+on each request and load the published snapshot when it changes. This means
+that the (expensive) loading of a state is done only once, and that all the
+workers switch to a new state together.
+"""
+
+from __future__ import print_function
+
+from collections import OrderedDict
+import logging
+from multiprocessing import RawValue
+import os
+import pickle
+import shutil
+import signal
+import sys
+import tempfile
+import time
+
+from sr.comp.http.manager import SRCompManager
+from sr.comp.http.metrics import metrics
+from sr.comp.http.server import app, SNAPSHOT_ENVIRON_KEY
+from sr.comp.timing import PhaseTimer
+
+
+POLL_PERIOD = 1
+"""How often, in seconds, the loader checks for a new state."""
+
+SNAPSHOT_FILE = 'snapshot-{0}.pickle'
+
+SHARED_MEMORY_DIR = '/dev/shm'
+"""Where to put the published snapshots, if it exists."""
+
+
+def snapshot_path(directory, generation):
+    return os.path.join(directory, SNAPSHOT_FILE.format(generation))
+
+
+class SnapshotPublisher(object):
+    """
+    Publishes snapshots of a competition for :class:`SharedSnapshotManager`
+    instances, possibly in other processes, to load.
+
+    :param str directory: Where to write the snapshots.
+    :param generation: A shared ``multiprocessing.RawValue`` holding the
+                       generation number of the latest snapshot.
+    """
+
+    def __init__(self, directory, generation):
+        self.directory = directory
+        self.generation = generation
+
+    def publish(self, comp, match_infos):
+        generation = self.generation.value + 1
+        path = snapshot_path(self.directory, generation)
+
+        # Write and then rename, so that the snapshot appears atomically
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump((comp, match_infos), f, pickle.HIGHEST_PROTOCOL)
+        os.rename(temp_path, path)
+
+        self.generation.value = generation
+
+        # Keep the previous snapshot, in case a worker is part way through
+        # loading it, but no more
+        try:
+            os.remove(snapshot_path(self.directory, generation - 2))
+        except OSError:
+            pass
+
+
+class SharedSnapshotManager(SRCompManager):
+    """
+    An ``SRComp`` manager which loads the snapshots published by a
+    :class:`SnapshotPublisher`, rather than loading the competition itself.
+
+    :param str directory: Where the snapshots are written.
+    :param generation: The shared generation number of the latest snapshot.
+    """
+
+    def __init__(self, directory, generation):
+        super(SharedSnapshotManager, self).__init__()
+        self._directory = directory
+        self._generation = generation
+        self._loaded_generation = None
+
+    def _load(self):
+        timer = PhaseTimer()
+        while True:
+            generation = self._generation.value
+            try:
+                with timer.phase('snapshot'), \
+                        open(snapshot_path(self._directory, generation),
+                             'rb') as f:
+                    comp, match_infos = pickle.load(f)
+                break
+            except (IOError, OSError):
+                if generation == self._generation.value:
+                    raise
+                # Superseded while we were loading it; load the new one
+
+        self.comp = comp
+        self.match_infos = match_infos
+        self._loaded_generation = generation
+        self.update_time = time.time()
+        self._remember(comp, match_infos)
+
+        # The loader process did the loading, but it's the workers which
+        # serve the metrics
+        phases = OrderedDict(comp.load_times)
+        phases.update(timer.durations)
+        metrics.observe_reload(phases)
+
+    def _state_changed(self):
+        return self._generation.value != self._loaded_generation
+
+    def _needs_load(self):
+        return self._state_changed()
+
+
+def run_loader(comp_man, publisher, poll_period=POLL_PERIOD):
+    """Load and publish each new state of the competition, forever."""
+    comp = None
+    while True:
+        try:
+            new_comp = comp_man.get_comp()
+            if new_comp is not comp:
+                publisher.publish(new_comp, comp_man.match_infos)
+                comp = new_comp
+        except Exception:
+            # Keep serving the previous state
+            logging.exception("Failed to load and publish compstate")
+        time.sleep(poll_period)
+
+
+def run_worker(server, comp_man):
+    """Serve requests from the shared snapshots, forever."""
+
+    def worker_app(environ, start_response):
+        environ[SNAPSHOT_ENVIRON_KEY] = comp_man.snapshot()
+        return app(environ, start_response)
+
+    server.app = worker_app
+    server.serve_forever()
+
+
+def fork(target, *args):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            target(*args)
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        except Exception:
+            logging.exception("Process failed")
+        finally:
+            os._exit(0)
+    return pid
+
+
+def run(compstate, host='0.0.0.0', port=5112, workers=4):
+    """
+    Serve the competition at the given path using a loader process and
+    the given number of worker processes.
+    """
+
+    from werkzeug.serving import make_server
+
+    app.config['COMPSTATE'] = compstate
+
+    comp_man = SRCompManager()
+    comp_man.root_dir = os.path.realpath(compstate)
+
+    shm_dir = SHARED_MEMORY_DIR if os.path.isdir(SHARED_MEMORY_DIR) else None
+    directory = tempfile.mkdtemp(prefix='srcomp-http-', dir=shm_dir)
+    generation = RawValue('L', 0)
+    publisher = SnapshotPublisher(directory, generation)
+
+    def terminate(signum, frame):
+        sys.exit(0)
+    signal.signal(signal.SIGTERM, terminate)
+
+    children = []
+    try:
+        loader = fork(run_loader, comp_man, publisher)
+        children.append(loader)
+
+        # Don't start serving until there's something to serve
+        while generation.value == 0:
+            pid, _ = os.waitpid(loader, os.WNOHANG)
+            if pid:
+                children.remove(loader)
+                print("Failed to load the compstate.", file=sys.stderr)
+                exit(1)
+            time.sleep(0.1)
+
+        server = make_server(host, port, app, threaded=True)
+        logging.info("Serving on {0}:{1} with {2} workers"
+                     .format(host, port, workers))
+
+        def start_worker():
+            worker_man = SharedSnapshotManager(directory, generation)
+            worker_man.root_dir = comp_man.root_dir
+            return fork(run_worker, server, worker_man)
+
+        for _ in range(workers):
+            children.append(start_worker())
+
+        while True:
+            pid, status = os.wait()
+            children.remove(pid)
+            logging.error("Process {0} exited ({1}); restarting it"
+                          .format(pid, status))
+            if pid == loader:
+                loader = fork(run_loader, comp_man, publisher)
+                children.append(loader)
+            else:
+                children.append(start_worker())
+            time.sleep(1)
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+        shutil.rmtree(directory, ignore_errors=True)
@@ -1,6 +1,10 @@
 """Various utils for working with HTTP."""
 
+from bisect import bisect_left, bisect_right
+from itertools import islice
+
 from sr.comp.match_period import MatchType
+from sr.comp.http.metrics import metrics
 
 def get_scores(scores, match):
     """
@@ -64,26 +68,29 @@ def get_scores(scores, match):
     return None
 
 
-def match_json_info(comp, match):
+def match_json_base(schedule, match, staging_times=None):
     """
-    Get match JSON information.
+    Get the JSON information for a match, excluding its scores.
 
     Parameters
     ----------
-    comp : sr.comp.comp.SRComp
-        A competition instance.
+    schedule : sr.comp.matches.MatchSchedule
+        The competition schedule.
     match : sr.comp.match_periods.Match
         A match.
+    staging_times : dict
+        The staging times for the match, if already known.
 
     Returns
     -------
     dict
         A :class:`dict` containing JSON suitable output.
     """
-    match_slot_lengths = comp.schedule.match_slot_lengths
-    staging_times = comp.schedule.get_staging_times(match)
+    match_slot_lengths = schedule.match_slot_lengths
+    if staging_times is None:
+        staging_times = schedule.get_staging_times(match)
 
-    info = {
+    return {
         "num": match.num,
         'display_name': match.display_name,
         "arena": match.arena,
@@ -113,6 +120,25 @@ def match_json_info(comp, match):
         }
     }
 
+
+def match_json_info(comp, match):
+    """
+    Get match JSON information.
+
+    Parameters
+    ----------
+    comp : sr.comp.comp.SRComp
+        A competition instance.
+    match : sr.comp.match_periods.Match
+        A match.
+
+    Returns
+    -------
+    dict
+        A :class:`dict` containing JSON suitable output.
+    """
+    info = match_json_base(comp.schedule, match)
+
     score_info = get_scores(comp.scores, match)
     if score_info:
         info['scores'] = score_info
@@ -120,10 +146,315 @@ def match_json_info(comp, match):
     return info
 
 
-def parse_difference_string(string, type_converter=int):
+def get_scores_source(scores, match):
     """
-    Parse a difference string (x..x, ..x, x.., x) and return a function that
-    accepts a single argument and returns ``True`` if it is in the difference.
+    Get the raw score data which the scores of a match depend on, in a form
+    which can be compared to find out whether they have changed.
+    """
+    k = (match.arena, match.num)
+    source = [scores.knockout.resolved_positions.get(k)]
+    for scores_info in (scores.league, scores.knockout, scores.tiebreaker):
+        source += [scores_info.game_points.get(k),
+                   scores_info.ranked_points.get(k),
+                   scores_info.game_positions.get(k)]
+    return tuple(source)
+
+
+def get_filter_values(match, match_slot_lengths):
+    """
+    Get the values of a match which it can be filtered by.
+
+    Parameters
+    ----------
+    match : sr.comp.match_periods.Match
+        A match.
+    match_slot_lengths : dict
+        The lengths of the parts of a match slot.
+
+    Returns
+    -------
+    dict
+        A mapping from filter name to the (typed) value for the match.
+    """
+    game_start = match.start_time + match_slot_lengths['pre']
+    return {
+        'type': match.type,
+        'arena': match.arena,
+        'num': match.num,
+        'game_start_time': game_start,
+        'game_end_time': game_start + match_slot_lengths['match'],
+        'slot_start_time': match.start_time,
+        'slot_end_time': match.end_time,
+    }
+
+
+def in_bounds(value, bounds):
+    """
+    Determine whether a value lies within some bounds, as returned by
+    :func:`parse_difference_bounds`.
+    """
+    lower, upper = bounds
+    if lower is upper:
+        return value == lower
+    return (lower is None or lower <= value) and \
+        (upper is None or value <= upper)
+
+
+class MatchIndex(object):
+    """
+    Indexes over a list of matches, for finding those which match filters
+    without looking at every match.
+
+    Parameters
+    ----------
+    matches : list
+        The matches to index, in schedule order.
+    match_slot_lengths : dict
+        The lengths of the parts of a match slot.
+    """
+
+    GROUPED = ('type', 'arena')
+    SORTED = ('num', 'game_start_time', 'game_end_time', 'slot_start_time',
+              'slot_end_time')
+
+    def __init__(self, matches, match_slot_lengths):
+        self.size = len(matches)
+
+        values = [get_filter_values(match, match_slot_lengths)
+                  for match in matches]
+        self._values = {name: [v[name] for v in values]
+                        for name in self.GROUPED + self.SORTED}
+
+        self._groups = {}
+        for name in self.GROUPED:
+            groups = self._groups[name] = {}
+            for pos, value in enumerate(self._values[name]):
+                groups.setdefault(value, []).append(pos)
+
+        self._teams = {}
+        for pos, match in enumerate(matches):
+            for tla in set(match.teams):
+                if tla is not None:
+                    self._teams.setdefault(tla, []).append(pos)
+
+        self._sorted = {}
+        all_positions = list(range(self.size))
+        for name in self.SORTED:
+            column = self._values[name]
+            positions = sorted(all_positions, key=column.__getitem__)
+            keys = [column[pos] for pos in positions]
+            if positions == all_positions:
+                # The common case: the order of the key is the schedule order
+                positions = None
+            self._sorted[name] = (keys, positions)
+
+    def _candidates(self, name, bounds):
+        """
+        Get the (ascending) positions of the matches which pass a filter.
+        """
+        lower, upper = bounds
+
+        if name in self._groups:
+            groups = self._groups[name]
+            if lower is upper:
+                return groups.get(lower, [])
+            found = [positions for value, positions in groups.items()
+                     if in_bounds(value, bounds)]
+            if len(found) == 1:
+                return found[0]
+            return sorted(pos for positions in found for pos in positions)
+
+        keys, positions = self._sorted[name]
+        start = 0 if lower is None else bisect_left(keys, lower)
+        end = len(keys) if upper is None else bisect_right(keys, upper)
+        if positions is None:
+            return range(start, max(start, end))
+        return sorted(positions[start:end])
+
+    def find(self, filters, limit=None, team=None):
+        """
+        Find the matches which pass all of the given filters.
+
+        Parameters
+        ----------
+        filters : dict
+            A mapping from filter name to the bounds for that filter, as
+            returned by :func:`parse_difference_bounds`.
+        limit : int
+            If positive, only the first ``limit`` matches found are returned;
+            if negative, only the last ``-limit`` matches found.
+        team : str
+            If given, only the matches which the team with this TLA is in
+            are found.
+
+        Returns
+        -------
+        list
+            The positions (in schedule order) of the matches found.
+        """
+        if limit == 0:
+            return []
+
+        if team is not None:
+            # Only a few of the matches will be the team's, so start from
+            # those and check all the filters
+            candidates = self._teams.get(team, [])
+            checks = [(self._values[name], bounds)
+                      for name, bounds in filters.items()]
+        elif not filters:
+            candidates = range(self.size)
+            checks = []
+        else:
+            # Start from the most selective filter and check the rest
+            by_size = sorted((len(c), name, c) for name, c in
+                             ((name, self._candidates(name, bounds))
+                              for name, bounds in filters.items()))
+            _, first, candidates = by_size[0]
+            checks = [(self._values[name], filters[name])
+                      for name in filters if name != first]
+
+        if limit is not None and limit < 0:
+            candidates = reversed(candidates)
+
+        found = (pos for pos in candidates
+                 if all(in_bounds(column[pos], bounds)
+                        for column, bounds in checks))
+
+        if limit is None:
+            return list(found)
+        elif limit > 0:
+            return list(islice(found, limit))
+        else:
+            return list(islice(found, -limit))[::-1]
+
+
+class MatchInfo(object):
+    """The cached JSON information about a single match."""
+
+    __slots__ = ('match', 'staging_times', 'scores_source', 'base', 'info')
+
+    def __init__(self, match, staging_times, scores_source, base, info):
+        self.match = match
+        self.staging_times = staging_times
+        self.scores_source = scores_source
+        self.base = base
+        self.info = info
+
+
+class MatchInfoCache(object):
+    """
+    The JSON information for all the matches in a competition, built once
+    for each state of the competition.
+
+    The returned information is shared between callers and must not be
+    modified.
+
+    Parameters
+    ----------
+    comp : sr.comp.comp.SRComp
+        A competition instance.
+    previous : MatchInfoCache
+        The cache for a previous state of the competition, if any. The
+        information for matches which are unchanged (including their scores)
+        is reused from here, rather than rebuilt.
+    """
+
+    def __init__(self, comp, previous=None):
+        self.comp = comp
+
+        schedule = comp.schedule
+        self._timing_config = (schedule.match_slot_lengths,
+                               schedule.staging_times)
+
+        if previous is not None and \
+                previous._timing_config != self._timing_config:
+            # All the times will have changed
+            previous = None
+
+        self._entries = {}
+        self._all = []
+        matches = []
+        for slot in schedule.matches:
+            for match in slot.values():
+                entry = self._build(match, previous)
+                self._entries[(match.arena, match.num)] = entry
+                self._all.append(entry.info)
+                matches.append(match)
+
+        self.index = MatchIndex(matches, schedule.match_slot_lengths)
+
+    def _build(self, match, previous):
+        schedule = self.comp.schedule
+        scores_source = get_scores_source(self.comp.scores, match)
+
+        old = None
+        if previous is not None:
+            old = previous._entries.get((match.arena, match.num))
+            if old is not None and old.match != match:
+                old = None
+
+        metrics.count_cache('match_info_reuse', old is not None)
+
+        if old is not None:
+            if old.scores_source == scores_source:
+                return old
+            staging_times = old.staging_times
+            base = old.base
+        else:
+            staging_times = schedule.get_staging_times(match)
+            base = match_json_base(schedule, match, staging_times)
+
+        info = base
+        score_info = get_scores(self.comp.scores, match)
+        if score_info:
+            info = dict(base)
+            info['scores'] = score_info
+
+        return MatchInfo(match, staging_times, scores_source, base, info)
+
+    def _get_entry(self, match):
+        entry = self._entries.get((match.arena, match.num))
+        if entry is None or entry.match != match:
+            return None
+        return entry
+
+    def get(self, match):
+        """Get the JSON information for the given match."""
+        entry = self._get_entry(match)
+        metrics.count_cache('match_info', entry is not None)
+        if entry is None:
+            return match_json_info(self.comp, match)
+        return entry.info
+
+    def get_staging_times(self, match):
+        """Get the staging times for the given match."""
+        entry = self._get_entry(match)
+        if entry is None:
+            return self.comp.schedule.get_staging_times(match)
+        return entry.staging_times
+
+    def all(self):
+        """Get a list of information about all matches, in schedule order."""
+        return list(self._all)
+
+    def find(self, filters, limit=None, team=None):
+        """
+        Get a list of information about the matches which pass the given
+        filters, in schedule order. See :meth:`MatchIndex.find`.
+        """
+        return [self._all[pos]
+                for pos in self.index.find(filters, limit, team)]
+
+
+def parse_difference_bounds(string, type_converter=int):
+    """
+    Parse a difference string (x..x, ..x, x.., x) into its bounds.
+
+    Returns
+    -------
+    tuple
+        The ``(lower, upper)`` bounds, inclusive. A missing bound is
+        ``None``. For an exact value (x) both bounds are the same object.
     """
     separator = '..'
     if string == separator:
@@ -134,19 +465,26 @@ def parse_difference_string(string, type_converter=int):
         raise ValueError('Argument is not a different string.')
     elif len(tokens) == 1:
         converted_token = type_converter(tokens[0])
-        return lambda x: x == converted_token
+        return converted_token, converted_token
     elif len(tokens) == 2:
         if not tokens[1]:
-            lower_bound = type_converter(tokens[0])
-            return lambda x: x >= lower_bound
+            return type_converter(tokens[0]), None
         elif not tokens[0]:
-            upper_bound = type_converter(tokens[1])
-            return lambda x: x <= upper_bound
+            return None, type_converter(tokens[1])
         else:
             lhs = type_converter(tokens[0])
             rhs = type_converter(tokens[1])
             if lhs > rhs:
                 raise ValueError('Bounds are the wrong way around.')
-            return lambda x: lhs <= x <= rhs
+            return lhs, rhs
     else:
         raise AssertionError('Argument contains unknown input.')
+
+
+def parse_difference_string(string, type_converter=int):
+    """
+    Parse a difference string (x..x, ..x, x.., x) and return a function that
+    accepts a single argument and returns ``True`` if it is in the difference.
+    """
+    bounds = parse_difference_bounds(string, type_converter)
+    return lambda x: in_bounds(x, bounds)
@@ -1,17 +1,21 @@
 import datetime
 import dateutil.parser
 import dateutil.tz
-from functools import partial
 import os.path
 from pkg_resources import working_set
+from timeit import default_timer
 
-from flask import g, Flask, jsonify, request, url_for, abort, send_file
+from flask import (g, Flask, json, jsonify, request, url_for, abort,
+                   send_file, Response)
+from werkzeug.exceptions import HTTPException
 
 from sr.comp.match_period import MatchType
+from sr.comp.validation import count_errors, find_problems
 from sr.comp.http import errors
 from sr.comp.http.manager import SRCompManager
 from sr.comp.http.json import JsonEncoder
-from sr.comp.http.query_utils import match_json_info, parse_difference_string
+from sr.comp.http.metrics import metrics, REQUEST_DURATION
+from sr.comp.http.query_utils import match_json_info, parse_difference_bounds
 
 
 app = Flask('sr.comp.http')
@@ -19,12 +23,29 @@ app.json_encoder = JsonEncoder
 
 comp_man = SRCompManager()
 
+DEFAULT_STATE_WAIT = 30
+MAX_STATE_WAIT = 60
+"""Limits, in seconds, on how long a request for ``/state`` may wait."""
+
+MAX_SCENARIOS = 100
+"""The most scenarios which may be evaluated by one ``/what-if`` request."""
+
+SNAPSHOT_ENVIRON_KEY = 'sr.comp.http.snapshot'
+"""
+WSGI environ key under which a server may provide the manager to use for a
+request, such as a snapshot of the competition which it keeps up to date
+itself. Otherwise the global manager is used.
+"""
+
+REQUEST_START_ENVIRON_KEY = 'sr.comp.http.request_start'
+
 
 @app.before_request
 def before_request():
+    request.environ[REQUEST_START_ENVIRON_KEY] = default_timer()
     if "COMPSTATE" in app.config:
         comp_man.root_dir = os.path.realpath(app.config["COMPSTATE"])
-    g.comp_man = comp_man
+    g.comp_man = request.environ.get(SNAPSHOT_ENVIRON_KEY, comp_man)
 
 
 @app.after_request
@@ -34,6 +55,21 @@ def after_request(resp):
     return resp
 
 
+@app.teardown_request
+def record_request_duration(exc):
+    # Kept in the environ rather than `g`, which is shared with the requests
+    # made internally for `/batch`
+    start = request.environ.get(REQUEST_START_ENVIRON_KEY)
+    if start is None:
+        return
+
+    if request.url_rule is not None:
+        route = request.url_rule.rule
+    else:
+        route = 'unknown'
+    metrics.observe(REQUEST_DURATION, default_timer() - start, route=route)
+
+
 @app.route('/')
 def root():
     return jsonify(arenas=url_for('arenas'),
@@ -132,25 +168,76 @@ def teams():
     return jsonify(teams=resp)
 
 
-@app.route('/teams/<tla>')
-def get_team(tla):
-    comp = g.comp_man.get_comp()
-
+def get_team_or_404(comp, tla):
     try:
-        team = comp.teams[tla]
+        return comp.teams[tla]
     except KeyError:
         abort(404)
+
+
+@app.route('/teams/<tla>')
+def get_team(tla):
+    comp = g.comp_man.get_comp()
+    team = get_team_or_404(comp, tla)
     return jsonify(team_info(comp, team))
 
 
+def jsonify_conditional(*args, **kwargs):
+    """
+    Like :func:`flask.jsonify`, but with an ETag of the response's content,
+    so that clients which already have it get a ``304 Not Modified``.
+    """
+    resp = jsonify(*args, **kwargs)
+    resp.add_etag()
+    return resp.make_conditional(request)
+
+
+@app.route('/teams/<tla>/matches')
+def get_team_matches(tla):
+    comp = g.comp_man.get_comp()
+    team = get_team_or_404(comp, tla)
+
+    filters, limit = parse_match_filters(request.args)
+
+    matches = g.comp_man.get_match_infos(comp).find(filters, limit,
+                                                    team=team.tla)
+
+    return jsonify_conditional(matches=matches,
+                               last_scored=comp.scores.last_scored_match)
+
+
+def format_result(row):
+    return {
+        'type': row.type,
+        'arena': row.arena,
+        'num': row.num,
+        'game_points': row.game_points,
+        'league_points': row.league_points,
+        'position': row.position,
+        'disqualified': row.disqualified,
+    }
+
+
+@app.route('/teams/<tla>/results')
+def get_team_results(tla):
+    comp = g.comp_man.get_comp()
+    team = get_team_or_404(comp, tla)
+
+    rows = comp.scores.table.select(team=team.tla)
+    scores = comp.scores.league.teams[team.tla]
+
+    return jsonify_conditional(
+        tla=team.tla,
+        league_pos=comp.scores.league.positions[team.tla],
+        scores={'league': scores.league_points, 'game': scores.game_points},
+        results=[format_result(row) for row in rows],
+    )
+
+
 @app.route('/teams/<tla>/image')
 def get_team_image(tla):
     comp = g.comp_man.get_comp()
-
-    try:
-        team = comp.teams[tla]
-    except KeyError:
-        abort(404)
+    team = get_team_or_404(comp, tla)
 
     filename = os.path.join(g.comp_man.root_dir, 'teams', 'images',
                             '{}.png'.format(team.tla))
@@ -183,9 +270,26 @@ def get_corner(number):
     return jsonify(**format_corner(comp.corners[number]))
 
 
+def get_state_wait_timeout(args):
+    """
+    Get the time to wait for a new state of the competition, as requested
+    by the ``timeout`` query parameter.
+    """
+    try:
+        timeout = float(args.get('timeout', DEFAULT_STATE_WAIT))
+    except ValueError:
+        raise errors.BadRequest('Timeout must be a number of seconds.')
+    return max(0, min(timeout, MAX_STATE_WAIT))
+
+
 @app.route("/state")
 def state():
-    comp = g.comp_man.get_comp()
+    known_state = request.args.get('wait')
+    if known_state is None:
+        comp = g.comp_man.get_comp()
+    else:
+        timeout = get_state_wait_timeout(request.args)
+        comp = g.comp_man.wait_for_change(known_state, timeout)
     return jsonify(state=comp.state)
 
 
@@ -209,17 +313,19 @@ def config():
 @app.route("/matches/last_scored")
 def last_scored_match():
     comp = g.comp_man.get_comp()
-    return jsonify(last_scored=comp.scores.last_scored_match)
+    return jsonify(last_scored=comp.scores.last_scored_match,
+                   unscored_league=comp.schedule.unscored_league_matches)
 
 
-@app.route("/matches")
-def matches():
-    comp = g.comp_man.get_comp()
-    matches = []
-    for slots in comp.schedule.matches:
-        matches.extend(match_json_info(comp, match)
-                       for match in slots.values())
+def parse_match_filters(args):
+    """
+    Parse the filters and limit on the matches to find, as given in a
+    request's query arguments.
 
+    :return: A tuple of a :class:`dict` of the filters (see
+             :meth:`sr.comp.http.query_utils.MatchIndex.find`) and the limit
+             (or ``None``).
+    """
     def parse_date(string):
         if ' ' in string:
             raise errors.BadRequest('Date string should not contain spaces. '
@@ -227,50 +333,53 @@ def matches():
         else:
             return dateutil.parser.parse(string)
 
-    filters = [
-        ('type', MatchType, lambda x: x['type']),
-        ('arena', str, lambda x: x['arena']),
-        ('num', int, lambda x: x['num']),
-        ('game_start_time', parse_date, lambda x: x['times']['game']['start']),
-        ('game_end_time', parse_date, lambda x: x['times']['game']['end']),
-        ('slot_start_time', parse_date, lambda x: x['times']['slot']['start']),
-        ('slot_end_time', parse_date, lambda x: x['times']['slot']['end'])
+    filter_types = [
+        ('type', MatchType),
+        ('arena', str),
+        ('num', int),
+        ('game_start_time', parse_date),
+        ('game_end_time', parse_date),
+        ('slot_start_time', parse_date),
+        ('slot_end_time', parse_date),
     ]
 
     # check for unknown filters
-    filter_names = [name for name, _, _ in filters] + ['limit']
-    for arg in request.args:
+    filter_names = [name for name, _ in filter_types] + ['limit']
+    for arg in args:
         if arg not in filter_names:
             raise errors.UnknownMatchFilter(arg)
 
-    # actually run the filters
-    for filter_key, filter_type, filter_value in filters:
-        if filter_key in request.args:
-            value = request.args[filter_key]
+    # parse the filters
+    filters = {}
+    for filter_key, filter_type in filter_types:
+        if filter_key in args:
+            value = args[filter_key]
             try:
-                predicate = parse_difference_string(value, filter_type)
-                matches = [match for match in matches
-                           if predicate(filter_type(filter_value(match)))]
+                filters[filter_key] = parse_difference_bounds(value,
+                                                              filter_type)
             except ValueError:
                 raise errors.BadRequest("Bad value '{0}' for '{1}'.".format(value, filter_key))
 
-    # limit the results
+    # parse the limit
     try:
-        limit = int(request.args['limit'])
+        limit = int(args['limit'])
     except KeyError:
-        pass
+        limit = None
     except ValueError:
         raise errors.BadRequest(
             'Limit must be a positive or negative integer.')
-    else:
-        if limit == 0:
-            matches = []
-        elif limit > 0:
-            matches = matches[:limit]
-        elif limit < 0:
-            matches = matches[limit:]
-        else:
-            raise AssertionError("Limit isn't a number?")
+
+    return filters, limit
+
+
+@app.route("/matches")
+def matches():
+    comp = g.comp_man.get_comp()
+
+    filters, limit = parse_match_filters(request.args)
+
+    # actually run the filters, using the indexes of the matches
+    matches = g.comp_man.get_match_infos(comp).find(filters, limit)
 
     return jsonify(matches=matches, last_scored=comp.scores.last_scored_match)
 
@@ -306,26 +415,27 @@ def current_state():
     delay = comp.schedule.delay_at(time)
     delay_seconds = int(delay.total_seconds())
 
-    matches = list(map(partial(match_json_info, comp),
-                       comp.schedule.matches_at(time)))
+    match_infos = g.comp_man.get_match_infos(comp)
+    matches = [match_infos.get(match)
+               for match in comp.schedule.matches_at(time)]
 
     staging_matches = []
     shepherding_matches = []
     for slot in comp.schedule.matches:
         for match in slot.values():
-            staging_times = comp.schedule.get_staging_times(match)
+            staging_times = match_infos.get_staging_times(match)
 
             if time > staging_times['closes']:
                 # Already done staging
                 continue
 
             if staging_times['opens'] <= time:
-                staging_matches.append(match_json_info(comp, match))
+                staging_matches.append(match_infos.get(match))
 
             try:
                 first_signal = min(staging_times['signal_shepherds'].values())
                 if first_signal <= time:
-                    shepherding_matches.append(match_json_info(comp, match))
+                    shepherding_matches.append(match_infos.get(match))
             except ValueError:
                 # No shepherding signalling
                 pass
@@ -350,6 +460,235 @@ def tiebreaker():
         abort(404)
 
 
+@app.route('/validation')
+def validation():
+    comp = g.comp_man.get_comp()
+    findings = find_problems(comp)
+    return jsonify(state=comp.state, errors=count_errors(findings),
+                   findings=[finding.as_dict() for finding in findings])
+
+
+def format_scenario(comp):
+    """Get the outcome of a hypothetical competition, for ``/what-if``."""
+    info = {
+        'league_positions': comp.scores.league.positions,
+        'rounds': [[match_json_info(comp, match) for match in matches]
+                   for matches in comp.schedule.knockout_rounds],
+        'awards': {award.value: teams
+                   for award, teams in comp.awards.items()},
+    }
+    tiebreaker = getattr(comp.schedule, 'tiebreaker', None)
+    if tiebreaker is not None:
+        info['tiebreaker'] = match_json_info(comp, tiebreaker)
+    return info
+
+
+@app.route('/what-if', methods=['POST'])
+def what_if():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or \
+            not isinstance(data.get('scenarios'), list):
+        raise errors.BadRequest('Expected a JSON object with a list of '
+                                'scenarios.')
+
+    scenarios = data['scenarios']
+    if len(scenarios) > MAX_SCENARIOS:
+        raise errors.BadRequest('At most {0} scenarios may be evaluated at '
+                                'once.'.format(MAX_SCENARIOS))
+
+    comp = g.comp_man.get_comp()
+    results = []
+    for index, scenario in enumerate(scenarios):
+        try:
+            sheets = scenario['scores']
+            scenario_comp = comp.with_score_sheets(sheets)
+        # The score sheets are checked by the compstate's own scorer, which
+        # may raise anything
+        except Exception as e:
+            raise errors.InvalidScenario(index, e)
+        results.append(format_scenario(scenario_comp))
+
+    return jsonify(state=comp.state, scenarios=results)
+
+
+def diff_teams(from_man, to_man):
+    def get_teams(comp_man):
+        g.comp_man = comp_man
+        comp = comp_man.get_comp()
+        return {tla: team_info(comp, team) for tla, team in comp.teams.items()}
+
+    from_teams = get_teams(from_man)
+    to_teams = get_teams(to_man)
+
+    return {
+        'changed': {tla: info for tla, info in to_teams.items()
+                    if from_teams.get(tla) != info},
+        'removed': sorted(set(from_teams) - set(to_teams)),
+    }
+
+
+def diff_matches(from_man, to_man):
+    def get_matches(comp_man):
+        match_infos = comp_man.get_match_infos(comp_man.get_comp())
+        return {(info['arena'], info['num']): info
+                for info in match_infos.all()}
+
+    from_matches = get_matches(from_man)
+    to_matches = get_matches(to_man)
+
+    changed = []
+    for key, info in to_matches.items():
+        old = from_matches.get(key)
+        # Unchanged matches usually share their information
+        if old is not info and old != info:
+            changed.append(info)
+    changed.sort(key=lambda info: (info['num'], info['arena']))
+
+    removed = [{'arena': arena, 'num': num} for arena, num
+               in sorted(set(from_matches) - set(to_matches),
+                         key=lambda key: (key[1], key[0]))]
+
+    return {'changed': changed, 'removed': removed}
+
+
+def diff_knockout(from_man, to_man):
+    def get_rounds(comp_man):
+        comp = comp_man.get_comp()
+        match_infos = comp_man.get_match_infos(comp)
+        return [[match_infos.get(match) for match in matches]
+                for matches in comp.schedule.knockout_rounds]
+
+    from_rounds = get_rounds(from_man)
+    to_rounds = get_rounds(to_man)
+
+    changed = {}
+    for index, matches in enumerate(to_rounds):
+        if index >= len(from_rounds) or from_rounds[index] != matches:
+            changed[str(index)] = matches
+
+    return {'changed': changed, 'num_rounds': len(to_rounds)}
+
+
+def diff_tiebreaker(from_man, to_man):
+    def get_tiebreaker(comp_man):
+        comp = comp_man.get_comp()
+        try:
+            match = comp.schedule.tiebreaker
+        except AttributeError:
+            return None
+        return comp_man.get_match_infos(comp).get(match)
+
+    from_tiebreaker = get_tiebreaker(from_man)
+    to_tiebreaker = get_tiebreaker(to_man)
+
+    return {'changed': from_tiebreaker != to_tiebreaker,
+            'tiebreaker': to_tiebreaker}
+
+
+def diff_delays(from_man, to_man):
+    def get_delays(comp_man):
+        return [{'time': delay.time.isoformat(),
+                 'delay': int(delay.delay.total_seconds())}
+                for delay in comp_man.get_comp().schedule.delays]
+
+    from_delays = get_delays(from_man)
+    to_delays = get_delays(to_man)
+
+    return {'changed': from_delays != to_delays, 'delays': to_delays}
+
+
+def get_state_diff(from_man, to_man):
+    """
+    Get the differences between the states of the competition held by two
+    managers. The new versions of anything which changed are taken from
+    ``to_man``.
+    """
+    comp_man = g.comp_man
+    try:
+        return {
+            'from': from_man.get_comp().state,
+            'to': to_man.get_comp().state,
+            'teams': diff_teams(from_man, to_man),
+            'matches': diff_matches(from_man, to_man),
+            'knockout': diff_knockout(from_man, to_man),
+            'tiebreaker': diff_tiebreaker(from_man, to_man),
+            'delays': diff_delays(from_man, to_man),
+        }
+    finally:
+        g.comp_man = comp_man
+
+
+@app.route('/diff')
+def diff():
+    try:
+        from_state = request.args['from']
+    except KeyError:
+        raise errors.BadRequest("The 'from' state must be given.")
+    to_state = request.args.get('to')
+
+    def snapshot(state):
+        try:
+            return g.comp_man.snapshot(state)
+        except KeyError:
+            raise errors.UnknownState(state)
+
+    to_man = snapshot(to_state)
+    to_state = to_man.get_comp().state
+
+    key = (from_state, to_state)
+    result = g.comp_man.diffs.get(key)
+    metrics.count_cache('diff', result is not None)
+    if result is None:
+        from_man = snapshot(from_state)
+        result = g.comp_man.diffs[key] = get_state_diff(from_man, to_man)
+
+    return jsonify(result)
+
+
+def get_batch_resource(path, comp_man):
+    """
+    Get the JSON content of the resource at the given path, as it would be
+    returned by a request for it, using the given manager.
+    """
+    with app.test_request_context(path):
+        g.comp_man = comp_man
+        try:
+            if request.routing_exception is not None:
+                raise request.routing_exception
+
+            if request.url_rule.endpoint == 'batch':
+                raise errors.BadRequest('Batches cannot be nested.')
+
+            view = app.view_functions[request.url_rule.endpoint]
+            response = app.make_response(view(**request.view_args))
+        except HTTPException as e:
+            response = app.make_response(error_handler(e))
+
+        if response.mimetype != 'application/json':
+            response = app.make_response(error_handler(errors.BadRequest(
+                "'{0}' is not a JSON resource.".format(path))))
+
+        return json.loads(response.get_data(as_text=True))
+
+
+@app.route('/batch')
+def batch():
+    paths = request.args.getlist('path')
+    if not paths:
+        raise errors.BadRequest('No paths requested.')
+
+    comp_man = g.comp_man.snapshot()
+    resources = {path: get_batch_resource(path, comp_man) for path in paths}
+
+    return jsonify(state=comp_man.get_comp().state, resources=resources)
+
+
+@app.route('/metrics')
+def get_metrics():
+    return Response(metrics.render(),
+                    mimetype='text/plain; version=0.0.4')
+
+
 def error_handler(e):
     # fill up the error object with a name, description, code and details
     error = {
@@ -0,0 +1,52 @@
+"""
+Coroutines for the ASGI server's tests, which are kept apart from them
+since older Pythons can't parse them.
+"""
+
+import asyncio
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def serve_once(server, scope, body, sent):
+    """Serve a single request, collecting the messages sent in reply."""
+
+    async def receive():
+        return {'type': 'http.request', 'body': body}
+
+    async def send(message):
+        sent.append(message)
+
+    await server(scope, receive, send)
+    await server.stop()
+
+
+async def check_wait_for_change(server):
+    await server._reload()
+
+    # Unchanged
+    state = await server.wait_for_change('abc', 0.01)
+    assert state == 'abc'
+
+    # Already different
+    state = await server.wait_for_change('xyz', 10)
+    assert state == 'abc'
+
+    waiter = asyncio.ensure_future(server.wait_for_change('abc', 10))
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    await server._reload()
+    state = await asyncio.wait_for(waiter, 1)
+    assert state == 'def'
+
+
+async def wait_for_state(server, scope):
+    await server._reload()
+    return await server._wait_for_state(scope)
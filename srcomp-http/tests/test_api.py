@@ -49,7 +49,15 @@ def raises_api_error(name, code):
 
 
 def server_get(endpoint):
-    response, code, header = CLIENT.get(endpoint)
+    return parse_response(*CLIENT.get(endpoint))
+
+
+def server_post(endpoint, data):
+    return parse_response(*CLIENT.post(endpoint, data=json.dumps(data),
+                                       content_type='application/json'))
+
+
+def parse_response(response, code, header):
     json_response = json.loads(b''.join(response).decode('UTF-8'))
     code = int(code.split(' ')[0])
 
@@ -71,6 +79,8 @@ def test_endpoints():
         '/arenas/B',
         '/teams',
         '/teams/CLF',
+        '/teams/CLF/matches',
+        '/teams/CLF/results',
         '/corners',
         '/corners/0',
         '/corners/1',
@@ -112,6 +122,22 @@ def test_state():
     assert isinstance(state_val, unicode), repr(state_val)
 
 
+def test_state_wait_for_other_state():
+    state_val = server_get('/state')['state']
+    eq_(server_get('/state?wait=not-the-state'), {'state': state_val})
+
+
+def test_state_wait_timeout():
+    state_val = server_get('/state')['state']
+    eq_(server_get('/state?wait={0}&timeout=0'.format(state_val)),
+        {'state': state_val})
+
+
+@raises_api_error('BadRequest', 400)
+def test_state_wait_bad_timeout():
+    server_get('/state?wait=abc&timeout=soon')
+
+
 def test_corner():
     eq_(server_get('/corners/0'), {'get': '/corners/0',
                                    'number': 0,
@@ -220,6 +246,61 @@ def test_bad_team():
     server_get('/teams/BEES')
 
 
+def test_team_matches():
+    matches = server_get('/teams/CLY/matches')['matches']
+    assert matches, "Should have found some matches"
+    for match in matches:
+        assert 'CLY' in match['teams'], match
+    eq_(matches[0], server_get('/matches?num=0&arena=A')['matches'][0])
+
+
+def test_team_matches_filter():
+    eq_(server_get('/teams/CLY/matches?num=0'),
+        server_get('/matches?num=0&arena=A'))
+    eq_(server_get('/teams/CLY/matches?arena=A&limit=1'),
+        server_get('/matches?num=0&arena=A'))
+
+
+def test_team_matches_not_modified():
+    response, code, header = CLIENT.get('/teams/CLY/matches')
+    etag = header['ETag']
+
+    response, code, header = CLIENT.get('/teams/CLY/matches',
+                                        headers={'If-None-Match': etag})
+    eq_(code, '304 NOT MODIFIED')
+
+
+@raises_api_error('UnknownMatchFilter', 400)
+def test_team_matches_invalid_filter():
+    server_get('/teams/CLY/matches?bees=1')
+
+
+@raises_api_error('NotFound', 404)
+def test_bad_team_matches():
+    server_get('/teams/BEES/matches')
+
+
+def test_team_results():
+    results = server_get('/teams/CLY/results')
+    eq_(results['tla'], 'CLY')
+    eq_(results['league_pos'], server_get('/teams/CLY')['league_pos'])
+    eq_(results['scores'], server_get('/teams/CLY')['scores'])
+    eq_(results['results'][0], {
+        'type': 'league',
+        'arena': 'A',
+        'num': 0,
+        'game_points': 9,
+        'league_points': 8,
+        'position': 1,
+        'disqualified': False,
+    })
+
+
+@raises_api_error('NotFound', 404)
+def test_bad_team_results():
+    server_get('/teams/BEES/results')
+
+
 def test_matches():
     eq_(server_get('/matches?num=0&arena=A'),
          {'matches': [
@@ -339,7 +420,15 @@ def test_invalid_match_filter_value():
 
 
 def test_last_scored():
-    eq_(server_get('/matches/last_scored'), {'last_scored': 99})
+    response = server_get('/matches/last_scored')
+    eq_(response['last_scored'], 99)
+    eq_(sorted(response.keys()), ['last_scored', 'unscored_league'])
+
+
+def test_unscored_league():
+    unscored = server_get('/matches/last_scored')['unscored_league']
+    assert isinstance(unscored, int)
+    assert unscored >= 0
 
 
 @raises_api_error('BadRequest', 400)
@@ -723,3 +812,90 @@ def test_knockouts():
 @raises_api_error('NotFound', 404)
 def test_tiebreaker():
     server_get('/tiebreaker')
+
+
+def test_validation():
+    validation = server_get('/validation')
+    eq_(validation['state'], server_get('/state')['state'])
+    eq_(validation['errors'], 0)
+    for finding in validation['findings']:
+        eq_(finding['severity'], 'warning')
+
+
+def test_what_if_no_changes():
+    result = server_post('/what-if', {'scenarios': [{'scores': []}]})
+    eq_(result['state'], server_get('/state')['state'])
+
+    scenario, = result['scenarios']
+    teams = server_get('/teams')['teams']
+    eq_(scenario['league_positions'],
+        {tla: team['league_pos'] for tla, team in teams.items()})
+    eq_(scenario['rounds'], server_get('/knockout')['rounds'])
+    eq_(scenario['tiebreaker'], server_get('/tiebreaker')['tiebreaker'])
+
+
+@raises_api_error('InvalidScenario', 400)
+def test_what_if_invalid_scenario():
+    server_post('/what-if', {'scenarios': [{'scores': [{'arena_id': 'A'}]}]})
+
+
+@raises_api_error('BadRequest', 400)
+def test_what_if_no_scenarios():
+    server_post('/what-if', {})
+
+
+def test_batch():
+    batch = server_get('/batch?path=/state&path=/matches/last_scored'
+                       '&path=/matches%3Fnum%3D0%26arena%3DA')
+    eq_(batch['state'], server_get('/state')['state'])
+    eq_(batch['resources'], {
+        '/state': server_get('/state'),
+        '/matches/last_scored': server_get('/matches/last_scored'),
+        '/matches?num=0&arena=A': server_get('/matches?num=0&arena=A'),
+    })
+
+
+def test_batch_errors():
+    resources = server_get('/batch?path=/teams/BEES&path=/batch'
+                           '&path=/teams/CLF/image')['resources']
+    eq_(resources['/teams/BEES']['error']['code'], 404)
+    eq_(resources['/batch']['error']['code'], 400)
+    eq_(resources['/teams/CLF/image']['error']['code'], 400)
+
+
+@raises_api_error('BadRequest', 400)
+def test_batch_no_paths():
+    server_get('/batch')
+
+
+def test_diff_same_state():
+    state = server_get('/state')['state']
+    diff = server_get('/diff?from={0}'.format(state))
+    eq_(diff['from'], state)
+    eq_(diff['to'], state)
+    eq_(diff['teams'], {'changed': {}, 'removed': []})
+    eq_(diff['matches'], {'changed': [], 'removed': []})
+    eq_(diff['knockout']['changed'], {})
+    eq_(diff['tiebreaker']['changed'], False)
+    eq_(diff['delays']['changed'], False)
+
+
+@raises_api_error('UnknownState', 404)
+def test_diff_unknown_state():
+    server_get('/diff?from=bees')
+
+
+@raises_api_error('BadRequest', 400)
+def test_diff_no_from():
+    server_get('/diff')
+
+
+def test_metrics():
+    server_get('/teams/CLY')
+
+    response, code, header = CLIENT.get('/metrics')
+    text = b''.join(response).decode('UTF-8')
+
+    eq_(code, '200 OK')
+    assert 'srcomp_http_request_duration_seconds_count{route="/teams/<tla>"}' in text, text
+    assert 'srcomp_http_reload_check_duration_seconds_count' in text, text
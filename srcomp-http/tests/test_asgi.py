@@ -0,0 +1,101 @@
+import sys
+
+import mock
+from nose.plugins.skip import SkipTest
+
+if sys.version_info < (3, 5):
+    raise SkipTest("The ASGI server needs Python 3.5 or later.")
+
+from asgi_coroutines import check_wait_for_change, run, serve_once, \
+    wait_for_state
+from sr.comp.http.asgi import AsyncServer, build_environ, call_wsgi
+from sr.comp.http.server import SNAPSHOT_ENVIRON_KEY
+
+
+SCOPE = {
+    'type': 'http',
+    'method': 'GET',
+    'path': '/matches',
+    'query_string': b'arena=A',
+    'http_version': '1.1',
+    'server': ('example.com', 8080),
+    'headers': [(b'content-type', b'text/plain'),
+                (b'x-thing', b'a'),
+                (b'x-thing', b'b')],
+}
+
+
+def build_comp_man(*states):
+    snapshots = []
+    for state in states:
+        snapshot = mock.Mock()
+        snapshot.comp.state = state
+        snapshots.append(snapshot)
+
+    comp_man = mock.Mock()
+    comp_man.snapshot.side_effect = snapshots
+    return comp_man
+
+
+def test_build_environ():
+    environ = build_environ(SCOPE, b'body')
+
+    assert environ['REQUEST_METHOD'] == 'GET'
+    assert environ['PATH_INFO'] == '/matches'
+    assert environ['QUERY_STRING'] == 'arena=A'
+    assert environ['SERVER_NAME'] == 'example.com'
+    assert environ['SERVER_PORT'] == '8080'
+    assert environ['CONTENT_TYPE'] == 'text/plain'
+    assert environ['HTTP_X_THING'] == 'a,b'
+    assert environ['wsgi.input'].read() == b'body'
+
+
+def test_call_wsgi():
+    def wsgi_app(environ, start_response):
+        start_response('404 NOT FOUND', [('Content-Type', 'text/plain')])
+        return [b'not ', b'found']
+
+    status, headers, body = call_wsgi(wsgi_app, {})
+
+    assert status == 404
+    assert headers == [(b'Content-Type', b'text/plain')]
+    assert body == b'not found'
+
+
+def test_serves_from_snapshot():
+    environs = []
+
+    def wsgi_app(environ, start_response):
+        environs.append(environ)
+        start_response('200 OK', [])
+        return [b'{}']
+
+    comp_man = build_comp_man('abc')
+    server = AsyncServer(wsgi_app, comp_man)
+    sent = []
+
+    run(serve_once(server, SCOPE, b'', sent))
+
+    assert environs[0][SNAPSHOT_ENVIRON_KEY] is server.snapshot
+    assert server.snapshot.comp.state == 'abc'
+    assert [m['type'] for m in sent] == ['http.response.start',
+                                         'http.response.body']
+    assert sent[1]['body'] == b'{}'
+
+
+def test_wait_for_change():
+    comp_man = build_comp_man('abc', 'def')
+    server = AsyncServer(None, comp_man)
+
+    run(check_wait_for_change(server))
+
+
+def test_wait_for_state_strips_wait():
+    comp_man = build_comp_man('abc')
+    server = AsyncServer(None, comp_man)
+    scope = dict(SCOPE, path='/state', query_string=b'wait=xyz&timeout=5')
+
+    new_scope = run(wait_for_state(server, scope))
+    assert new_scope['query_string'] == b'timeout=5'
+    assert scope['query_string'] == b'wait=xyz&timeout=5', \
+        "Should not modify the original scope"
@@ -1,6 +1,7 @@
 from nose.tools import eq_, raises
 
-from sr.comp.http.query_utils import parse_difference_string
+from sr.comp.http.query_utils import (parse_difference_bounds,
+                                      parse_difference_string)
 
 def test_exact_equal():
     assert parse_difference_string('4')(4)
@@ -65,3 +66,17 @@ def test_inverted_bounds():
 @raises(ValueError)
 def test_double_open():
     parse_difference_string('..', str)
+
+def test_bounds_exact():
+    lower, upper = parse_difference_bounds('cheese', str)
+    assert lower == 'cheese'
+    assert lower is upper
+
+def test_bounds_lower():
+    assert parse_difference_bounds('4..') == (4, None)
+
+def test_bounds_upper():
+    assert parse_difference_bounds('..4') == (None, 4)
+
+def test_bounds_range():
+    assert parse_difference_bounds('4..6') == (4, 6)
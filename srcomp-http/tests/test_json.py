@@ -34,3 +34,12 @@ def test_enum():
     expected = '"{}"'.format(val)
 
     assert output == expected
+
+def test_team_mapping():
+    from sr.comp.scores import TeamMapping
+
+    encoder = get_encoder()
+
+    output = encoder.encode(TeamMapping(('ABC',), (4,)))
+
+    assert json.loads(output) == {'ABC': 4}
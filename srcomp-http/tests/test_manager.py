@@ -1,8 +1,11 @@
 
 import mock
 import os.path
+import threading
+import time
 
-from sr.comp.http.manager import update_lock, LOCK_FILE
+from sr.comp.http.manager import (update_lock, LOCK_FILE, SNAPSHOT_HISTORY,
+                                  SRCompManager, monotonic)
 
 def test_update_lock():
     mock_excl_fd = mock.MagicMock()
@@ -43,3 +46,84 @@ def test_update_lock_when_exception():
 
         assert mock_excl_fd.__exit__.called, "Failed to release the lock file"
         assert not mock_touch.called, "Should not touch the update file on failure"
+
+def build_comp(state):
+    comp = mock.Mock()
+    comp.state = state
+    comp.schedule.matches = []
+    comp.load_times = {'teams': 0.5}
+    return comp
+
+def test_snapshot_history():
+    comps = [build_comp('state-{0}'.format(n))
+             for n in range(SNAPSHOT_HISTORY + 1)]
+    comp_iter = iter(comps)
+
+    manager = SRCompManager()
+    with mock.patch('sr.comp.http.manager.SRComp',
+                    side_effect=lambda root, **kwargs: next(comp_iter)), \
+         mock.patch('sr.comp.http.manager.share_lock'):
+        for comp in comps[:-1]:
+            manager._load()
+            manager.diffs[(comps[0].state, comp.state)] = {}
+
+        # Loading one more state pushes out the oldest
+        manager._load()
+
+    assert manager.snapshot().get_comp() is comps[-1]
+    assert manager.snapshot(comps[1].state).get_comp() is comps[1]
+
+    try:
+        manager.snapshot(comps[0].state)
+    except KeyError:
+        pass
+    else:
+        assert False, "Should have forgotten the oldest state"
+
+    assert not manager.diffs, "Should have forgotten diffs of the oldest state"
+
+def test_snapshot_of_snapshot():
+    manager = build_loaded_manager('current')
+
+    snapshot = manager.snapshot()
+    assert snapshot.snapshot() is snapshot
+    assert snapshot.snapshot('current') is snapshot
+
+def build_loaded_manager(state):
+    manager = SRCompManager()
+    with mock.patch('sr.comp.http.manager.SRComp',
+                    return_value=build_comp(state)), \
+         mock.patch('sr.comp.http.manager.share_lock'):
+        manager._load()
+    return manager
+
+def test_wait_for_change_already_changed():
+    manager = build_loaded_manager('current')
+    comp = manager.wait_for_change('old', 10)
+    assert comp.state == 'current'
+
+def test_wait_for_change_timeout():
+    manager = build_loaded_manager('current')
+    start = monotonic()
+    comp = manager.wait_for_change('current', 0.1)
+    assert comp.state == 'current'
+    assert monotonic() - start >= 0.1, "Should have waited for the timeout"
+
+def test_wait_for_change_woken_by_load():
+    manager = build_loaded_manager('current')
+
+    def load_new():
+        time.sleep(0.1)
+        with mock.patch('sr.comp.http.manager.SRComp',
+                        return_value=build_comp('new')), \
+             mock.patch('sr.comp.http.manager.share_lock'):
+            manager._load()
+
+    thread = threading.Thread(target=load_new)
+    thread.start()
+    start = monotonic()
+    comp = manager.wait_for_change('current', 10)
+    thread.join()
+
+    assert comp.state == 'new'
+    assert monotonic() - start < 0.5, "Should have been woken by the load"
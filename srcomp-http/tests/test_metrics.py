@@ -0,0 +1,64 @@
+from nose.tools import eq_
+
+from sr.comp.http.metrics import Histogram, Metrics
+
+
+def test_histogram_buckets():
+    histogram = Histogram([1, 2, 5])
+    for value in (0.5, 1, 1.5, 3, 10):
+        histogram.observe(value)
+
+    eq_(list(histogram.cumulative_counts()),
+        [(1, 2), (2, 3), (5, 4), ('+Inf', 5)])
+    eq_(histogram.sum, 16)
+    eq_(histogram.count, 5)
+
+def test_render_histogram():
+    metrics = Metrics()
+    metrics.observe('srcomp_http_request_duration_seconds', 0.002,
+                    route='/teams/<tla>')
+
+    lines = metrics.render().splitlines()
+
+    assert '# TYPE srcomp_http_request_duration_seconds histogram' in lines
+    assert 'srcomp_http_request_duration_seconds_bucket{route="/teams/<tla>",le="0.001"} 0' in lines, lines
+    assert 'srcomp_http_request_duration_seconds_bucket{route="/teams/<tla>",le="0.0025"} 1' in lines, lines
+    assert 'srcomp_http_request_duration_seconds_bucket{route="/teams/<tla>",le="+Inf"} 1' in lines, lines
+    assert 'srcomp_http_request_duration_seconds_sum{route="/teams/<tla>"} 0.002' in lines, lines
+    assert 'srcomp_http_request_duration_seconds_count{route="/teams/<tla>"} 1' in lines, lines
+
+def test_render_escapes_labels():
+    metrics = Metrics()
+    metrics.increment('things', thing='a "quoted"\\value')
+
+    eq_(metrics.render().splitlines()[-1],
+        'things{thing="a \\"quoted\\"\\\\value"} 1')
+
+def test_cache_hit_ratio():
+    metrics = Metrics()
+    for hit in (True, True, True, False):
+        metrics.count_cache('match_info', hit)
+    metrics.count_cache('diff', False)
+
+    lines = metrics.render().splitlines()
+
+    assert 'srcomp_http_cache_hits_total{cache="match_info"} 3' in lines, lines
+    assert 'srcomp_http_cache_misses_total{cache="match_info"} 1' in lines, lines
+    assert 'srcomp_http_cache_hit_ratio{cache="match_info"} 0.75' in lines, lines
+    assert 'srcomp_http_cache_hit_ratio{cache="diff"} 0.0' in lines, lines
+
+def test_observe_reload():
+    metrics = Metrics()
+    metrics.observe_reload({'teams': 0.25, 'knockout': 1.5})
+
+    lines = metrics.render().splitlines()
+
+    assert 'srcomp_http_reload_duration_seconds_sum 1.75' in lines, lines
+    assert 'srcomp_http_reload_phase_duration_seconds_sum{phase="teams"} 0.25' in lines, lines
+    assert 'srcomp_http_reload_phase_duration_seconds_sum{phase="knockout"} 1.5' in lines, lines
+
+def test_reset():
+    metrics = Metrics()
+    metrics.increment('things')
+    metrics.reset()
+    eq_(metrics.render(), '\n')
@@ -0,0 +1,73 @@
+from collections import namedtuple
+from multiprocessing import RawValue
+import os
+import shutil
+import tempfile
+
+from sr.comp.http.metrics import metrics
+from sr.comp.http.prefork import (SharedSnapshotManager, SnapshotPublisher,
+                                  snapshot_path)
+
+
+FakeComp = namedtuple('FakeComp', ['state', 'load_times'])
+FakeComp.__new__.__defaults__ = ({'teams': 0.5},)
+
+
+def with_directory(f):
+    def wrapper():
+        directory = tempfile.mkdtemp()
+        try:
+            f(directory)
+        finally:
+            shutil.rmtree(directory)
+    wrapper.__name__ = f.__name__
+    return wrapper
+
+
+@with_directory
+def test_publish_and_load(directory):
+    generation = RawValue('L', 0)
+    publisher = SnapshotPublisher(directory, generation)
+    manager = SharedSnapshotManager(directory, generation)
+
+    publisher.publish(FakeComp('abc'), 'infos-abc')
+    assert generation.value == 1
+
+    comp = manager.get_comp()
+    assert comp == FakeComp('abc')
+    assert manager.get_comp() is comp, "Should not reload an unchanged state"
+    assert manager.match_infos == 'infos-abc'
+
+    publisher.publish(FakeComp('def'), 'infos-def')
+    assert manager.get_comp() == FakeComp('def')
+    assert manager.recent_snapshot('abc').get_comp() == FakeComp('abc')
+
+
+@with_directory
+def test_load_records_metrics(directory):
+    generation = RawValue('L', 0)
+    publisher = SnapshotPublisher(directory, generation)
+    manager = SharedSnapshotManager(directory, generation)
+
+    metrics.reset()
+    publisher.publish(FakeComp('abc'), None)
+    manager.get_comp()
+
+    text = metrics.render()
+    assert 'srcomp_http_reload_duration_seconds_count 1\n' in text, text
+    for phase in ('teams', 'snapshot'):
+        line = 'srcomp_http_reload_phase_duration_seconds_count{{phase="{0}"}} 1\n'.format(phase)
+        assert line in text, text
+
+
+@with_directory
+def test_publish_removes_old_snapshots(directory):
+    generation = RawValue('L', 0)
+    publisher = SnapshotPublisher(directory, generation)
+
+    for state in ('abc', 'def', 'ghi'):
+        publisher.publish(FakeComp(state), None)
+
+    assert not os.path.exists(snapshot_path(directory, 1))
+    assert os.path.exists(snapshot_path(directory, 2))
+    assert os.path.exists(snapshot_path(directory, 3))
@@ -1,6 +1,9 @@
+from datetime import datetime, timedelta
+
 import mock
 
-from sr.comp.http.query_utils import get_scores
+from sr.comp.http.query_utils import (get_scores, match_json_info,
+                                      MatchIndex, MatchInfoCache)
 from sr.comp.match_period import Match, MatchType
 
 
@@ -89,3 +92,184 @@ def test_no_match():
     info = get_scores(scores, build_match(num=1, arena='B'))
     expected = None
     assert expected == info
+
+
+def build_comp():
+    start = datetime(2016, 4, 16, 10)
+    matches = [
+        {'A': build_match(0, 'A', ['ABC'], start, start + timedelta(minutes=5),
+                          MatchType.league)},
+        {'A': build_match(1, 'A', ['DEF'], start + timedelta(minutes=5),
+                          start + timedelta(minutes=10), MatchType.knockout,
+                          use_resolved_ranking=True)},
+    ]
+
+    def get_staging_times(match):
+        return {
+            'opens': match.start_time - timedelta(minutes=5),
+            'closes': match.start_time - timedelta(minutes=2),
+            'signal_teams': match.start_time - timedelta(minutes=4),
+            'signal_shepherds': {
+                'Blue': match.start_time - timedelta(minutes=4),
+            },
+        }
+
+    comp = mock.Mock()
+    comp.scores = build_scores()
+    comp.schedule.matches = matches
+    comp.schedule.match_slot_lengths = {
+        'pre': timedelta(minutes=1),
+        'match': timedelta(minutes=3),
+        'post': timedelta(minutes=1),
+        'total': timedelta(minutes=5),
+    }
+    comp.schedule.staging_times = {'opens': timedelta(minutes=5)}
+    comp.schedule.get_staging_times = mock.Mock(side_effect=get_staging_times)
+    return comp
+
+
+def test_match_info_cache_matches_match_json_info():
+    comp = build_comp()
+    cache = MatchInfoCache(comp)
+
+    expected = [match_json_info(comp, match)
+                for slot in comp.schedule.matches
+                for match in slot.values()]
+    assert expected == cache.all()
+
+    match = comp.schedule.matches[1]['A']
+    assert expected[1] == cache.get(match)
+    assert comp.schedule.get_staging_times(match) == \
+        cache.get_staging_times(match)
+
+
+def test_match_info_cache_unknown_match():
+    comp = build_comp()
+    cache = MatchInfoCache(comp)
+
+    match = comp.schedule.matches[0]['A']._replace(num=5)
+    assert match_json_info(comp, match) == cache.get(match)
+
+
+def test_match_info_cache_reuses_unchanged():
+    comp = build_comp()
+    old_cache = MatchInfoCache(comp)
+
+    new_comp = build_comp()
+    new_cache = MatchInfoCache(new_comp, old_cache)
+
+    for old, new in zip(old_cache.all(), new_cache.all()):
+        assert old is new
+    new_comp.schedule.get_staging_times.assert_not_called()
+
+
+def test_match_info_cache_rebuilds_changed_scores():
+    comp = build_comp()
+    old_cache = MatchInfoCache(comp)
+
+    new_comp = build_comp()
+    new_comp.scores.league.game_points[('A', 0)] = 'changed'
+    new_cache = MatchInfoCache(new_comp, old_cache)
+
+    old_info, new_info = old_cache.all()[0], new_cache.all()[0]
+    assert old_info is not new_info
+    assert 'changed' == new_info['scores']['game']
+    assert old_info['times'] is new_info['times']
+    assert old_cache.all()[1] is new_cache.all()[1]
+
+
+def test_match_info_cache_rebuilds_changed_times():
+    comp = build_comp()
+    old_cache = MatchInfoCache(comp)
+
+    new_comp = build_comp()
+    new_comp.schedule.staging_times = {'opens': timedelta(minutes=6)}
+    new_cache = MatchInfoCache(new_comp, old_cache)
+
+    for old, new in zip(old_cache.all(), new_cache.all()):
+        assert old is not new
+        assert old == new
+
+
+def build_index_matches():
+    start = datetime(2016, 4, 16, 10)
+    slot = timedelta(minutes=5)
+    matches = []
+    for num in range(6):
+        for arena in ('A', 'B'):
+            type_ = MatchType.league if num < 4 else MatchType.knockout
+            matches.append(build_match(num, arena, [], start + num * slot,
+                                       start + (num + 1) * slot, type_))
+    return matches
+
+
+SLOT_LENGTHS = {'pre': timedelta(minutes=1), 'match': timedelta(minutes=3)}
+
+
+def find_nums(matches, filters, limit=None):
+    index = MatchIndex(matches, SLOT_LENGTHS)
+    return [(matches[pos].arena, matches[pos].num)
+            for pos in index.find(filters, limit)]
+
+
+def test_match_index_no_filters():
+    matches = build_index_matches()
+    assert find_nums(matches, {}) == [(m.arena, m.num) for m in matches]
+    assert find_nums(matches, {}, 0) == []
+    assert find_nums(matches, {}, 1) == [('A', 0)]
+    assert find_nums(matches, {}, -1) == [('B', 5)]
+
+
+def test_match_index_grouped():
+    matches = build_index_matches()
+    assert find_nums(matches, {'arena': ('B', 'B'),
+                               'type': (MatchType.knockout,
+                                        MatchType.knockout)}) == \
+        [('B', 4), ('B', 5)]
+    assert find_nums(matches, {'arena': ('C', 'C')}) == []
+
+
+def test_match_index_grouped_range():
+    matches = build_index_matches()
+    assert find_nums(matches, {'arena': ('A', None), 'num': (5, 5)}) == \
+        [('A', 5), ('B', 5)]
+
+
+def test_match_index_sorted():
+    matches = build_index_matches()
+    start = datetime(2016, 4, 16, 10)
+    filters = {
+        'arena': ('A', 'A'),
+        'game_start_time': (start + timedelta(minutes=6), None),
+    }
+    assert find_nums(matches, filters) == [('A', 1), ('A', 2), ('A', 3),
+                                           ('A', 4), ('A', 5)]
+    assert find_nums(matches, filters, 2) == [('A', 1), ('A', 2)]
+    assert find_nums(matches, filters, -2) == [('A', 4), ('A', 5)]
+
+
+def test_match_index_sorted_out_of_order():
+    matches = build_index_matches()
+    matches[0], matches[-1] = matches[-1], matches[0]
+    assert find_nums(matches, {'num': (None, 1)}) == \
+        [('B', 0), ('A', 1), ('B', 1), ('A', 0)]
+
+
+def test_match_index_team():
+    matches = build_index_matches()
+    matches[1] = matches[1]._replace(teams=['ABC', None, 'DEF', None])
+    matches[4] = matches[4]._replace(teams=[None, 'ABC', None, None])
+    matches[9] = matches[9]._replace(teams=['ABC', None, None, None])
+
+    index = MatchIndex(matches, SLOT_LENGTHS)
+
+    def find(filters, limit=None, team='ABC'):
+        return [(matches[pos].arena, matches[pos].num)
+                for pos in index.find(filters, limit, team)]
+
+    assert find({}) == [('B', 0), ('A', 2), ('B', 4)]
+    assert find({}, team='DEF') == [('B', 0)]
+    assert find({}, team='XYZ') == []
+    assert find({'arena': ('B', 'B')}) == [('B', 0), ('B', 4)]
+    assert find({'num': (1, None)}, limit=1) == [('A', 2)]
+    assert find({}, limit=-1) == [('B', 4)]
@@ -5,15 +5,23 @@ import imp
 import os
 from subprocess import check_output
 import sys
+import threading
 
 from sr.comp import arenas, matches, scores, teams, venue
-from sr.comp.winners import compute_awards
+from sr.comp.timing import PhaseTimer
+from sr.comp.winners import compute_awards, load_explicit_awards
+
+
+_scorer_lock = threading.Lock()
 
 
 def load_scorer(root):
     """
     Load the scorer module from Compstate repo.
 
+    Loads are serialised, since the import path is changed while the
+    module loads, and the path is restored in place, rather than replaced.
+
     :param str root: The path to the compstate repo.
     """
 
@@ -21,12 +29,13 @@ def load_scorer(root):
     score_directory = os.path.join(root, 'scoring')
     score_source = os.path.join(score_directory, 'score.py')
 
-    saved_path = copy(sys.path)
-    sys.path.append(score_directory)
-
-    imported_library = imp.load_source('score.py', score_source)
-
-    sys.path = saved_path
+    with _scorer_lock:
+        saved_path = copy(sys.path)
+        sys.path.append(score_directory)
+        try:
+            imported_library = imp.load_source('score.py', score_source)
+        finally:
+            sys.path[:] = saved_path
 
     return imported_library.Scorer
 
@@ -36,55 +45,82 @@ class SRComp(object):
     A class containing all the various parts of a competition.
 
     :param str root: The root path of the ``compstate`` repo.
+    :param hooks: Callables to instrument each phase of loading the
+                  competition with, as for :class:`sr.comp.timing.PhaseTimer`.
+    :param previous: An instance for a previous state of the same
+                     competition, if any. Parts of it which are unaffected
+                     by the changes since (currently the knockout matches)
+                     are updated rather than rebuilt from scratch.
     """
 
-    def __init__(self, root):
+    def __init__(self, root, hooks=(), previous=None):
         self.root = root
 
-        self.state = check_output(('git', 'rev-parse', 'HEAD'),
-                                  universal_newlines=True,
-                                  cwd=root).strip()
-        """The current commit of the Compstate repository."""
+        timer = PhaseTimer(hooks)
 
-        self.teams = teams.load_teams(os.path.join(root, "teams.yaml"))
-        """A :class:`collections.OrderedDict` mapping TLAs to
-        :class:`sr.comp.teams.Team` objects."""
+        with timer.phase('state'):
+            self.state = check_output(('git', 'rev-parse', 'HEAD'),
+                                      universal_newlines=True,
+                                      cwd=root).strip()
+            """The current commit of the Compstate repository."""
 
-        scorer = load_scorer(root)
-        self.scores = scores.Scores(root, self.teams.keys(), scorer)
+        with timer.phase('teams'):
+            self.teams = teams.load_teams(os.path.join(root, "teams.yaml"))
+            """A :class:`collections.OrderedDict` mapping TLAs to
+            :class:`sr.comp.teams.Team` objects."""
+
+        with timer.phase('scorer'):
+            self._scorer = load_scorer(root)
+
+        self.scores = scores.Scores(root, self.teams.keys(), self._scorer,
+                                    timer)
         """A :class:`sr.comp.scores.Scores` instance."""
 
-        self.arenas = arenas.load_arenas(os.path.join(root, "arenas.yaml"))
-        """A :class:`collections.OrderedDict` mapping arena names to
-        :class:`sr.comp.arenas.Arena` objects."""
+        with timer.phase('arenas'):
+            self.arenas = arenas.load_arenas(os.path.join(root, "arenas.yaml"))
+            """A :class:`collections.OrderedDict` mapping arena names to
+            :class:`sr.comp.arenas.Arena` objects."""
+
+        prev_schedule = None
+        if previous is not None:
+            prev_schedule = previous.schedule
 
         schedule_fname = os.path.join(root, "schedule.yaml")
         league_fname = os.path.join(root, "league.yaml")
         self.schedule = matches.MatchSchedule.create(schedule_fname,
                                                      league_fname, self.scores,
-                                                     self.arenas, self.teams)
+                                                     self.arenas, self.teams,
+                                                     timer=timer,
+                                                     previous=prev_schedule)
         """A :class:`sr.comp.matches.MatchSchedule` instance."""
 
         self.timezone = self.schedule.timezone
         """The timezone of the competition."""
 
-        self.corners = arenas.load_corners(os.path.join(root, "arenas.yaml"))
-        """A :class:`collections.OrderedDict` mapping corner numbers to
-        :class:`sr.comp.arenas.Corner` objects."""
+        with timer.phase('corners'):
+            self.corners = arenas.load_corners(os.path.join(root, "arenas.yaml"))
+            """A :class:`collections.OrderedDict` mapping corner numbers to
+            :class:`sr.comp.arenas.Corner` objects."""
 
-        self.awards = compute_awards(self.scores,
-                                     self.schedule.final_match,
-                                     self.teams,
-                                     os.path.join(root, "awards.yaml"))
-        """A :class:`dict` mapping :class:`sr.comp.winners.Award` objects to
-        a :class:`list` of teams."""
+        with timer.phase('awards'):
+            self._explicit_awards = load_explicit_awards(
+                os.path.join(root, "awards.yaml"))
+            self.awards = self._compute_awards()
+            """A :class:`dict` mapping :class:`sr.comp.winners.Award` objects
+            to a :class:`list` of teams."""
 
-        self.venue = venue.Venue(self.teams.keys(),
-                                 os.path.join(root, "layout.yaml"),
-                                 os.path.join(root, "shepherding.yaml"))
-        """A :class:`sr.comp.venue.Venue` instance."""
+        with timer.phase('venue'):
+            self.venue = venue.Venue(self.teams.keys(),
+                                     os.path.join(root, "layout.yaml"),
+                                     os.path.join(root, "shepherding.yaml"))
+            """A :class:`sr.comp.venue.Venue` instance."""
 
-        self.venue.check_staging_times(self.schedule.staging_times)
+            self.venue.check_staging_times(self.schedule.staging_times)
+
+        self.load_times = timer.durations
+        """A :class:`collections.OrderedDict` mapping the names of the phases
+        of loading the competition (such as ``teams`` or ``scores.league``)
+        to how long each took, in seconds."""
 
         pyver = sys.version_info
         if pyver[0] == 3 and (pyver < (3, 4, 4) or pyver == (3, 5, 0)):
@@ -93,3 +129,67 @@ class SRComp(object):
                  "have the same `dst()` and `utcoffset()` values (such as BST). "
                  "Using Python 2 instead is recommended. "
                  "See https://bugs.python.org/issue23600.")
+
+    def __getstate__(self):
+        # The scorer is loaded from the compstate, so may not be importable
+        # elsewhere; it's loaded again from the compstate when unpickled.
+        state = self.__dict__.copy()
+        state['_scorer'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Along with the rest of the competition, rather than when first
+        # needed, which could be while serving a request
+        self._scorer = load_scorer(self.root)
+
+    def _compute_awards(self):
+        awards = compute_awards(self.scores, self.schedule.final_match,
+                                self.teams)
+        awards.update(self._explicit_awards)
+        return awards
+
+    def get_match_type(self, arena, num):
+        """
+        Get the type of a scheduled match.
+
+        :param str arena: The arena of the match.
+        :param int num: The number of the match.
+        :raise ValueError: If there is no such match.
+        """
+        if 0 <= num < len(self.schedule.matches):
+            match = self.schedule.matches[num].get(arena)
+            if match is not None:
+                return match.type
+        raise ValueError("There is no match {0} in arena '{1}'."
+                         .format(num, arena))
+
+    def with_score_sheets(self, sheets):
+        """
+        Get a copy of this competition with some hypothetical score sheets,
+        which replace any existing scores for the same matches, to find out
+        what would happen if the matches had those results.
+
+        Only the parts of the competition which depend on the scores are
+        recomputed (the scores of the types of match the sheets are for,
+        the knockouts, which are updated incrementally where possible, and
+        the awards) and nothing is read from disk or committed, so this is
+        quick enough to evaluate many scenarios interactively. The copy has
+        the same :attr:`state` as this competition.
+
+        :param list sheets: The score sheets, each as it would be loaded
+                            from a score sheet file, for matches in the
+                            current schedule.
+        :raise ValueError: If a sheet is for a match which isn't scheduled.
+        """
+        sheets_by_type = {}
+        for y in sheets:
+            match_type = self.get_match_type(y["arena_id"], y["match_number"])
+            sheets_by_type.setdefault(match_type, []).append(y)
+
+        comp = copy(self)
+        comp.scores = self.scores.with_score_sheets(sheets_by_type,
+                                                    self._scorer)
+        comp.schedule = self.schedule.with_scores(comp.scores)
+        comp.awards = comp._compute_awards()
+        return comp
@@ -21,14 +21,22 @@ class KnockoutScheduler(object):
     :param dict arenas: The arenas.
     :param dict teams: The teams.
     :param config: Custom configuration for the knockout scheduler.
+    :param previous: The scheduler of a previous state of the competition,
+                     if any. If the layout of the knockouts hasn't changed
+                     since then, the previous knockout matches are updated
+                     for any new knockout scores, rather than scheduled
+                     from scratch, and the matches whose teams are
+                     unchanged are reused.
     """
 
-    def __init__(self, schedule, scores, arenas, teams, config):
+    def __init__(self, schedule, scores, arenas, teams, config,
+                 previous=None):
         self.schedule = schedule
         self.scores = scores
         self.arenas = arenas
         self.teams = teams
         self.config = config
+        self.previous = previous
 
         # The knockout matches appear in the normal matches list
         # but this list provides them in groups of rounds.
@@ -40,25 +48,37 @@ class KnockoutScheduler(object):
         # involve the second seed).
         self.knockout_rounds = []
 
+        self.layout_key = None
+        """
+        The inputs which determine the times, the first round and the zone
+        randomisation of the knockout matches. If these are unchanged then
+        only the teams in the later rounds can differ.
+        """
+
+        # The teams in each match (keyed by arena and number) in seeded
+        # order, and the order they're randomised into zones in
+        self._seeded_teams = {}
+        self._zone_orders = {}
+
         self.R = stable_random.Random()
 
+        # Taken from the schedule when first needed, or counted from our
+        # scores if the schedule was built without them
+        self._unscored_league_matches = None
+
     def _played_all_league_matches(self):
         """
         Check if all league matches have been played.
 
         :return: :py:bool:`True` if we've played all league matches.
         """
-
-        for arena_matches in self.schedule.matches:
-            for match in arena_matches.values():
-                if match.type != MatchType.league:
-                    continue
-
-                if (match.arena, match.num) not in \
-                        self.scores.league.game_points:
-                    return False
-
-        return True
+        if self._unscored_league_matches is None:
+            unscored = self.schedule.unscored_league_matches
+            if unscored is None:
+                unscored = self.schedule.count_unscored_league_matches(
+                    self.scores.league)
+            self._unscored_league_matches = unscored
+        return self._unscored_league_matches == 0
 
     @staticmethod
     def get_match_display_name(rounds_remaining, round_num, global_num):
@@ -105,10 +125,17 @@ class KnockoutScheduler(object):
                     "Fill empty zones with None"
                     teams += [None] * (4 - len(teams))
 
-                # Randomise the zones
-                self.R.shuffle(teams)
-
                 num = len(self.schedule.matches)
+
+                # Randomise the zones. The shuffle doesn't depend on the
+                # teams, so the order is kept to apply to other teams in the
+                # same match when only its teams change.
+                zone_order = list(range(len(teams)))
+                self.R.shuffle(zone_order)
+                self._seeded_teams[(arena, num)] = tuple(teams)
+                self._zone_orders[(arena, num)] = zone_order
+                teams = [teams[i] for i in zone_order]
+
                 display_name = self.get_match_display_name(rounds_remaining,
                                                            round_num, num)
 
@@ -157,8 +184,11 @@ class KnockoutScheduler(object):
         ranking = self.get_ranking(game)
         return ranking[:2]
 
-    def _add_round(self, arenas, rounds_remaining):
-        prev_round = self.knockout_rounds[-1]
+    def _get_round_teams(self, prev_round):
+        """
+        Get the teams in each match of the round after the given one: the
+        winners of each pair of its matches.
+        """
         matches = []
 
         for i in range(0, len(prev_round), 2):
@@ -168,6 +198,10 @@ class KnockoutScheduler(object):
 
             matches.append(winners)
 
+        return matches
+
+    def _add_round(self, arenas, rounds_remaining):
+        matches = self._get_round_teams(self.knockout_rounds[-1])
         self._add_round_of_matches(matches, arenas, rounds_remaining)
 
     def _get_non_dropped_out_teams(self, for_match):
@@ -176,11 +210,23 @@ class KnockoutScheduler(object):
                  if self.teams[tla].is_still_around(for_match)]
         return teams
 
-    def _add_first_round(self, conf_arity=None):
+    def _get_first_round_teams(self):
+        """Get the seeded teams which take part in the knockouts."""
         next_match_num = len(self.schedule.matches)
         teams = self._get_non_dropped_out_teams(next_match_num)
         if not self._played_all_league_matches():
             teams = [UNKNOWABLE_TEAM] * len(teams)
+        return teams
+
+    def _get_layout_key(self, teams):
+        return (tuple(teams), len(self.schedule.matches), list(self.arenas),
+                self.schedule.match_duration, list(self.schedule.delays),
+                self.config["match_periods"]["knockout"],
+                self.config["knockout"])
+
+    def _add_first_round(self, conf_arity=None, teams=None):
+        if teams is None:
+            teams = self._get_first_round_teams()
 
         arity = len(teams)
         if conf_arity is not None and conf_arity < arity:
@@ -204,6 +250,103 @@ class KnockoutScheduler(object):
     def get_rounds_remaining(prev_matches):
         return int(math.log(len(prev_matches), 2))
 
+    def get_seeded_teams(self, ranking):
+        """
+        Get the teams which take part in the knockouts, in seeded order.
+
+        :param list ranking: The TLAs of all the teams, in league order.
+        """
+        first_match = self.schedule.n_league_matches
+        return [tla for tla in ranking
+                if self.teams[tla].is_still_around(first_match)]
+
+    def get_bracket(self):
+        """
+        Describe where the teams in each knockout match come from, without
+        depending on who they are. This is what
+        :class:`sr.comp.projection.KnockoutProjection` simulates.
+
+        :return: A list of rounds, each of which is a list of matches, each
+                 of which is a list of references to the teams in it. A
+                 reference is either an :class:`int` seed (an index into
+                 the list from :meth:`get_seeded_teams`) or a tuple of the
+                 round number, match number (within the round) and ranked
+                 position (from ``0``) in that match of the team.
+        """
+        n_teams = len(self.get_seeded_teams(self.scores.league.positions))
+        arity = n_teams
+        conf_arity = self.config["knockout"].get("arity")
+        if conf_arity is not None and conf_arity < arity:
+            arity = conf_arity
+
+        rounds = [knockout.first_round_seeding(arity)]
+
+        while len(rounds[-1]) > 1:
+            round_num = len(rounds) - 1
+            n_matches = len(rounds[-1])
+            matches = []
+            # The winners of each pair of matches go through together
+            for i in range(0, n_matches, 2):
+                matches.append([(round_num, match_num, pos)
+                                for match_num in range(i, min(i + 2,
+                                                              n_matches))
+                                for pos in range(2)])
+            rounds.append(matches)
+
+        return rounds
+
+    def _can_update_previous(self):
+        previous = self.previous
+        return type(previous) is type(self) and \
+            previous.layout_key is not None and \
+            previous.layout_key == self.layout_key
+
+    def _update_previous(self):
+        """
+        Schedule the same knockout matches as the previous scheduler, at the
+        same times, updating the teams in each for the current scores. The
+        previous matches are kept where their teams haven't changed.
+        """
+        previous = self.previous
+        updated = {}
+
+        for prev_round in previous.knockout_rounds:
+            if self.knockout_rounds:
+                round_teams = self._get_round_teams(self.knockout_rounds[-1])
+            else:
+                round_teams = None
+
+            self.knockout_rounds.append([])
+            for i, prev_match in enumerate(prev_round):
+                key = (prev_match.arena, prev_match.num)
+                seeded_teams = previous._seeded_teams[key]
+                zone_order = previous._zone_orders[key]
+
+                if round_teams is not None:
+                    teams = round_teams[i]
+                    teams += [None] * (len(seeded_teams) - len(teams))
+                    seeded_teams = tuple(teams)
+
+                if seeded_teams == previous._seeded_teams[key]:
+                    match = prev_match
+                else:
+                    teams = [seeded_teams[j] for j in zone_order]
+                    match = prev_match._replace(teams=teams)
+
+                self._seeded_teams[key] = seeded_teams
+                self._zone_orders[key] = zone_order
+                self.knockout_rounds[-1].append(match)
+                updated[key] = match
+
+        for prev_slot in previous.period.matches:
+            slot = {arena: updated[(match.arena, match.num)]
+                    for arena, match in prev_slot.items()}
+            if all(slot[arena] is match for arena, match in prev_slot.items()):
+                # Nothing in the slot has changed
+                slot = prev_slot
+            self.schedule.matches.append(slot)
+            self.period.matches.append(slot)
+
     def add_knockouts(self):
         """Add the knockouts to the schedule."""
 
@@ -218,7 +361,19 @@ class KnockoutScheduler(object):
         knockout_conf = self.config["knockout"]
         round_spacing = timedelta(seconds=knockout_conf["round_spacing"])
 
-        self._add_first_round(conf_arity=knockout_conf.get('arity'))
+        teams = self._get_first_round_teams()
+        self.layout_key = self._get_layout_key(teams)
+
+        if self._can_update_previous():
+            self._update_previous()
+            # The previous scheduler is no longer needed and shouldn't be
+            # kept alive by this one
+            self.previous = None
+            return
+
+        self.previous = None
+        self._add_first_round(conf_arity=knockout_conf.get('arity'),
+                              teams=teams)
 
         while len(self.knockout_rounds[-1]) > 1:
 
@@ -1,6 +1,7 @@
 """Match schedule library."""
 
 from collections import namedtuple
+import copy
 import datetime
 from datetime import timedelta
 
@@ -11,11 +12,21 @@ from sr.comp.match_period import MatchPeriod, Match, MatchType
 from sr.comp.match_period_clock import MatchPeriodClock
 from sr.comp.knockout_scheduler import KnockoutScheduler
 from sr.comp.static_knockout_scheduler import StaticScheduler
+from sr.comp.teams import intern_tla
+from sr.comp.timing import PhaseTimer
 
 
 Delay = namedtuple("Delay",
                    ["delay", "time"])
 
+
+def get_knockout_scheduler(y):
+    """Get the knockout scheduler class configured by the given config."""
+    if y['knockout'].get('static', False):
+        return StaticScheduler
+    return KnockoutScheduler
+
+
 def parse_ranges(ranges):
     """
     Parse a comma seprated list of numbers which may include ranges
@@ -41,7 +52,7 @@ class MatchSchedule(object):
 
     @classmethod
     def create(cls, config_fname, league_fname, scores, arenas, teams,
-               knockout_scheduler=None):
+               knockout_scheduler=None, timer=None, previous=None):
         """
         Create a new match schedule around the given config data.
 
@@ -51,28 +62,41 @@ class MatchSchedule(object):
         :param dict arenas: A mapping of arena ids to :class:`.Arena` instances.
         :param dict teams: A mapping of TLAs to :class:`.Team` instances.
         :param class knockout_scheduler: The scheduler to use for the knockcout stages.
+        :param `.PhaseTimer` timer: Records how long building the league,
+                                    knockout and tiebreaker parts of the
+                                    schedule takes, if given.
+        :param `.MatchSchedule` previous: The schedule of a previous state of
+                                          the competition, if any, whose
+                                          knockout matches are updated
+                                          rather than rebuilt where possible.
         """
 
-        y = yaml_loader.load(config_fname)
+        if timer is None:
+            timer = PhaseTimer()
 
-        league = yaml_loader.load(league_fname)['matches']
+        with timer.phase('schedule'):
+            y = yaml_loader.load(config_fname)
 
-        schedule = cls(y, league, teams)
+            league = yaml_loader.load(league_fname)['matches']
 
-        if knockout_scheduler is None:
-            if y['knockout'].get('static', False):
-                knockout_scheduler = StaticScheduler
-            else:
-                knockout_scheduler = KnockoutScheduler
+            schedule = cls(y, league, teams)
+            schedule._count_scores(scores)
 
-        k = knockout_scheduler(schedule, scores, arenas, teams, y)
-        k.add_knockouts()
+        with timer.phase('knockout'):
+            if knockout_scheduler is None:
+                knockout_scheduler = get_knockout_scheduler(y)
+
+            kwargs = {}
+            if previous is not None:
+                kwargs['previous'] = getattr(previous, 'knockout_scheduler',
+                                             None)
 
-        schedule.knockout_rounds = k.knockout_rounds
-        schedule.match_periods.append(k.period)
+            schedule._add_knockouts(knockout_scheduler, scores, arenas,
+                                    teams, y, **kwargs)
 
         if 'tiebreaker' in y:
-            schedule.add_tiebreaker(scores, y['tiebreaker'])
+            with timer.phase('tiebreaker'):
+                schedule.add_tiebreaker(scores, y['tiebreaker'])
 
         return schedule
 
@@ -107,6 +131,58 @@ class MatchSchedule(object):
 
         self.n_league_matches = self.n_matches()
 
+        self._unscored_league_matches = None
+
+    @property
+    def unscored_league_matches(self):
+        """
+        The number of league games (that is, matches in each arena) which
+        haven't been scored, counted from the scores the schedule was
+        created with, or ``None`` if it was built without any scores.
+        """
+        return self._unscored_league_matches
+
+    def _count_scores(self, scores):
+        self._unscored_league_matches = \
+            self.count_unscored_league_matches(scores.league)
+
+    def _add_knockouts(self, knockout_scheduler, scores, arenas, teams, y,
+                       **kwargs):
+        k = knockout_scheduler(self, scores, arenas, teams, y, **kwargs)
+        k.add_knockouts()
+
+        self.knockout_scheduler = k
+        self.knockout_rounds = k.knockout_rounds
+        self.match_periods.append(k.period)
+
+    def with_scores(self, scores):
+        """
+        Get a copy of this schedule for different scores, with the knockouts
+        (and any tiebreaker) scheduled again for them. The league matches
+        are shared with this schedule and the knockouts are updated from its
+        knockouts where possible, rather than rebuilt, and nothing is read
+        from disk.
+
+        :param `.Scores` scores: The scores.
+        """
+        schedule = copy.copy(self)
+        schedule.__dict__.pop('tiebreaker', None)
+
+        schedule.matches = self.matches[:self.n_league_matches]
+        schedule.match_periods = [period for period in self.match_periods
+                                  if period.type == MatchType.league]
+        schedule._count_scores(scores)
+
+        previous = self.knockout_scheduler
+        schedule._add_knockouts(type(previous), scores, previous.arenas,
+                                previous.teams, previous.config,
+                                previous=previous)
+
+        if 'tiebreaker' in previous.config:
+            schedule.add_tiebreaker(scores, previous.config['tiebreaker'])
+
+        return schedule
+
     def _configure_match_slot_lengths(self, yamldata):
         raw_data = yamldata['match_slot_lengths']
         durations = {key: datetime.timedelta(0, value)
@@ -205,7 +281,8 @@ class MatchSchedule(object):
                 new_teams.append(None)
             else:
                 if self.teams[tla].is_still_around(since_match):
-                    new_teams.append(tla)
+                    # Share a single copy of each TLA between the matches
+                    new_teams.append(intern_tla(tla))
                 else:
                     new_teams.append(None)
         return new_teams
@@ -213,6 +290,7 @@ class MatchSchedule(object):
     def _build_matchlist(self, yamldata):
         """Build the match list."""
         self.matches = []
+        self._n_league_games = 0
         if yamldata is None:
             self.n_planned_league_matches = 0
             return
@@ -254,6 +332,7 @@ class MatchSchedule(object):
                                   use_resolved_ranking=False)
                     m[arena_name] = match
 
+                self._n_league_games += len(m)
                 period.matches.append(m)
                 self.matches.append(m)
 
@@ -263,6 +342,23 @@ class MatchSchedule(object):
                 if extra_spacing:
                     clock.advance_time(extra_spacing)
 
+    def count_unscored_league_matches(self, league_scores):
+        """
+        Count the league games (that is, matches in each arena) which
+        haven't been scored.
+
+        Only the scores themselves are looked at, rather than every game in
+        the schedule, so this takes time proportional to the number of
+        scores.
+
+        :param `.LeagueScores` league_scores: The league scores.
+        """
+        scored = 0
+        for arena, num in league_scores.game_points.keys():
+            if 0 <= num < self.n_league_matches and arena in self.matches[num]:
+                scored += 1
+        return self._n_league_games - scored
+
     def delay_at(self, date):
         """
         Calculates the active delay at a given ``date``. Intended for use
@@ -0,0 +1,291 @@
+"""Monte Carlo projection of how far each team will get in the knockouts."""
+
+from __future__ import division
+
+from collections import OrderedDict
+import heapq
+import random
+
+from sr.comp import ranker
+
+
+CHUNK_SIZE = 10000
+"""
+The number of simulations run together, with one random seed. Projections
+are split into chunks of this size so that they can be run in parallel and
+still give the same results for a given seed however many processes run them.
+"""
+
+
+def _simulate_chunk(args):
+    projection, simulations, seed = args
+    return projection.simulate(simulations, seed)
+
+
+class KnockoutProjection(object):
+    """
+    Projects the probability of each team reaching each round of the
+    knockouts, and of winning them, by simulating the rest of the
+    competition many times.
+
+    The game points of each team in each unscored match are drawn at random
+    from the game points the team has scored so far (in the league or the
+    knockouts), or from those of all the teams if it has no scores yet. The
+    remaining league matches are simulated and the league ranked as for the
+    :class:`.LeagueScores`, then the knockouts are played out as laid out by
+    the knockout scheduler's :meth:`~.KnockoutScheduler.get_bracket`, with
+    the top two teams in each match (ranked as for
+    :meth:`.KnockoutScores.calculate_ranking`) going through. Knockout
+    matches which have already been scored keep their actual result,
+    whenever the simulated teams are the ones who played in them.
+
+    Since the final's result is decided the same way as every other match,
+    ties in it are broken by league position rather than by a tiebreaker.
+
+    :param schedule: The :class:`.MatchSchedule`, including the knockouts.
+    :param scores: The :class:`.Scores`.
+    """
+
+    def __init__(self, schedule, scores):
+        scheduler = schedule.knockout_scheduler
+        positions = scores.league.positions
+
+        # Teams are identified by their index into the league ranking
+        self.tlas = tuple(positions.keys())
+        """The TLAs of the teams, in league order."""
+        index = {tla: i for i, tla in enumerate(self.tlas)}
+
+        self.bracket = scheduler.get_bracket()
+        """The layout of the knockouts, see
+        :meth:`.KnockoutScheduler.get_bracket`."""
+
+        seeded = set(scheduler.get_seeded_teams(self.tlas))
+        self._can_seed = [tla in seeded for tla in self.tlas]
+
+        # Only the teams at the top of the league, down to the last seed in
+        # the knockouts, need ranking
+        n_seeds = max([ref + 1 for round_matches in self.bracket
+                       for refs in round_matches for ref in refs
+                       if not isinstance(ref, tuple)] or [0])
+        self._n_ranked = n_seeds + self._can_seed.count(False)
+
+        samples = [[] for _ in self.tlas]
+        for game_points in (scores.league.game_points,
+                            scores.knockout.game_points):
+            for match_id in sorted(game_points.keys()):
+                for tla, points in game_points[match_id].items():
+                    samples[index[tla]].append(points)
+        pooled = tuple(points for team in samples for points in team) or (0,)
+        self._samples = [tuple(team) or pooled for team in samples]
+
+        self._league_points = [scores.league.teams[tla].league_points
+                               for tla in self.tlas]
+        self._game_points = [scores.league.teams[tla].game_points
+                             for tla in self.tlas]
+        self._ranking = list(range(len(self.tlas)))
+        self._positions = [positions[tla] for tla in self.tlas]
+
+        # The teams in each league game which hasn't been scored
+        self._league_games = []
+        for slot in schedule.matches[:schedule.n_league_matches]:
+            for arena in sorted(slot.keys()):
+                match = slot[arena]
+                if (arena, match.num) in scores.league.game_points:
+                    continue
+                teams = tuple(index[tla] for tla in match.teams
+                              if tla is not None)
+                if teams:
+                    self._league_games.append(teams)
+
+        # The teams in, and ranking of, each knockout match which has been
+        # scored, keyed by round and match number
+        self._played = {}
+        for round_num, matches in enumerate(schedule.knockout_rounds):
+            for match_num, match in enumerate(matches):
+                ranking = scores.knockout.resolved_positions.get(
+                    (match.arena, match.num))
+                if ranking is not None:
+                    ranking = tuple(index[tla] for tla in ranking)
+                    self._played[(round_num, match_num)] = \
+                        (frozenset(ranking), ranking)
+
+        # League points for each combination of game points seen in a game
+        self._ranked_points = {}
+
+    def _rank_game(self, points):
+        positions = ranker.calc_positions(dict(enumerate(points)))
+        ranked_points = ranker.calc_ranked_points(positions)
+        return tuple(ranked_points[i] for i in range(len(points)))
+
+    def _simulate_league(self, random):
+        """
+        Simulate the unscored league games.
+
+        :return: A tuple of the teams at the top of the league, in order,
+                 and a list of the league position of each team (or
+                 ``None`` for those not at the top).
+        """
+        samples = self._samples
+        league_points = self._league_points[:]
+        game_points = self._game_points[:]
+
+        for teams in self._league_games:
+            points = tuple([samples[team][int(random() * len(samples[team]))]
+                            for team in teams])
+            ranked_points = self._ranked_points.get(points)
+            if ranked_points is None:
+                ranked_points = self._ranked_points[points] = \
+                    self._rank_game(points)
+
+            for team, game, league in zip(teams, points, ranked_points):
+                game_points[team] += game
+                league_points[team] += league
+
+        # As for LeagueScores.rank_league
+        keys = list(zip(league_points, game_points, self.tlas))
+        ranking = heapq.nlargest(self._n_ranked, range(len(keys)),
+                                 key=keys.__getitem__)
+
+        positions = [None] * len(keys)
+        pos = 1
+        last_score = None
+        for i, team in enumerate(ranking, start=1):
+            score = league_points[team], game_points[team]
+            if score != last_score:
+                pos = i
+            positions[team] = pos
+            last_score = score
+
+        return ranking, positions
+
+    def _seed(self, ranking, positions):
+        """
+        Get the seeded teams and the order in which tied knockout matches
+        are resolved: by league position, then TLA (as for
+        :meth:`.KnockoutScores.calculate_ranking`).
+
+        :return: A tuple of the seeded teams and a list of each team's
+                 place in the tie resolution order.
+        """
+        can_seed = self._can_seed
+        tlas = self.tlas
+
+        seeds = [team for team in ranking if can_seed[team]]
+
+        tie_order = [None] * len(tlas)
+        by_position = sorted(ranking,
+                             key=lambda team: (positions[team], tlas[team]))
+        for i, team in enumerate(by_position):
+            tie_order[team] = i
+
+        return seeds, tie_order
+
+    def simulate(self, simulations, seed=None):
+        """
+        Run some simulations of the rest of the competition.
+
+        :param int simulations: The number of simulations to run.
+        :param seed: The seed for the random numbers, if any.
+        :return: A list, indexed like :attr:`tlas`, of lists of the number
+                 of simulations in which the team played in each round of
+                 the knockouts, followed by the number in which it won.
+        """
+        # Indexing by random() is quicker than choice()
+        random_ = random.Random(seed).random
+        samples = self._samples
+        n_rounds = len(self.bracket)
+
+        # Flatten the bracket into a list of the matches, each with its
+        # round, the seeds in it, the (flattened) match number and position
+        # of the teams which come from earlier matches, and its actual
+        # result (if any)
+        matches = []
+        offsets = []
+        for round_num, round_matches in enumerate(self.bracket):
+            offsets.append(len(matches))
+            for match_num, refs in enumerate(round_matches):
+                seed_refs = [ref for ref in refs if not isinstance(ref, tuple)]
+                parent_refs = [(offsets[ref[0]] + ref[1], ref[2])
+                               for ref in refs if isinstance(ref, tuple)]
+                matches.append((round_num, seed_refs, parent_refs,
+                                self._played.get((round_num, match_num))))
+
+        # The number of times each team plays in each round, then wins
+        round_counts = [[0] * len(self.tlas) for _ in range(n_rounds + 1)]
+
+        if not self._league_games:
+            seeds, tie_order = self._seed(self._ranking, self._positions)
+
+        for _ in range(simulations):
+            if self._league_games:
+                seeds, tie_order = self._seed(
+                    *self._simulate_league(random_))
+
+            results = []
+            for round_num, seed_refs, parent_refs, result in matches:
+                teams = [seeds[ref] for ref in seed_refs]
+                for match, pos in parent_refs:
+                    parent_ranking = results[match]
+                    if pos < len(parent_ranking):
+                        teams.append(parent_ranking[pos])
+
+                if result is not None and result[0] == frozenset(teams):
+                    match_ranking = result[1]
+                else:
+                    keyed = sorted([
+                        (-samples[team][int(random_() * len(samples[team]))],
+                         tie_order[team], team)
+                        for team in teams])
+                    match_ranking = [key[2] for key in keyed]
+
+                played = round_counts[round_num]
+                for team in teams:
+                    played[team] += 1
+                results.append(match_ranking)
+
+            if results and results[-1]:
+                round_counts[n_rounds][results[-1][0]] += 1
+
+        return [[round_counts[i][team] for i in range(n_rounds + 1)]
+                for team in range(len(self.tlas))]
+
+    def project(self, simulations, seed=None, processes=1):
+        """
+        Project the probability of each team reaching each round of the
+        knockouts and winning them.
+
+        :param int simulations: The number of simulations to run.
+        :param seed: The seed for the random numbers, if any. Projections
+                     with the same seed give the same result.
+        :param processes: The number of processes to run the simulations
+                          in, or ``None`` for one per CPU.
+        :return: A :class:`collections.OrderedDict` mapping TLAs, in league
+                 order, to lists of the probability of the team playing in
+                 each round of the knockouts, followed by the probability
+                 that it wins.
+        """
+        seeds = random.Random(seed)
+        chunks = []
+        for start in range(0, simulations, CHUNK_SIZE):
+            chunks.append((self, min(CHUNK_SIZE, simulations - start),
+                           seeds.getrandbits(64)))
+
+        if processes == 1 or len(chunks) < 2:
+            chunk_counts = [_simulate_chunk(chunk) for chunk in chunks]
+        else:
+            import multiprocessing
+
+            pool = multiprocessing.Pool(processes)
+            try:
+                chunk_counts = pool.map(_simulate_chunk, chunks)
+            finally:
+                pool.close()
+                pool.join()
+
+        projection = OrderedDict()
+        for team, tla in enumerate(self.tlas):
+            totals = [sum(counts[team][i] for counts in chunk_counts)
+                      for i in range(len(self.bracket) + 1)]
+            projection[tla] = [total / simulations if simulations else 0
+                               for total in totals]
+        return projection
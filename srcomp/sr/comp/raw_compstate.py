@@ -1,12 +1,272 @@
 """Utilities for working with raw Compstate repositories."""
 
+from collections import deque
 import os
 import subprocess
+import threading
 import yaml
 
 from sr.comp.comp import SRComp
 
 
+UPDATE_FILE = '.update-pls'
+"""The file whose modification tells API servers to reload the compstate."""
+
+MAX_HISTORY_WALK = 100
+"""
+The most commits :meth:`GitObjectReader.is_reachable` visits while walking
+back from each commit, before leaving the question to ``git merge-base``.
+"""
+
+DEFAULT_BATCH_WINDOW = 5
+"""How long, in seconds, score batches wait for further sheets by default."""
+
+
+class GitObjectReader(object):
+    """
+    Reads objects from a Git repository through a single, long-running
+    ``git cat-file --batch`` process, rather than a process per query.
+
+    The parents of the commits read are remembered (since commits never
+    change), so that questions about recent history of the repository can
+    be answered without any further processes.
+
+    :param str path: The path to the repository.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._process = None
+        self._lock = threading.Lock()
+        self._parents = {}
+
+    def _start(self):
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(['git', 'cat-file', '--batch'],
+                                             cwd=self._path,
+                                             stdin=subprocess.PIPE,
+                                             stdout=subprocess.PIPE)
+        return self._process
+
+    def read(self, name):
+        """
+        Read an object.
+
+        :param str name: The name of the object, in any form which
+                         ``git rev-parse`` understands.
+        :return: A tuple of the object's id, type and content, or ``None``
+                 if there's no such object.
+        """
+        if not name or '\n' in name:
+            return None
+
+        with self._lock:
+            process = self._start()
+            process.stdin.write(name.encode('utf-8') + b'\n')
+            process.stdin.flush()
+
+            header = process.stdout.readline().decode('utf-8').split()
+            if len(header) != 3:
+                # Missing or ambiguous
+                return None
+
+            sha, type_, size = header
+            content = process.stdout.read(int(size) + 1)[:-1]
+            return sha, type_, content
+
+    def resolve_commit(self, name):
+        """Get the id of the given commit, or ``None`` if it's unknown."""
+        obj = self.read(name + '^{commit}')
+        if obj is None:
+            return None
+
+        sha, _, content = obj
+        if sha not in self._parents:
+            self._parents[sha] = [line.split()[1].decode('ascii')
+                                  for line in content.split(b'\n\n')[0]
+                                                     .splitlines()
+                                  if line.startswith(b'parent ')]
+        return sha
+
+    def is_reachable(self, target, start):
+        """
+        Whether a commit is reachable from (that is, is an ancestor of or
+        the same as) another.
+
+        :param str target: The commit to look for.
+        :param str start: The commit to look back from.
+        """
+        target = self.resolve_commit(target)
+        start = self.resolve_commit(start)
+        if target is None or start is None:
+            return False
+
+        if target == start:
+            return True
+
+        # Walk back from both commits at once: finding the target behind the
+        # start means it's reachable, while finding the start behind the
+        # target means it isn't (as history has no cycles). This is quick
+        # when the commits are close together; otherwise git can search the
+        # whole history far more quickly than reading it a commit at a time.
+        forward = self._walk(start, target)
+        backward = self._walk(target, start)
+        for _ in range(MAX_HISTORY_WALK):
+            found = next(forward, None)
+            if found is None:
+                # Everything behind the start has been seen
+                return False
+            elif found:
+                return True
+
+            if next(backward, False):
+                return False
+
+        return self._merge_base_is_ancestor(target, start)
+
+    def _walk(self, start, target):
+        """
+        Walk back through the history from a commit, yielding whether each
+        commit visited is the target, and stopping once it's found.
+        """
+        seen = set([start])
+        queue = deque([start])
+        while queue:
+            sha = queue.popleft()
+            if sha == target:
+                yield True
+                return
+
+            if sha not in self._parents:
+                self.resolve_commit(sha)
+            yield False
+
+            for parent in self._parents.get(sha, ()):
+                if parent not in seen:
+                    seen.add(parent)
+                    queue.append(parent)
+
+    def _merge_base_is_ancestor(self, target, start):
+        command = ['git', 'merge-base', '--is-ancestor', target, start]
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.call(command, cwd=self._path,
+                                   stderr=devnull) == 0
+
+    def close(self):
+        """Stop the ``git cat-file`` process, if it's running."""
+        with self._lock:
+            process, self._process = self._process, None
+        if process is not None:
+            process.stdin.close()
+            process.wait()
+            process.stdout.close()
+
+
+class ScoreBatch(object):
+    """
+    Saves score sheets to a compstate, committing those saved within a short
+    window of each other together, so that a round of matches entered at
+    once makes a single commit, push and reload rather than one per sheet.
+
+    A batch is committed once ``window`` seconds have passed since its first
+    sheet was saved, or when :meth:`flush` is called (as it is on leaving
+    the batch as a context manager). If committing a batch in the
+    background fails, the error is raised by the next call to
+    :meth:`save_score` or :meth:`flush`. The batch's sheets are kept until
+    they've been committed and pushed, so calling :meth:`flush` again
+    retries whatever failed.
+
+    Instances are obtained from :meth:`RawCompstate.score_batch`.
+
+    :param compstate: The :class:`RawCompstate` to save to.
+    :param float window: How long to wait for further sheets, in seconds, or
+                         0 to commit each sheet as soon as it's saved.
+    """
+
+    def __init__(self, compstate, window=DEFAULT_BATCH_WINDOW):
+        self._compstate = compstate
+        self.window = window
+        self._pending = []
+        self._unpushed = False
+        self._timer = None
+        self._error = None
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
+
+    def _raise_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def save_score(self, match, score):
+        """Save and stage raw score data for the given match."""
+        with self._lock:
+            self._raise_error()
+
+            self._compstate.save_score(match, score)
+            self._compstate.stage(self._compstate.get_score_path(match))
+            if match not in self._pending:
+                self._pending.append(match)
+
+            if not self.window:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window,
+                                              self._flush_in_background)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_in_background(self):
+        with self._lock:
+            try:
+                self._commit()
+            except Exception as e:
+                self._error = e
+
+    def flush(self):
+        """Commit and push any sheets saved since the last batch."""
+        with self._lock:
+            self._commit()
+            self._raise_error()
+
+    def _commit(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        # Each step is only forgotten once it's done, so that flushing again
+        # after a failure retries whatever's left
+        if self._pending:
+            self._compstate.commit(batch_commit_message(self._pending))
+            self._pending = []
+            self._unpushed = True
+
+        if self._unpushed:
+            self._compstate.push_changes()
+            self._unpushed = False
+            self._compstate.touch_update_file()
+
+
+def _describe_match(match):
+    return "{0} match {1} in arena {2}".format(match.type.value.title(),
+                                               match.num, match.arena)
+
+
+def batch_commit_message(matches):
+    """Get the commit message for a batch of score sheets."""
+    if len(matches) == 1:
+        return "Update scores for {0}".format(_describe_match(matches[0]))
+
+    lines = ["Update scores for {0} matches".format(len(matches)), ""]
+    lines += ["- {0}".format(_describe_match(match)) for match in matches]
+    return "\n".join(lines)
+
+
 class RawCompstate(object):
     """
     Helper class to interact with a Compstate as raw files in a Git repository
@@ -20,6 +280,12 @@ class RawCompstate(object):
     def __init__(self, path, local_only):
         self._path = path
         self._local_only = local_only
+        self._objects = GitObjectReader(path)
+
+    @property
+    def path(self):
+        """The path to the Compstate repository."""
+        return self._path
 
     # Load and save related functionality
 
@@ -70,6 +336,20 @@ class RawCompstate(object):
         with open(path, "w") as fd:
             yaml.safe_dump(score, fd, default_flow_style=False)
 
+    def score_batch(self, window=DEFAULT_BATCH_WINDOW):
+        """
+        Get a :class:`ScoreBatch` for saving score sheets and committing
+        them together.
+
+        :param float window: How long to wait for further sheets before
+                             committing, in seconds.
+        """
+        return ScoreBatch(self, window)
+
+    def touch_update_file(self):
+        """Tell any API server for this compstate that it has changed."""
+        open(os.path.join(self._path, UPDATE_FILE), 'w').close()
+
     @property
     def deployments(self):
         deployments_name = 'deployments.yaml'
@@ -99,7 +379,8 @@ class RawCompstate(object):
 
     # Git repo related functionality
 
-    def git(self, command_pieces, err_msg=None, return_output=False):
+    def git(self, command_pieces, err_msg=None, return_output=False,
+            env=None):
         command = ['git'] + list(command_pieces)
 
         if return_output:
@@ -111,11 +392,11 @@ class RawCompstate(object):
             stderr = None
 
         try:
-            return func(command, cwd=self._path, stderr=stderr)
+            return func(command, cwd=self._path, stderr=stderr, env=env)
         except subprocess.CalledProcessError as e:
             if err_msg:
                 if e.output:
-                    err_msg += '\n\n' + e.output
+                    err_msg += '\n\n' + e.output.decode('utf-8')
 
                 raise RuntimeError(err_msg)
             else:
@@ -135,43 +416,78 @@ class RawCompstate(object):
         output = self.git(["status", "--porcelain"], return_output=True)
         return len(output) != 0
 
+    @property
+    def git_dir(self):
+        """The path to the repository's git directory."""
+        output = self.git(['rev-parse', '--git-dir'], return_output=True)
+        return os.path.join(self._path, output.strip())
+
+    def changed_files(self, since):
+        """
+        Get the files which have changed since the given revision, including
+        uncommitted and untracked changes.
+
+        :param str since: The revision to compare with.
+        :return: A list of paths relative to the compstate.
+        """
+        changed = self.git(['diff', '--name-only', '--no-renames', since,
+                            '--'], return_output=True).splitlines()
+        untracked = self.git(['ls-files', '--others', '--exclude-standard'],
+                             return_output=True).splitlines()
+        return changed + untracked
+
+    def show_file(self, revision, path):
+        """
+        Get the contents of a file at the given revision.
+
+        :param str revision: The revision.
+        :param str path: The path to the file, relative to the compstate.
+        """
+        return self.git(['show', '{0}:{1}'.format(revision, path)],
+                        return_output=True)
+
     def show_changes(self):
         self.git(['status'])
 
     def show_remotes(self):
         self.git(['remote', '-v'])
 
-    def push(self, where, revspec, err_msg=None, force=False):
+    def push(self, where, revspec, err_msg=None, force=False, env=None,
+             return_output=False):
+        """
+        Push to a remote.
+
+        :param dict env: The environment to run git in, such as to use
+                         particular SSH options, if not the current one.
+        :param bool return_output: Whether to capture and return the output
+                                   of the push (which is otherwise shown),
+                                   including in any error raised.
+        """
         args = ["push", where, revspec]
         if force:
             args.insert(1, '--force')
-        self.git(args, err_msg)
+        return self.git(args, err_msg, return_output=return_output, env=env)
+
+    # Queries about objects and history go through a single long-running
+    # git process, rather than starting one for each
 
     def rev_parse(self, revision):
-        output = self.git(["rev-parse", '--verify', revision], return_output=True,
-                          err_msg="Unknown revision '{0}'.".format(revision))
-        return output.strip()
+        obj = self._objects.read(revision)
+        if obj is None:
+            raise RuntimeError("Unknown revision '{0}'.".format(revision))
+        return obj[0]
 
     def has_commit(self, commit):
         """Whether or not the given commit is known to this repository."""
-        try:
-            self.rev_parse(commit + "^{commit}")
-            return True
-        except:
-            return False
+        return self._objects.resolve_commit(commit) is not None
 
     def _is_parent(self, parent, child):
-        try:
-            revspec = "{0}..{1}".format(parent, child)
-            revs = self.git(['rev-list', '-n1', revspec, '--'],
-                            return_output=True)
-            # rev-list prints the revisions which are parents of 'child',
-            # up to and including 'parent'; any output therefore tells us
-            # that they're related
-            return len(revs.strip()) != 0
-        except:
-            # One or both revisions are unknown
+        # As for whether 'git rev-list parent..child' lists anything: that
+        # is, whether 'child' has commits which 'parent' doesn't. Unknown
+        # revisions are never related.
+        if not self.has_commit(parent) or not self.has_commit(child):
             return False
+        return not self._objects.is_reachable(child, parent)
 
     def has_ancestor(self, commit):
         return self._is_parent(commit, 'HEAD')
@@ -179,8 +495,18 @@ class RawCompstate(object):
     def has_descendant(self, commit):
         return self._is_parent('HEAD', commit)
 
+    def _refs_changed(self):
+        # The reader would otherwise be left with a stale view of the
+        # repository; the next query starts a fresh one
+        self._objects.close()
+
+    def close(self):
+        """Stop any long-running git processes."""
+        self._objects.close()
+
     def reset_hard(self):
         self.git(["reset", "--hard", "HEAD"], err_msg="Git reset failed.")
+        self._refs_changed()
 
     def reset_and_fast_forward(self):
         self.reset_hard()
@@ -193,6 +519,7 @@ class RawCompstate(object):
 
         self.git(["pull", "--ff-only", "origin", "master"],
                  err_msg="Git pull failed, deal with the merge manually.")
+        self._refs_changed()
 
     def stage(self, file_path):
         """
@@ -206,21 +533,27 @@ class RawCompstate(object):
 
     def fetch(self, where='origin', quiet=False):
         self.git(['fetch', where], return_output=quiet)
+        self._refs_changed()
 
     def checkout(self, what):
         self.git(['checkout', what])
+        self._refs_changed()
 
     def commit(self, commit_msg, allow_empty=False):
         args = ["commit", "-m", commit_msg]
         if allow_empty:
             args += ['--allow-empty']
         self.git(args, return_output=True, err_msg="Git commit failed.")
+        self._refs_changed()
 
-    def commit_and_push(self, commit_msg, allow_empty=False):
-        self.commit(commit_msg, allow_empty)
-
+    def push_changes(self):
+        """Push to origin's master, unless the compstate is local only."""
         if self._local_only:
             return
 
         self.push("origin", "master",
                   err_msg="Git push failed, deal with the merge manually.")
+
+    def commit_and_push(self, commit_msg, allow_empty=False):
+        self.commit(commit_msg, allow_empty)
+        self.push_changes()
@@ -0,0 +1,241 @@
+"""A columnar store of the scores of each team in each match."""
+
+from __future__ import division
+
+from array import array
+from collections import OrderedDict, namedtuple
+import csv
+
+
+COLUMNS = ('type', 'arena', 'num', 'team', 'game_points', 'league_points',
+           'position', 'disqualified')
+"""The names of the columns of a :class:`ScoreTable`, in order."""
+
+INDEXED_COLUMNS = ('type', 'arena', 'num', 'team')
+"""The columns of a :class:`ScoreTable` which have an index."""
+
+ScoreRow = namedtuple('ScoreRow', COLUMNS)
+"""The score of one team in one match."""
+
+
+def mean(values):
+    """The arithmetic mean of the given values, for use as an aggregate."""
+    values = list(values)
+    return sum(values) / len(values)
+
+
+class ScoreTable(object):
+    """
+    A columnar store of the scores of each team in each match.
+
+    Each row is the result of one team in one match: the type of the match
+    (a :class:`sr.comp.match_period.MatchType`), the arena and number of the
+    match, the team's TLA, the game and league (aka normalised) points the
+    team earned, the team's position in the match based on its game points
+    (allowing for ties) and whether the team was disqualified (or absent).
+
+    Rows are held in match order (then arena order, then corner order) and
+    indexes are kept of the rows with each value of the
+    :data:`INDEXED_COLUMNS`, so that the results of a team (say) can be
+    found without scanning every match.
+
+    :param columns: A mapping of the names of the :data:`COLUMNS` to lists
+                    of the values of each row in that column.
+    """
+
+    def __init__(self, columns):
+        lengths = set(len(columns[name]) for name in COLUMNS)
+        if len(lengths) > 1:
+            raise ValueError("Columns must all be the same length.")
+
+        self._columns = OrderedDict((name, list(columns[name]))
+                                    for name in COLUMNS)
+
+        # Row numbers are held in arrays, rather than lists, to save an
+        # object per row in each index
+        self._indexes = {}
+        for name in INDEXED_COLUMNS:
+            index = self._indexes[name] = {}
+            for row, value in enumerate(self._columns[name]):
+                rows = index.get(value)
+                if rows is None:
+                    rows = index[value] = array('l')
+                rows.append(row)
+
+    @classmethod
+    def from_scores(cls, scores, match_type):
+        """
+        Build a table of the scores held by a
+        :class:`sr.comp.scores.BaseScores`.
+
+        :param scores: The scores.
+        :param match_type: The type of the matches the scores are for.
+        """
+        columns = OrderedDict((name, []) for name in COLUMNS)
+
+        def match_order(match_id):
+            arena, num = match_id
+            return num, arena
+
+        for match_id in sorted(scores.game_points.keys(), key=match_order):
+            arena, num = match_id
+            game_points = scores.game_points[match_id]
+            league_points = scores.ranked_points[match_id]
+            disqualified = scores.disqualified[match_id]
+
+            positions = {}
+            for pos, tlas in scores.game_positions[match_id].items():
+                for tla in tlas:
+                    positions[tla] = pos
+
+            for tla, points in game_points.items():
+                columns['type'].append(match_type)
+                columns['arena'].append(arena)
+                columns['num'].append(num)
+                columns['team'].append(tla)
+                columns['game_points'].append(points)
+                columns['league_points'].append(league_points.get(tla))
+                columns['position'].append(positions.get(tla))
+                columns['disqualified'].append(tla in disqualified)
+
+        return cls(columns)
+
+    @classmethod
+    def concat(cls, tables):
+        """Combine the rows of several tables, in order, into one table."""
+        columns = OrderedDict((name, []) for name in COLUMNS)
+        for table in tables:
+            for name in COLUMNS:
+                columns[name] += table._columns[name]
+        return cls(columns)
+
+    def __len__(self):
+        return len(self._columns['team'])
+
+    def __iter__(self):
+        return (ScoreRow(*values) for values in zip(*self._columns.values()))
+
+    def __getstate__(self):
+        # The indexes are quick to rebuild, so aren't worth pickling
+        return self._columns
+
+    def __setstate__(self, columns):
+        self.__init__(columns)
+
+    def column(self, name):
+        """Get all the values in the column with the given name, as a tuple."""
+        return tuple(self._get_column(name))
+
+    def row(self, index):
+        """Get the row at the given index, as a :class:`ScoreRow`."""
+        return ScoreRow(*(values[index] for values in self._columns.values()))
+
+    def _get_column(self, name):
+        try:
+            return self._columns[name]
+        except KeyError:
+            raise ValueError("Unknown column '{0}'.".format(name))
+
+    def _find(self, filters):
+        """Get the indices of the rows which match all the given filters."""
+        for name in filters:
+            self._get_column(name)
+
+        indexed = [self._indexes[name].get(value, [])
+                   for name, value in filters.items()
+                   if name in self._indexes]
+        if indexed:
+            # Start from the smallest matching index and check the rest of
+            # the filters against its rows
+            indexed.sort(key=len)
+            rows = indexed[0]
+        else:
+            rows = range(len(self))
+
+        checks = [(self._columns[name], value)
+                  for name, value in filters.items()]
+        if len(checks) > 1 or not indexed:
+            rows = [row for row in rows
+                    if all(values[row] == value for values, value in checks)]
+
+        return rows
+
+    def select(self, **filters):
+        """
+        Get the rows whose values match those given for each column, for
+        example ``table.select(team='ABC', arena='A')``.
+
+        :return: A :class:`list` of :class:`ScoreRow` s, in table order.
+        """
+        return [self.row(row) for row in self._find(filters)]
+
+    def values(self, column, **filters):
+        """
+        Get the values of a column for the rows which match the given
+        filters (as for :meth:`select`).
+
+        :return: A :class:`list` of the values, in table order.
+        """
+        values = self._get_column(column)
+        return [values[row] for row in self._find(filters)]
+
+    def aggregate(self, column, by, function=sum, **filters):
+        """
+        Aggregate the values of a column, grouped by the values of another,
+        for the rows which match the given filters (as for :meth:`select`).
+        For example, the average game points in each arena are given by
+        ``table.aggregate('game_points', by='arena', function=mean)``.
+
+        :param str column: The column to aggregate.
+        :param by: The name of the column to group by, or a tuple of names
+                   to group by several columns (whose keys are then tuples).
+        :param function: A callable which is given a :class:`list` of the
+                         values in a group and returns their aggregate.
+        :return: A :class:`collections.OrderedDict` mapping the value(s) of
+                 the grouping column(s) to the aggregate, in order of the
+                 first row in each group.
+        """
+        values = self._get_column(column)
+        if isinstance(by, tuple):
+            keys = list(zip(*(self._get_column(name) for name in by)))
+        else:
+            keys = self._get_column(by)
+
+        groups = OrderedDict()
+        for row in self._find(filters):
+            groups.setdefault(keys[row], []).append(values[row])
+
+        return OrderedDict((key, function(group))
+                           for key, group in groups.items())
+
+    def to_columns(self):
+        """
+        Get the table as a mapping of column names to lists of their values,
+        with the match types given by their values. This is the form taken
+        by Arrow-style columnar tools (such as ``pyarrow.table`` and
+        ``pandas.DataFrame``) and is suitable for JSON output.
+
+        :return: A :class:`collections.OrderedDict`.
+        """
+        columns = OrderedDict((name, list(values))
+                              for name, values in self._columns.items())
+        columns['type'] = [match_type.value for match_type in columns['type']]
+        return columns
+
+    def write_csv(self, stream):
+        """Write the table as CSV, with a header row, to a text stream."""
+        writer = csv.writer(stream)
+        writer.writerow(COLUMNS)
+        writer.writerows(zip(*self.to_columns().values()))
+
+    def write_arrow(self, path):
+        """
+        Write the table to a file in the Arrow IPC (Feather) format.
+
+        This requires ``pyarrow``, which is not otherwise a dependency; an
+        :class:`ImportError` is raised if it is not installed.
+        """
+        import pyarrow
+        import pyarrow.feather
+
+        pyarrow.feather.write_feather(pyarrow.table(self.to_columns()), path)
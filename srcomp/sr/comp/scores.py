@@ -1,11 +1,26 @@
 """Utilities for working with scores."""
 
 from collections import OrderedDict
+import copy
 from functools import total_ordering
 import glob
 import os
 
+try:
+    from collections.abc import Mapping
+except ImportError:
+    # Python 2
+    from collections import Mapping
+
 from sr.comp import ranker, yaml_loader
+from sr.comp.match_period import MatchType
+from sr.comp.score_table import ScoreTable
+from sr.comp.teams import intern_tla
+from sr.comp.timing import PhaseTimer
+
+
+NO_TEAMS = frozenset()
+"""An empty set of TLAs, shared between the matches with no such teams."""
 
 
 class InvalidTeam(Exception):
@@ -38,6 +53,8 @@ class TeamScore(object):
     :param int game: The game points.
     """
 
+    __slots__ = ('league_points', 'game_points')
+
     def __init__(self, league=0, game=0):
         self.league_points = league
         self.game_points = game
@@ -66,6 +83,54 @@ class TeamScore(object):
                                             self.game_points)
 
 
+class TeamMapping(Mapping):
+    """
+    A compact, immutable mapping of the TLAs of the teams in a match to a
+    value for each, such as their points.
+
+    The TLAs and values are held in parallel tuples, in a fixed order (such
+    as that of the corners the teams were in), rather than in a
+    :class:`dict`. The tuple of TLAs can be shared between the mappings for
+    the same match. Lookups are by linear search, which is quick for the few
+    teams in a match.
+
+    :param tuple tlas: The TLAs of the teams.
+    :param tuple values: The value for each team, in the same order.
+    """
+
+    __slots__ = ('tlas', '_values')
+
+    def __init__(self, tlas, values):
+        self.tlas = tlas
+        self._values = tuple(values)
+
+    @classmethod
+    def from_dict(cls, tlas, data):
+        """
+        Build a mapping holding the items of a :class:`dict`, in the order of
+        the given TLAs. TLAs not in the :class:`dict` are left out.
+        """
+        if len(tlas) != len(data):
+            tlas = tuple(tla for tla in tlas if tla in data)
+        return cls(tlas, (data[tla] for tla in tlas))
+
+    def __getitem__(self, tla):
+        try:
+            index = self.tlas.index(tla)
+        except ValueError:
+            raise KeyError(tla)
+        return self._values[index]
+
+    def __iter__(self):
+        return iter(self.tlas)
+
+    def __len__(self):
+        return len(self.tlas)
+
+    def __repr__(self):
+        return "TeamMapping({0!r})".format(dict(self.items()))
+
+
 def results_finder(root):
     """An iterator that finds score sheet files."""
 
@@ -101,6 +166,24 @@ def get_validated_scores(scorer_cls, input_data):
     return scores
 
 
+def get_disqualified(teams_data):
+    """
+    Get the TLAs of the teams in a score sheet which were disqualified from
+    the match, or weren't present in it.
+
+    :param dict teams_data: The ``teams`` section of the score sheet.
+    """
+
+    dsq = []
+    for tla, scoreinfo in teams_data.items():
+        # disqualifications and non-presence are effectively the same
+        # in terms of league points awarding.
+        if (scoreinfo.get("disqualified", False) or
+           not scoreinfo.get("present", True)):
+            dsq.append(tla)
+    return dsq
+
+
 def degroup(grouped_positions):
     """
     Given a mapping of positions to collections ot teams at that position,
@@ -130,21 +213,25 @@ class BaseScores(object):
     :param dict scorer: The scorer logic.
     """
 
+    match_type = None
+    """The :class:`.MatchType` of the matches these scores are for."""
+
     def __init__(self, resultdir, teams, scorer):
         self._scorer = scorer
 
         self.game_points = {}
         """
         Game points data for each match. Keys are tuples of the form
-        ``(arena_id, match_num)``, values are :class:`dict` s mapping
-        TLAs to the number of game points they scored.
+        ``(arena_id, match_num)``, values are :class:`.TeamMapping` s
+        mapping TLAs (in corner order) to the number of game points they
+        scored.
         """
 
         self.game_positions = {}
         """
         Game position data for each match. Keys are tuples of the form
         ``(arena_id, match_num)``, values are :class:`dict` s mapping
-        ranked positions (i.e: first is `1`, etc.) to an iterable of TLAs
+        ranked positions (i.e: first is `1`, etc.) to a sorted tuple of TLAs
         which have that position. Based solely on teams' game points.
         """
 
@@ -152,8 +239,15 @@ class BaseScores(object):
         """
         Normalised (aka 'league') points earned in each match. Keys are
         tuples of the form ``(arena_id, match_num)``, values are
-        :class:`dict` s mapping TLAs to the number of normalised points
-        they would earn for that match.
+        :class:`.TeamMapping` s mapping TLAs (in corner order) to the number
+        of normalised points they would earn for that match.
+        """
+
+        self.disqualified = {}
+        """
+        The teams disqualified from each match, or which weren't present in
+        it. Keys are tuples of the form ``(arena_id, match_num)``, values are
+        :class:`frozenset` s of TLAs.
         """
 
         self.teams = {}
@@ -170,36 +264,112 @@ class BaseScores(object):
         for resfile in results_finder(resultdir):
             self._load_resfile(resfile)
 
-        # Sum the game for each team
-        for match in self.game_points.values():
-            for tla, score in match.items():
-                if tla not in self.teams:
-                    raise InvalidTeam(tla)
-                self.teams[tla].game_points += score
+        # Sum the points for each team
+        for match_id in self.game_points:
+            self._add_match_points(match_id)
+
+        self._table = None
+
+    @property
+    def table(self):
+        """
+        A :class:`.ScoreTable` of the score of each team in each match, for
+        queries by team, arena and so on, built on first use.
+        """
+        if self._table is None:
+            self._table = ScoreTable.from_scores(self, self.match_type)
+        return self._table
+
+    def __getstate__(self):
+        # The scorer is only needed while loading the scores and, since it
+        # is loaded from the compstate, may not be importable elsewhere.
+        state = self.__dict__.copy()
+        del state['_scorer']
+        return state
+
+    def _add_match_points(self, match_id, sign=1):
+        """Add (or, with a ``sign`` of -1, remove) a match's team points."""
+        for tla, score in self.game_points[match_id].items():
+            if tla not in self.teams:
+                raise InvalidTeam(tla)
+            self.teams[tla].game_points += sign * score
 
     def _load_resfile(self, fname):
-        y = yaml_loader.load(fname)
+        self._add_score_sheet(yaml_loader.load(fname))
 
+    def _add_score_sheet(self, y):
         match_id = (y["arena_id"], y["match_number"])
         if match_id in self.game_points:
             raise DuplicateScoresheet(match_id)
 
         game_points = get_validated_scores(self._scorer, y)
-        self.game_points[match_id] = game_points
-
-        # Build the disqualification dict
-        dsq = []
-        for tla, scoreinfo in y["teams"].items():
-            # disqualifications and non-presence are effectively the same
-            # in terms of league points awarding.
-            if (scoreinfo.get("disqualified", False) or
-               not scoreinfo.get("present", True)):
-                dsq.append(tla)
 
+        dsq = get_disqualified(y["teams"])
         positions = ranker.calc_positions(game_points, dsq)
-        self.game_positions[match_id] = positions
-        self.ranked_points[match_id] = ranker.calc_ranked_points(positions,
-                                                                 dsq)
+        ranked_points = ranker.calc_ranked_points(positions, dsq)
+
+        # Store compactly, sharing the TLAs in corner order between the
+        # game and ranked points of the match
+        def corner_key(tla):
+            return y["teams"].get(tla, {}).get("zone", 0), tla
+
+        tlas = set(game_points.keys()) | set(ranked_points.keys())
+        tlas = tuple(intern_tla(tla) for tla in sorted(tlas, key=corner_key))
+
+        self.game_points[match_id] = TeamMapping.from_dict(tlas, game_points)
+        self.game_positions[match_id] = {
+            pos: tuple(sorted(intern_tla(tla) for tla in teams))
+            for pos, teams in positions.items()
+        }
+        self.ranked_points[match_id] = TeamMapping.from_dict(tlas,
+                                                             ranked_points)
+        self.disqualified[match_id] = \
+            frozenset(intern_tla(tla) for tla in dsq) if dsq else NO_TEAMS
+
+    def with_score_sheets(self, sheets, scorer):
+        """
+        Get a copy of these scores with some more score sheets, which replace
+        any existing scores for the same matches. Only the parts of the
+        scores which depend on the given sheets are recomputed and nothing
+        is read from disk, so this is quick enough to try out hypothetical
+        scores.
+
+        :param list sheets: The score sheets, each as it would be loaded
+                            from a score sheet file.
+        :param scorer: The scorer logic.
+        """
+        scores = copy.copy(self)
+        scores._scorer = scorer
+        scores._table = None
+
+        scores.game_points = dict(self.game_points)
+        scores.game_positions = dict(self.game_positions)
+        scores.ranked_points = dict(self.ranked_points)
+        scores.disqualified = dict(self.disqualified)
+
+        # Only the points of the teams in the matches being scored change,
+        # so the rest are shared with these scores
+        scores.teams = dict(self.teams)
+        affected = set()
+        for y in sheets:
+            match_id = (y["arena_id"], y["match_number"])
+            affected.update(y["teams"])
+            affected.update(self.game_points.get(match_id, ()))
+        for tla in affected:
+            team_score = scores.teams.get(tla)
+            if team_score is not None:
+                scores.teams[tla] = TeamScore(team_score.league_points,
+                                              team_score.game_points)
+
+        for y in sheets:
+            match_id = (y["arena_id"], y["match_number"])
+            if match_id in scores.game_points:
+                scores._add_match_points(match_id, sign=-1)
+                del scores.game_points[match_id]
+            scores._add_score_sheet(y)
+            scores._add_match_points(match_id)
+
+        return scores
 
     @property
     def last_scored_match(self):
@@ -213,6 +383,8 @@ class BaseScores(object):
 class LeagueScores(BaseScores):
     """A class which holds league scores."""
 
+    match_type = MatchType.league
+
     @staticmethod
     def rank_league(team_scores):
         """
@@ -231,7 +403,7 @@ class LeagueScores(BaseScores):
         # a list of teams to seed with, various awards (and humans) want
         # a result which allows for ties.
         ranking = sorted(team_scores.items(),
-                         key=lambda x: (x[1], x[0]),
+                         key=lambda x: (x[1]._ordering_key, x[0]),
                          reverse=True)
         positions = OrderedDict()
         pos = 1
@@ -246,22 +418,34 @@ class LeagueScores(BaseScores):
     def __init__(self, resultdir, teams, scorer):
         super(LeagueScores, self).__init__(resultdir, teams, scorer)
 
-        # Sum the league scores for each team
-        for match in self.ranked_points.values():
-            for tla, score in match.items():
-                if tla not in self.teams:
-                    raise InvalidTeam(tla)
-                self.teams[tla].league_points += score
-
         self.positions = self.rank_league(self.teams)
         """
         An :class:`.OrderedDict` of TLAs to :class:`.TeamScore` instances.
         """
 
+    def _add_match_points(self, match_id, sign=1):
+        super(LeagueScores, self)._add_match_points(match_id, sign)
+
+        # Sum the league scores for each team
+        for tla, score in self.ranked_points[match_id].items():
+            if tla not in self.teams:
+                raise InvalidTeam(tla)
+            self.teams[tla].league_points += sign * score
+
+    def with_score_sheets(self, sheets, scorer):
+        scores = super(LeagueScores, self).with_score_sheets(sheets, scorer)
+        # Starting from the current ranking, which is mostly still in order,
+        # makes sorting the teams quicker
+        scores.positions = scores.rank_league(OrderedDict(
+            (tla, scores.teams[tla]) for tla in self.positions))
+        return scores
+
 
 class KnockoutScores(BaseScores):
     """A class which holds knockout scores."""
 
+    match_type = MatchType.knockout
+
     @staticmethod
     def calculate_ranking(match_points, league_positions):
         """
@@ -295,55 +479,141 @@ class KnockoutScores(BaseScores):
         """
         Position data for each match which includes adjustment for ties.
         Keys are tuples of the form ``(arena_id, match_num)``, values are
-        :class:`.OrderedDict` s mapping TLAs to the ranked position (i.e:
+        :class:`.TeamMapping` s mapping TLAs to the ranked position (i.e:
         first is `1`, etc.) of that team, with the winning team in the
         start of the list of keys. Tie resolution is done by league position.
         """
 
+        self._resolve_positions(league_positions)
+
+    def _resolve_positions(self, league_positions):
         # Calculate resolve positions for each scored match
         for match_id, match_points in self.ranked_points.items():
             positions = self.calculate_ranking(match_points, league_positions)
-            self.resolved_positions[match_id] = positions
+            self.resolved_positions[match_id] = TeamMapping(
+                tuple(positions.keys()), positions.values())
+
+    def with_score_sheets(self, sheets, scorer, league_positions):
+        """
+        Get a copy of these scores with some more score sheets, as for
+        :meth:`BaseScores.with_score_sheets`.
+
+        :param list sheets: The score sheets.
+        :param scorer: The scorer logic.
+        :param league_positions: A map of TLAs to league positions, which
+                                 ties are resolved by. There are few
+                                 knockout matches, so all of them are
+                                 resolved again in case these have changed.
+        """
+        scores = super(KnockoutScores, self).with_score_sheets(sheets, scorer)
+        scores.resolved_positions = {}
+        scores._resolve_positions(league_positions)
+        return scores
 
 
 class TiebreakerScores(BaseScores):
-    pass
+    """A class which holds tiebreaker scores."""
+
+    match_type = MatchType.tiebreaker
 
 
 class Scores(object):
     """
     A simple class which stores references to the league and knockout scores.
+
+    :param str root: The root path of the ``compstate`` repo.
+    :param teams: The TLAs of the teams in the competition.
+    :param scorer: The scorer class of the competition.
+    :param `sr.comp.timing.PhaseTimer` timer: Records how long loading each
+                                              category of scores takes, if
+                                              given.
     """
 
-    def __init__(self, root, teams, scorer):
+    def __init__(self, root, teams, scorer, timer=None):
         self.root = root
-
-        self.league = LeagueScores(os.path.join(root, "league"),
-                                   teams, scorer)
+        self._table = None
+
+        if timer is None:
+            timer = PhaseTimer()
+
+        with timer.phase('scores.league'):
+            self.league = LeagueScores(os.path.join(root, "league"),
+                                       teams, scorer)
+            """
+            The :class:`LeagueScores` for the competition.
+            """
+
+        with timer.phase('scores.knockout'):
+            self.knockout = KnockoutScores(os.path.join(root, "knockout"),
+                                           teams, scorer,
+                                           self.league.positions)
+            """
+            The :class:`KnockoutScores` for the competition.
+            """
+
+        with timer.phase('scores.tiebreaker'):
+            self.tiebreaker = TiebreakerScores(os.path.join(root,
+                                                            "tiebreaker"),
+                                               teams, scorer)
+            """
+            The :class:`TiebreakerScores` for the competition.
+            """
+
+        self.last_scored_match = self._get_last_scored_match()
         """
-        The :class:`LeagueScores` for the competition.
-        """
-
-
-        self.knockout = KnockoutScores(os.path.join(root, "knockout"),
-                                       teams, scorer, self.league.positions)
-        """
-        The :class:`KnockoutScores` for the competition.
-        """
-
-        self.tiebreaker = TiebreakerScores(os.path.join(root, "tiebreaker"),
-                                           teams, scorer)
-        """
-        The :class:`TiebreakerScores` for the competition.
+        The most match with the highest id for which we have score data.
         """
 
+    def _get_last_scored_match(self):
         lsm = None
         for scores in (self.tiebreaker, self.knockout, self.league):
             lsm = scores.last_scored_match
             if lsm is not None:
                 break
+        return lsm
 
-        self.last_scored_match = lsm
+    def with_score_sheets(self, sheets, scorer):
         """
-        The most match with the highest id for which we have score data.
+        Get a copy of these scores with some more score sheets, which replace
+        any existing scores for the same matches. Only the categories of
+        scores the sheets are for are rebuilt (along with the knockout
+        scores if the league changes, since ties in the knockouts are
+        resolved by league position) and nothing is read from disk.
+
+        :param dict sheets: A mapping of :class:`.MatchType` s to lists of
+                            score sheets for matches of that type, each as it
+                            would be loaded from a score sheet file.
+        :param scorer: The scorer logic.
+        """
+        scores = copy.copy(self)
+        scores._table = None
+
+        league_sheets = sheets.get(MatchType.league)
+        if league_sheets:
+            scores.league = self.league.with_score_sheets(league_sheets,
+                                                          scorer)
+
+        knockout_sheets = sheets.get(MatchType.knockout)
+        if league_sheets or knockout_sheets:
+            scores.knockout = self.knockout.with_score_sheets(
+                knockout_sheets or [], scorer, scores.league.positions)
+
+        tiebreaker_sheets = sheets.get(MatchType.tiebreaker)
+        if tiebreaker_sheets:
+            scores.tiebreaker = self.tiebreaker.with_score_sheets(
+                tiebreaker_sheets, scorer)
+
+        scores.last_scored_match = scores._get_last_scored_match()
+        return scores
+
+    @property
+    def table(self):
+        """
+        A :class:`.ScoreTable` of the score of each team in each match of
+        every type, built on first use.
         """
+        if self._table is None:
+            self._table = ScoreTable.concat([self.league.table,
+                                             self.knockout.table,
+                                             self.tiebreaker.table])
+        return self._table
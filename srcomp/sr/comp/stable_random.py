@@ -39,8 +39,9 @@ class Random(object):
         for n in (20, 25, 30, 31):
             nb ^= (self.state >> n) & 1
 
-        self.state <<= 1
-        self.state |= nb
+        # Only the low 32 bits of the state are ever read, so discard the
+        # rest rather than letting it grow with every bit generated
+        self.state = ((self.state << 1) | nb) & 0xffffffff
 
         return bit
 
@@ -16,9 +16,13 @@ class StaticScheduler(KnockoutScheduler):
     :param areans: The arenas.
     :param teams: The teams.
     :param config: Extra configuration for the static knockout.
+    :param previous: The scheduler of a previous state of the competition.
+                     This is accepted for compatibility but not used, since
+                     static knockouts are quick to schedule.
     """
 
-    def __init__(self, schedule, scores, arenas, teams, config):
+    def __init__(self, schedule, scores, arenas, teams, config,
+                 previous=None):
         super(StaticScheduler, self).__init__(schedule, scores, arenas, teams,
                                               config)
 
@@ -45,6 +49,34 @@ class StaticScheduler(KnockoutScheduler):
         ranking = self.get_ranking(match)
         return ranking[pos]
 
+    def get_seeded_teams(self, ranking):
+        """
+        Get the teams which take part in the knockouts, in seeded order.
+        Seeds are taken straight from the league, including any teams which
+        have dropped out.
+
+        :param list ranking: The TLAs of all the teams, in league order.
+        """
+        return list(ranking)
+
+    def get_bracket(self):
+        """
+        Describe where the teams in each knockout match come from, as
+        configured. See :meth:`.KnockoutScheduler.get_bracket`.
+        """
+        knockout_conf = self.config["static_knockout"]
+
+        def parse_ref(team_ref):
+            if team_ref.startswith('S'):
+                return int(team_ref[1:]) - 1  # seed numbers are 1 based
+            round_num, match_num, pos = [int(x) for x in team_ref]
+            return round_num, match_num, pos
+
+        return [[[parse_ref(team_ref)
+                  for team_ref in knockout_conf[round_num][match_num]['teams']]
+                 for match_num in sorted(knockout_conf[round_num].keys())]
+                for round_num in sorted(knockout_conf.keys())]
+
     def _add_match(self, match_info, rounds_remaining, round_num):
         new_matches = {}
 
@@ -1,10 +1,22 @@
 """Team metadata library."""
 
 from collections import namedtuple
+import sys
 
 from sr.comp import yaml_loader
 
 
+def intern_tla(tla):
+    """
+    Intern a TLA, so that all the references to a team (in the schedule and
+    in each of its scores) share a single string.
+    """
+    if sys.version_info[0] < 3:
+        # Only byte strings can be interned
+        return intern(tla) if isinstance(tla, str) else tla
+    return sys.intern(tla)
+
+
 _Team = namedtuple('Team', ['tla', 'name', 'rookie',
                             'dropped_out_after'])
 class Team(_Team):
@@ -34,7 +46,7 @@ def load_teams(filename):
 
     teams = {}
     for tla, info in data['teams'].items():
-        tla = tla.upper()
+        tla = intern_tla(tla.upper())
         teams[tla] = Team(tla=tla, name=info['name'],
                           rookie=info.get('rookie', False),
                           dropped_out_after=info.get('dropped_out_after'))
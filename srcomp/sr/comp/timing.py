@@ -0,0 +1,50 @@
+"""Timing of the phases of loading a competition."""
+
+from collections import OrderedDict
+import contextlib
+from timeit import default_timer
+
+
+@contextlib.contextmanager
+def _run_hooks(hooks, name):
+    if not hooks:
+        yield
+        return
+
+    with hooks[0](name):
+        with _run_hooks(hooks[1:], name):
+            yield
+
+
+class PhaseTimer(object):
+    """
+    Records how long, in seconds, each of a sequence of named phases takes.
+
+    :param hooks: Callables which are called with the name of each phase as
+                  it starts and which return a context manager to run the
+                  phase within. These allow other measurements of the phases
+                  (such as their memory usage) to be made. The hooks are
+                  entered in order before the phase's timing starts and
+                  exited in reverse order after it ends.
+    """
+
+    def __init__(self, hooks=()):
+        self.hooks = tuple(hooks)
+
+        self.durations = OrderedDict()
+        """A :class:`collections.OrderedDict` mapping phase names to their
+        durations, in the order the phases were run."""
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        A context manager which times the phase with the given name.
+
+        The duration is recorded even if the phase raises an exception.
+        """
+        with _run_hooks(self.hooks, name):
+            start = default_timer()
+            try:
+                yield
+            finally:
+                self.durations[name] = default_timer() - start
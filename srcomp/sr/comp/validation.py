@@ -2,7 +2,8 @@
 
 from __future__ import print_function
 
-from collections import defaultdict
+from collections import defaultdict, namedtuple, OrderedDict
+from enum import Enum, unique
 import sys
 
 from sr.comp.knockout_scheduler import UNKNOWABLE_TEAM
@@ -12,76 +13,261 @@ from sr.comp.match_period import MatchType
 NO_TEAM = None
 META_TEAMS = set([NO_TEAM, UNKNOWABLE_TEAM])
 
+ARENA_ERROR = "Match {game.num} ({game.type}) references arena '{arena}'."
 
-def report_errors(type_, id_, errors):
+
+@unique
+class Severity(Enum):
+    """How serious a problem found in a compstate is."""
+
+    error = 'error'
+    """The compstate is wrong and should not be deployed."""
+
+    warning = 'warning'
+    """The compstate may be wrong, or be missing something."""
+
+
+class Finding(namedtuple('Finding', ['severity', 'type', 'id', 'message'])):
+    """
+    A problem found in a compstate.
+
+    The ``type`` and ``id`` together locate the problem, for example
+    ``('Match', 12)`` or ``('Game Score', ('A', 3))``.
+    """
+
+    __slots__ = ()
+
+    def as_dict(self):
+        """Get this finding as a dict, suitable for encoding as JSON."""
+        id_ = list(self.id) if isinstance(self.id, tuple) else self.id
+        return {'severity': self.severity.value, 'type': self.type,
+                'id': id_, 'message': self.message}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Get a finding back from the result of :meth:`as_dict`."""
+        id_ = data['id']
+        if isinstance(id_, list):
+            id_ = tuple(id_)
+        return cls(Severity(data['severity']), data['type'], id_,
+                   data['message'])
+
+
+def report_errors(type_, id_, errors, kind='errors'):
     """
     Print out errors nicely formatted.
 
     :param str type: The human-readable 'type'.
     :param str id_: The human-readable 'ID'.
     :param list errors: A list of string errors.
+    :param str kind: What the errors are called.
     """
 
     if len(errors) == 0:
         return
 
-    print("{0} {1} has the following errors:".format(type_, id_),
+    print("{0} {1} has the following {2}:".format(type_, id_, kind),
           file=sys.stderr)
     for error in errors:
         print("    {0}".format(error), file=sys.stderr)
 
 
+def report_findings(findings):
+    """
+    Print out findings nicely formatted, grouped by what they are about.
+
+    :param list findings: A list of :class:`Finding` instances.
+    """
+
+    grouped = OrderedDict()
+    for finding in findings:
+        key = (finding.severity, finding.type, finding.id)
+        grouped.setdefault(key, []).append(finding.message)
+
+    for (severity, type_, id_), messages in grouped.items():
+        kind = 'errors' if severity == Severity.error else 'warnings'
+        report_errors(type_, id_, messages, kind)
+
+
 def validate(comp):
     """
-    Validate a Compstate repo.
+    Validate a Compstate repo, printing out any problems found.
 
     :param sr.comp.SRComp comp: A competition instance.
     :return: The number of errors that have occurred.
     """
 
-    count = 0
-    count += validate_schedule(comp.schedule, comp.teams.keys(),
-                               comp.arenas.keys())
+    findings = find_problems(comp)
+    report_findings(findings)
+    return count_errors(findings)
+
+
+def count_errors(findings):
+    """
+    Count the errors, rather than warnings, among some findings.
+
+    :param list findings: A list of :class:`Finding` instances.
+    :return: The number of errors.
+    """
 
-    all_matches = comp.schedule.matches
-    count += validate_team_matches(all_matches, comp.teams.keys())
+    return sum(1 for finding in findings if finding.severity == Severity.error)
 
-    count += validate_scores(MatchType.league, comp.scores.league, all_matches)
-    count += validate_scores(MatchType.knockout, comp.scores.knockout,
-                             all_matches)
-    count += validate_scores(MatchType.tiebreaker, comp.scores.tiebreaker,
-                             all_matches)
 
-    return count
+def find_problems(comp):
+    """
+    Find the problems with a Compstate repo.
 
+    The schedule and the scores are each walked only once.
+
+    :param sr.comp.SRComp comp: A competition instance.
+    :return: A list of :class:`Finding` instances.
+    """
 
-def validate_schedule(schedule, possible_teams, possible_arenas):
-    """Check that the schedule contains enough time for all the matches,
-    and that the matches themselves are valid."""
-    count = 0
+    schedule = comp.schedule
+    possible_teams = set(comp.teams.keys())
+    possible_arenas = comp.arenas
+
+    all_scores = OrderedDict([
+        (MatchType.league, comp.scores.league),
+        (MatchType.knockout, comp.scores.knockout),
+        (MatchType.tiebreaker, comp.scores.tiebreaker),
+    ])
+    last_scored = {match_type: scores.last_scored_match
+                   for match_type, scores in all_scores.items()}
+
+    findings = []
+    arena_errors = []
+    timing_map = defaultdict(list)
+    teams_used = set()
+    missing = {match_type: defaultdict(set) for match_type in all_scores}
 
-    # Check that each match features only valid teams
     for num, match in enumerate(schedule.matches):
-        errors = validate_match(match, possible_teams)
-        count += len(errors)
-        report_errors('Match', num, errors)
+        for error in validate_match(match, possible_teams):
+            findings.append(Finding(Severity.error, 'Match', num, error))
+
+        for arena, game in sorted(match.items()):
+            if arena not in possible_arenas:
+                arena_errors.append(ARENA_ERROR.format(arena=arena,
+                                                       game=game))
+
+            if game.type == MatchType.league:
+                teams_used.update(game.teams)
+
+            last_match = last_scored[game.type]
+            if last_match is not None and num <= last_match and \
+                    (arena, num) not in all_scores[game.type].ranked_points:
+                missing[game.type][num].add(arena)
+
+        if match:
+            game = list(match.values())[0]
+            timing_map[game.start_time].append(game.num)
+
+    findings += find_schedule_timing_problems(schedule, timing_map)
+
+    for error in arena_errors:
+        findings.append(Finding(Severity.error, 'Schedule', 'arenas', error))
+
+    for tla in sorted(possible_teams - teams_used):
+        findings.append(Finding(Severity.error, 'Team', tla,
+                                "Has no league matches."))
+
+    for match_type, scores in all_scores.items():
+        findings += find_score_problems(match_type, scores.game_points,
+                                        scores.ranked_points,
+                                        schedule.matches)
 
-    warnings = validate_schedule_count(schedule)
-    report_errors('Schedule', '', warnings)
+    for match_type, missing_arenas in missing.items():
+        findings += find_missing_score_problems(
+            match_type, sorted(missing_arenas.items()))
 
-    errors = validate_schedule_timings(schedule.matches,
-                                       schedule.match_duration)
-    count += len(errors)
-    if len(errors):
+    return findings
+
+
+def find_schedule_timing_problems(schedule, timing_map):
+    """
+    Find the problems with the number and timing of the matches.
+
+    :param schedule: The :class:`.MatchSchedule`.
+    :param dict timing_map: The numbers of the matches starting at each time.
+    :return: A list of :class:`Finding` instances.
+    """
+
+    findings = []
+    for warning in validate_schedule_count(schedule):
+        findings.append(Finding(Severity.warning, 'Schedule', '', warning))
+
+    errors = find_timing_errors(timing_map, schedule.match_duration)
+    if errors:
         errors.append("This usually indicates that the scheduled periods "
                       "overlap.")
-    report_errors('Schedule', 'timing', errors)
+    for error in errors:
+        findings.append(Finding(Severity.error, 'Schedule', 'timing', error))
+
+    return findings
+
+
+def find_missing_score_problems(match_type, missing):
+    """
+    Get warnings about scores which are missing.
+
+    :param MatchType match_type: The type of the matches.
+    :param list missing: Pairs of the number of a match which is missing
+                         scores and the arenas missing them, as from
+                         :func:`find_missing_scores`.
+    :return: A list of :class:`Finding` instances.
+    """
 
-    errors = validate_schedule_arenas(schedule.matches, possible_arenas)
-    count += len(errors)
-    report_errors('Schedule', 'arenas', errors)
+    type_ = '{0} Match'.format(match_type.name.title())
+    findings = []
+    for num, arenas in missing:
+        msg = "Scores missing for arenas {0}.".format(', '.join(sorted(arenas)))
+        findings.append(Finding(Severity.warning, type_, num, msg))
+    return findings
 
-    return count
+
+def find_score_problems(match_type, game_points, ranked_points, schedule):
+    """
+    Find the problems with the scores of one type of match.
+
+    :param MatchType match_type: The type of the matches.
+    :param dict game_points: The game points of each team in each match.
+    :param dict ranked_points: The ranked (league) points of each team in
+                               each match.
+    :param list schedule: All of the scheduled matches.
+    :return: A list of :class:`Finding` instances.
+    """
+    # NB: more specific validation is already done during the scoring,
+    # so all we need to do is check that the right teams are being awarded
+    # points
+
+    match_type_title = match_type.name.title()
+    findings = []
+
+    def check(type_, match_id, match):
+        arena, num = match_id
+        if num < 0 or num >= len(schedule):
+            msg = '{0} Match not scheduled'.format(match_type_title)
+            findings.append(Finding(Severity.error, type_, match_id, msg))
+            return
+
+        scheduled = schedule[num]
+        if arena not in scheduled:
+            msg = 'Arena not in this {0} match'.format(match_type_title)
+            findings.append(Finding(Severity.error, type_, match_id, msg))
+            return
+
+        for error in validate_match_score(match_type, match,
+                                          scheduled[arena]):
+            findings.append(Finding(Severity.error, type_, match_id, error))
+
+    for match_id, match in game_points.items():
+        check('Game Score', match_id, match)
+
+    if match_type == MatchType.league:
+        for match_id, match in ranked_points.items():
+            check('League Points', match_id, match)
+
+    return findings
 
 
 def validate_schedule_count(schedule):
@@ -105,6 +291,17 @@ def validate_schedule_timings(scheduled_matches, match_duration):
         time = game.start_time
         timing_map[time].append(game.num)
 
+    return find_timing_errors(timing_map, match_duration)
+
+
+def find_timing_errors(timing_map, match_duration):
+    """
+    Check that matches neither start at the same time nor overlap.
+
+    :param dict timing_map: The numbers of the matches starting at each time.
+    :param datetime.timedelta match_duration: The length of a match.
+    :return: A list of string errors.
+    """
     errors = []
     last_time = None
     for time, match_numbers in sorted(timing_map.items()):
@@ -129,14 +326,11 @@ def validate_schedule_timings(scheduled_matches, match_duration):
 def validate_schedule_arenas(matches, possible_arenas):
     """Check that any arena referenced by a match actually exists."""
     errors = []
-    error_format_string = \
-        "Match {game.num} ({game.type}) references arena '{arena}'."
 
     for match in matches:
         for arena, game in match.items():
             if arena not in possible_arenas:
-                errors.append(error_format_string.format(arena=arena,
-                                                         game=game))
+                errors.append(ARENA_ERROR.format(arena=arena, game=game))
 
     return errors
 
@@ -168,58 +362,6 @@ def validate_match(match, possible_teams):
     return errors
 
 
-def validate_scores(match_type, scores, schedule):
-    """Validate that the scores are sane."""
-    count = validate_scores_inner(match_type, scores, schedule)
-    warn_missing_scores(match_type, scores, schedule)
-    return count
-
-
-def validate_scores_inner(match_type, scores, schedule):
-    """Validate that scores are sane."""
-    # NB: more specific validation is already done during the scoring,
-    # so all we need to do is check that the right teams are being awarded
-    # points
-
-    count = 0
-    match_type_title = match_type.name.title()
-
-    def get_scheduled_match(match_id, type_):
-        """Check that the requested match was scheduled, return it if so."""
-        num = match_id[1]
-        if num < 0 or num >= len(schedule):
-            msg = '{0} Match not scheduled'.format(match_type_title)
-            report_errors(type_, match_id, [msg])
-            return None
-
-        arena = match_id[0]
-        match = schedule[num]
-        if arena not in match:
-            msg = 'Arena not in this {0} match'.format(match_type_title)
-            report_errors(type_, match_id, [msg])
-            return None
-
-        return match[arena]
-
-    def check(type_, match_id, match):
-        scheduled_match = get_scheduled_match(match_id, type_)
-        if scheduled_match is None:
-            return 1
-
-        errors = validate_match_score(match_type, match, scheduled_match)
-        report_errors(type_, match_id, errors)
-        return len(errors)
-
-    for match_id, match in scores.game_points.items():
-        count += check('Game Score', match_id, match)
-
-    if match_type == MatchType.league:
-        for match_id, match in scores.ranked_points.items():
-            count += check('League Points', match_id, match)
-
-    return count
-
-
 def validate_match_score(match_type, match_score, scheduled_match):
     """Check that the match awards points to the right teams, by checking
     that the teams with points were scheduled to appear in the match."""
@@ -247,23 +389,6 @@ def validate_match_score(match_type, match_score, scheduled_match):
     return errors
 
 
-def warn_missing_scores(match_type, scores, schedule):
-    """Check that the scores up to the most recent are all present."""
-    match_ids = scores.ranked_points.keys()
-    last_match = scores.last_scored_match
-
-    missing = find_missing_scores(match_type, match_ids, last_match, schedule)
-    if len(missing) == 0:
-        return
-
-    msg = "The following {0} scores are missing:".format(match_type.name)
-    print(msg, file=sys.stderr)
-    print("Match   | Arena ", file=sys.stderr)
-    for m in missing:
-        arenas = ", ".join(sorted(m[1]))
-        print(" {0:>3}    | {1}".format(m[0], arenas), file=sys.stderr)
-
-
 def find_missing_scores(match_type, match_ids, last_match, schedule):
     """
     Given a collection of ``match_ids`` for which we have scores, the
@@ -298,23 +423,6 @@ def find_missing_scores(match_type, match_ids, last_match, schedule):
     return missing_items
 
 
-def validate_team_matches(matches, possible_teams):
-    """
-    Check that all teams have been assigned league matches. We don't need (or
-    want) to check the knockouts, since those are scheduled dynamically based
-    on the list of teams.
-    """
-
-    teams_without_matches = find_teams_without_league_matches(matches,
-                                                              possible_teams)
-    if teams_without_matches:
-        teams_str = ", ".join(sorted(teams_without_matches))
-        print("The following teams have no league matches: {0}"
-              .format(teams_str))
-
-    return len(teams_without_matches)
-
-
 def find_teams_without_league_matches(matches, possible_teams):
     """
     Find teams that don't have league matches.
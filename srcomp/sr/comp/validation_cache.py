@@ -0,0 +1,354 @@
+"""
+Validation of a compstate which re-checks only what has changed since a
+previously validated commit.
+"""
+
+from collections import defaultdict, OrderedDict
+import json
+import os
+
+import yaml
+
+from sr.comp import ranker, yaml_loader
+from sr.comp.arenas import load_arenas
+from sr.comp.comp import load_scorer
+from sr.comp.match_period import MatchType
+from sr.comp.matches import get_knockout_scheduler, MatchSchedule
+from sr.comp.scores import get_disqualified, get_validated_scores, \
+    InvalidTeam
+from sr.comp.teams import load_teams
+from sr.comp.validation import find_missing_scores, \
+    find_missing_score_problems, find_problems, find_schedule_timing_problems, \
+    find_score_problems, Finding
+from sr.comp.venue import Venue
+
+
+CACHE_NAME = 'srcomp-validation.json'
+"""The name of the cache file, within the compstate's git directory."""
+
+CACHE_SIZE = 20
+"""The number of commits whose findings are kept in the cache."""
+
+IGNORED_FILES = frozenset(['deployments.yaml'])
+"""Files in a compstate which nothing is validated against."""
+
+VENUE_FILES = frozenset(['layout.yaml', 'shepherding.yaml'])
+"""Files in a compstate which describe the venue."""
+
+VENUE = 'venue'
+DELAYS = 'delays'
+LEAGUE_SCORES = 'league-scores'
+
+
+class ValidationCache(object):
+    """
+    The findings of validating a compstate at each of its recent commits,
+    stored as JSON.
+
+    :param str path: The path to the cache file.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._entries = OrderedDict()
+
+        try:
+            with open(path) as f:
+                entries = json.load(f)
+        except (IOError, ValueError):
+            # Missing or corrupt, so start again
+            entries = []
+
+        for commit, findings in entries:
+            self._entries[commit] = findings
+
+    def get(self, commit):
+        """Get the findings for the given commit, or ``None``."""
+        findings = self._entries.get(commit)
+        if findings is None:
+            return None
+        return [Finding.from_dict(finding) for finding in findings]
+
+    @property
+    def latest(self):
+        """The most recently stored commit, or ``None``."""
+        if not self._entries:
+            return None
+        return next(reversed(self._entries))
+
+    def store(self, commit, findings):
+        """Store the findings for the given commit."""
+        self._entries.pop(commit, None)
+        self._entries[commit] = [finding.as_dict() for finding in findings]
+
+        while len(self._entries) > CACHE_SIZE:
+            self._entries.popitem(last=False)
+
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(list(self._entries.items()), f)
+        os.rename(tmp_path, self._path)
+
+
+def _score_sheet_id(path):
+    """Get the ``(arena, num)`` id of a match from its score sheet's path."""
+    _, arena, filename = path.split('/')
+    return arena, int(os.path.splitext(filename)[0])
+
+
+def _is_league_score_sheet(path):
+    parts = path.split('/')
+    return len(parts) == 3 and parts[0] == MatchType.league.value and \
+        parts[2].endswith('.yaml')
+
+
+def _has_score_sheets(root, match_type):
+    type_dir = os.path.join(root, match_type.value)
+    if not os.path.isdir(type_dir):
+        return False
+    for arena in os.listdir(type_dir):
+        arena_dir = os.path.join(type_dir, arena)
+        if os.path.isdir(arena_dir) and \
+                any(name.endswith('.yaml') for name in os.listdir(arena_dir)):
+            return True
+    return False
+
+
+def _only_delays_changed(compstate, since):
+    old = yaml.load(compstate.show_file(since, 'schedule.yaml'),
+                    Loader=yaml_loader.YAML_Loader)
+    new = yaml_loader.load(os.path.join(compstate.path, 'schedule.yaml'))
+    old.pop('delays', None)
+    new.pop('delays', None)
+    return old == new
+
+
+def classify_changes(compstate, since, changed_files):
+    """
+    Work out which rules need re-checking for some changes to a compstate.
+
+    Only changes to league score sheets and to the delays in the schedule
+    (while there are no knockout scores, on which the teams in the
+    knockouts and whether there's a tiebreaker depend) and to the venue can
+    be re-checked on their own.
+
+    :param compstate: The :class:`.RawCompstate`.
+    :param str since: The commit the changes are from.
+    :param list changed_files: The paths of the changed files, relative to
+                               the compstate.
+    :return: A set of the rules to re-check, or ``None`` if the whole
+             compstate needs validating.
+    """
+
+    rules = set()
+    for path in changed_files:
+        if path in IGNORED_FILES:
+            continue
+        elif path in VENUE_FILES:
+            rules.add(VENUE)
+        elif path == 'schedule.yaml' and _only_delays_changed(compstate,
+                                                              since):
+            rules.add(DELAYS)
+        elif _is_league_score_sheet(path):
+            rules.add(LEAGUE_SCORES)
+        else:
+            return None
+
+    if rules & set([LEAGUE_SCORES, DELAYS]) and \
+            (_has_score_sheets(compstate.path, MatchType.knockout) or
+             _has_score_sheets(compstate.path, MatchType.tiebreaker)):
+        return None
+
+    return rules
+
+
+class _UnscoredLeague(object):
+    def __init__(self, teams):
+        self.positions = OrderedDict((tla, None) for tla in sorted(teams))
+        self.game_points = {}
+
+
+class _UnscoredKnockout(object):
+    resolved_positions = {}
+
+
+class _NoScores(object):
+    """
+    Stands in for the scores of a competition, for scheduling knockouts
+    whose times (which don't depend on the teams in them) are all that's
+    needed.
+    """
+
+    def __init__(self, teams):
+        self.league = _UnscoredLeague(teams)
+        self.knockout = _UnscoredKnockout()
+
+
+def _schedule_timing_problems(root, y, league, teams):
+    """
+    Check the timing of the league and knockout matches. There's no
+    tiebreaker, since there are no knockout scores.
+    """
+
+    schedule = MatchSchedule(y, league, teams)
+    arenas = load_arenas(os.path.join(root, 'arenas.yaml'))
+    scheduler = get_knockout_scheduler(y)(schedule, _NoScores(teams), arenas,
+                                          teams, y)
+    scheduler.add_knockouts()
+
+    timing_map = defaultdict(list)
+    for match in schedule.matches:
+        game = list(match.values())[0]
+        timing_map[game.start_time].append(game.num)
+    return find_schedule_timing_problems(schedule, timing_map)
+
+
+def _league_score_problems(root, teams, schedule, sheet_paths):
+    """
+    Check some league score sheets against their scheduled matches.
+
+    :return: A tuple of the ids of the matches checked and the findings
+             about them, or ``None`` if a sheet doesn't belong where it is.
+    """
+
+    scorer = load_scorer(root)
+    game_points = {}
+    ranked_points = {}
+    match_ids = set()
+
+    for path in sheet_paths:
+        match_id = _score_sheet_id(path)
+        match_ids.add(match_id)
+
+        full_path = os.path.join(root, path)
+        if not os.path.exists(full_path):
+            continue
+
+        y = yaml_loader.load(full_path)
+        if (y['arena_id'], y['match_number']) != match_id:
+            return None
+
+        points = get_validated_scores(scorer, y)
+        for tla in points:
+            if tla not in teams:
+                raise InvalidTeam(tla)
+
+        dsq = get_disqualified(y['teams'])
+        positions = ranker.calc_positions(points, dsq)
+        game_points[match_id] = points
+        ranked_points[match_id] = ranker.calc_ranked_points(positions, dsq)
+
+    findings = find_score_problems(MatchType.league, game_points,
+                                   ranked_points, schedule.matches)
+    return match_ids, findings
+
+
+def _league_missing_score_problems(root, schedule):
+    scored = set()
+    league_dir = os.path.join(root, MatchType.league.value)
+    if os.path.isdir(league_dir):
+        for arena in os.listdir(league_dir):
+            for name in os.listdir(os.path.join(league_dir, arena)):
+                if name.endswith('.yaml'):
+                    scored.add((arena, int(os.path.splitext(name)[0])))
+
+    last_match = max([num for _, num in scored] or [None])
+    missing = find_missing_scores(MatchType.league, scored, last_match,
+                                  schedule.matches)
+    return find_missing_score_problems(MatchType.league, missing)
+
+
+def revalidate(root, findings, rules, changed_files):
+    """
+    Re-check some rules against a compstate, given the findings of an
+    earlier validation.
+
+    Only the teams, the schedule and (if it changed) the venue are loaded:
+    the scores of unchanged matches keep their earlier findings. If the
+    delays changed, the knockouts are scheduled without their teams, to
+    check their times.
+
+    :param str root: The path to the compstate.
+    :param list findings: The findings of the earlier validation.
+    :param set rules: The rules to re-check, from :func:`classify_changes`.
+    :param list changed_files: The paths of the changed files, relative to
+                               the compstate.
+    :return: A list of :class:`.Finding` instances, or ``None`` if the whole
+             compstate needs validating after all.
+    """
+
+    kept = list(findings)
+    if not rules:
+        return kept
+
+    teams = load_teams(os.path.join(root, 'teams.yaml'))
+    new = []
+
+    y = yaml_loader.load(os.path.join(root, 'schedule.yaml'))
+    league = yaml_loader.load(os.path.join(root, 'league.yaml'))['matches']
+    schedule = MatchSchedule(y, league, teams)
+
+    if VENUE in rules:
+        # As when loading the competition, this raises if the venue doesn't
+        # fit the teams or the staging times
+        venue = Venue(teams.keys(), os.path.join(root, 'layout.yaml'),
+                      os.path.join(root, 'shepherding.yaml'))
+        venue.check_staging_times(schedule.staging_times)
+
+    if DELAYS in rules:
+        # Matches which no longer fit in the schedule would change the
+        # findings about the matches and the teams in them too
+        if schedule.n_league_matches < schedule.n_planned_league_matches:
+            return None
+
+        kept = [f for f in kept
+                if f.type != 'Schedule' or f.id == 'arenas']
+        new += _schedule_timing_problems(root, y, league, teams)
+
+    if LEAGUE_SCORES in rules:
+        sheet_paths = [path for path in changed_files
+                       if _is_league_score_sheet(path)]
+        result = _league_score_problems(root, teams, schedule, sheet_paths)
+        if result is None:
+            return None
+
+        match_ids, score_findings = result
+        kept = [f for f in kept
+                if not (f.type in ('Game Score', 'League Points') and
+                        f.id in match_ids) and f.type != 'League Match']
+        new += score_findings
+        new += _league_missing_score_problems(root, schedule)
+
+    return kept + new
+
+
+def find_problems_since_cached(compstate):
+    """
+    Find the problems with a compstate, re-checking only what has changed
+    since the most recently validated commit where possible. The findings
+    are cached for the current commit, unless there are local changes.
+
+    :param compstate: The :class:`.RawCompstate`.
+    :return: A list of :class:`.Finding` instances.
+    """
+
+    cache = ValidationCache(os.path.join(compstate.git_dir, CACHE_NAME))
+    head = compstate.rev_parse('HEAD')
+    has_changes = compstate.has_changes
+
+    findings = None
+    since = head if cache.get(head) is not None else cache.latest
+    if since is not None and compstate.has_commit(since):
+        changed_files = compstate.changed_files(since)
+        rules = classify_changes(compstate, since, changed_files)
+        if rules is not None:
+            findings = revalidate(compstate.path, cache.get(since), rules,
+                                  changed_files)
+
+    if findings is None:
+        findings = find_problems(compstate.load())
+
+    if not has_changes:
+        cache.store(head, findings)
+
+    return findings
@@ -81,8 +81,8 @@ def _compute_rookie_award(scores, teams):
                         if position == best_position))}
 
 
-def _compute_explicit_awards(path):
-    """Compute awards explicitly provided in the compstate repo."""
+def load_explicit_awards(path):
+    """Load the awards explicitly provided in the compstate repo."""
     if not os.path.exists(path):
         return {}
 
@@ -110,5 +110,5 @@ def compute_awards(scores, final_match, teams, path=None):
     awards.update(_compute_main_awards(scores, final_match, teams))
     awards.update(_compute_rookie_award(scores, teams))
     if path is not None:
-        awards.update(_compute_explicit_awards(path))
+        awards.update(load_explicit_awards(path))
     return awards
@@ -1,10 +1,13 @@
 
 import os
 import datetime
+import shutil
+import sys
+import tempfile
 
 from nose.plugins.skip import SkipTest
 
-from sr.comp.comp import SRComp
+from sr.comp.comp import load_scorer, SRComp
 
 DUMMY_PATH = os.path.dirname(os.path.abspath(__file__)) + '/dummy'
 
@@ -23,6 +26,7 @@ def test_load():
     assert instance.arenas
     assert instance.corners
     assert isinstance(instance.awards, dict)
+    assert "teams" in instance.load_times
 
 def test_timezone():
     # Test that one can get the timezone from the dummy state
@@ -31,3 +35,48 @@ def test_timezone():
         raise SkipTest("Timezone test skipped due to srcomp load failure.")
     assert (instance.timezone.utcoffset(datetime.datetime(2014, 4, 26)) ==
             datetime.timedelta(seconds=3600))
+
+def test_get_match_type():
+    global instance
+    if instance is None:
+        raise SkipTest("Match type test skipped due to srcomp load failure.")
+    match = instance.schedule.matches[0]['A']
+    assert instance.get_match_type('A', 0) == match.type
+
+    for arena, num in (('A', -1), ('A', 10000), ('Z', 0)):
+        try:
+            instance.get_match_type(arena, num)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("Should not find match {0}{1}"
+                                 .format(arena, num))
+
+def test_with_score_sheets_none():
+    global instance
+    if instance is None:
+        raise SkipTest("Scenario test skipped due to srcomp load failure.")
+    comp = instance.with_score_sheets([])
+    assert comp is not instance
+    assert comp.state == instance.state
+    assert comp.schedule.matches == instance.schedule.matches
+    assert comp.awards == instance.awards
+
+
+def test_load_scorer_restores_path():
+    root = tempfile.mkdtemp()
+    try:
+        os.mkdir(os.path.join(root, 'scoring'))
+        with open(os.path.join(root, 'scoring', 'score.py'), 'w') as f:
+            f.write("import sys\nsys.path.append('bees')\n"
+                    "class Scorer(object):\n    pass\n")
+
+        path = sys.path
+        saved_path = list(path)
+        scorer = load_scorer(root)
+
+        assert scorer.__name__ == 'Scorer'
+        assert sys.path is path, "Should change the path in place"
+        assert sys.path == saved_path
+    finally:
+        shutil.rmtree(root)
@@ -4,13 +4,13 @@ from datetime import datetime, timedelta
 import mock
 
 from sr.comp.teams import Team
-from sr.comp.matches import Delay
+from sr.comp.matches import Delay, MatchSchedule
 from sr.comp.match_period import Match, MatchType
 from sr.comp.knockout_scheduler import KnockoutScheduler, UNKNOWABLE_TEAM
 
 def get_scheduler(matches = None, positions = None, \
                     knockout_positions = None, league_game_points = None, \
-                    delays = None, teams=None):
+                    delays = None, teams=None, previous=None):
     matches = matches or []
     delays = delays or []
     match_duration = timedelta(minutes = 5)
@@ -21,8 +21,16 @@ def get_scheduler(matches = None, positions = None, \
         positions['ABC'] = 1
         positions['DEF'] = 2
 
+    def count_unscored_league_matches(league_scores):
+        return len([m for slot in matches for m in slot.values()
+                    if m.type == MatchType.league
+                    and (m.arena, m.num) not in league_scores.game_points])
+
     league_schedule = mock.Mock(matches = matches, delays = delays, \
-                                match_duration = match_duration)
+                                match_duration = match_duration,
+                                unscored_league_matches = None,
+                                count_unscored_league_matches = \
+                                    count_unscored_league_matches)
     league_scores = mock.Mock(positions = positions, game_points = league_game_points)
     knockout_scores = mock.Mock(resolved_positions = knockout_positions)
     scores = mock.Mock(league = league_scores, knockout = knockout_scores)
@@ -48,7 +56,7 @@ def get_scheduler(matches = None, positions = None, \
     if teams is None:
         teams = defaultdict(lambda: Team(None, None, False, None))
     scheduler = KnockoutScheduler(league_schedule, scores, arenas, teams,
-                                  config)
+                                  config, previous)
     return scheduler
 
 
@@ -451,3 +459,182 @@ def test_timings_with_delays_during_gaps():
     ]
 
     assert expected_times == start_times, "Wrong start times"
+
+
+def get_sixteen_team_positions():
+    positions = OrderedDict()
+    for n in range(16):
+        positions['T{0:0>2}'.format(n)] = n + 1
+    return positions
+
+def test_update_previous_unchanged():
+    positions = get_sixteen_team_positions()
+
+    first = get_scheduler(positions=positions)
+    first.add_knockouts()
+
+    second = get_scheduler(positions=positions, previous=first)
+    second.add_knockouts()
+
+    assert second.knockout_rounds == first.knockout_rounds
+    for prev_round, new_round in zip(first.knockout_rounds,
+                                     second.knockout_rounds):
+        for prev_match, new_match in zip(prev_round, new_round):
+            assert prev_match is new_match, "Should reuse unchanged matches"
+
+    assert second.previous is None, "Should not keep the previous scheduler"
+
+def test_update_previous_knockout_score():
+    positions = get_sixteen_team_positions()
+
+    first = get_scheduler(positions=positions)
+    first.add_knockouts()
+
+    quarter = first.knockout_rounds[0][1]
+    seeded = [tla for tla in quarter.teams if tla is not None]
+    knockout_positions = {
+        (quarter.arena, quarter.num): OrderedDict(
+            (tla, pos) for pos, tla in enumerate(sorted(seeded), start=1)),
+    }
+
+    second = get_scheduler(positions=positions,
+                           knockout_positions=knockout_positions,
+                           previous=first)
+    second.add_knockouts()
+
+    expected = get_scheduler(positions=positions,
+                             knockout_positions=knockout_positions)
+    expected.add_knockouts()
+
+    assert second.knockout_rounds == expected.knockout_rounds
+    assert second.schedule.matches == expected.schedule.matches
+    assert second.period == expected.period
+
+    quarters, semis, finals = second.knockout_rounds
+    for prev_match, new_match in zip(first.knockout_rounds[0], quarters):
+        assert prev_match is new_match, "Should reuse the quarter finals"
+
+    assert semis[0] is not first.knockout_rounds[1][0], \
+        "Should update the semi final after the scored quarter final"
+    assert set(sorted(seeded)[:2]) <= set(semis[0].teams), semis[0]
+    assert semis[1] is first.knockout_rounds[1][1], \
+        "Should reuse the other semi final"
+
+def test_update_previous_layout_changed():
+    positions = get_sixteen_team_positions()
+
+    first = get_scheduler(positions=positions)
+    first.add_knockouts()
+
+    delays = [Delay(time=datetime(2014, 3, 27, 13), delay=timedelta(minutes=5))]
+    second = get_scheduler(positions=positions, delays=delays,
+                           previous=first)
+    second.add_knockouts()
+
+    expected = get_scheduler(positions=positions, delays=delays)
+    expected.add_knockouts()
+
+    assert second.knockout_rounds == expected.knockout_rounds
+    assert second.knockout_rounds != first.knockout_rounds
+
+def test_get_bracket():
+    positions = get_sixteen_team_positions()
+    scheduler = get_scheduler(positions=positions)
+    bracket = scheduler.get_bracket()
+
+    assert bracket == [
+        [[0, 4, 8, 12], [2, 6, 10, 14], [3, 7, 11, 15], [1, 5, 9, 13]],
+        [[(0, 0, 0), (0, 0, 1), (0, 1, 0), (0, 1, 1)],
+         [(0, 2, 0), (0, 2, 1), (0, 3, 0), (0, 3, 1)]],
+        [[(1, 0, 0), (1, 0, 1), (1, 1, 0), (1, 1, 1)]],
+    ], bracket
+
+    # The bracket matches the first round actually scheduled
+    scheduler.add_knockouts()
+    tlas = list(positions.keys())
+    for match, seeds in zip(scheduler.knockout_rounds[0], bracket[0]):
+        assert set(match.teams) == set(tlas[seed] for seed in seeds)
+
+def test_get_bracket_arity():
+    positions = get_sixteen_team_positions()
+    scheduler = get_scheduler(positions=positions)
+    scheduler.config['knockout']['arity'] = 5
+    bracket = scheduler.get_bracket()
+
+    assert bracket == [
+        [[0, 2, 4], [1, 3]],
+        [[(0, 0, 0), (0, 0, 1), (0, 1, 0), (0, 1, 1)]],
+    ], bracket
+
+def test_get_seeded_teams_drop_outs():
+    teams = defaultdict(lambda: Team(None, None, False, None))
+    teams['DEF'] = Team('DEF', 'DEF', False, 0)  # dropped out after match 0
+    scheduler = get_scheduler(teams=teams)
+    scheduler.schedule.n_league_matches = 2
+
+    seeded = scheduler.get_seeded_teams(['ABC', 'DEF', 'GHI'])
+    assert seeded == ['ABC', 'GHI'], seeded
+
+
+def build_league_schedule(teams):
+    y = {
+        'match_slot_lengths': {'pre': 90, 'match': 180, 'post': 30,
+                               'total': 300},
+        'staging': {'opens': 300, 'closes': 120, 'duration': 180,
+                    'signal_shepherds': {}, 'signal_teams': 240},
+        'delays': [],
+        'match_periods': {
+            'league': [{
+                'description': "The league",
+                'start_time': datetime(2014, 3, 26, 13),
+                'end_time': datetime(2014, 3, 26, 17, 30),
+            }],
+            'knockout': [],
+        },
+        'league': {'extra_spacing': []},
+    }
+    league = {
+        0: {'A': ['AAA', 'BBB', 'CCC', 'DDD'],
+            'B': ['EEE', 'FFF', 'GGG', 'HHH']},
+        1: {'A': ['AAA', 'CCC', 'EEE', 'GGG'],
+            'B': ['BBB', 'DDD', 'FFF', 'HHH']},
+    }
+    return MatchSchedule(y, league, teams)
+
+
+def test_first_round_with_real_schedule():
+    # The league is checked against the scores the scheduler is given,
+    # rather than anything worked out when the schedule was built
+    teams = defaultdict(lambda: Team(None, None, False, None))
+    positions = OrderedDict((tla, i + 1) for i, tla in
+                            enumerate(['HHH', 'AAA', 'DDD', 'BBB', 'CCC',
+                                       'EEE', 'FFF', 'GGG']))
+    game_points = dict(((arena, num), {}) for arena in 'AB'
+                       for num in range(2))
+    config = get_scheduler().config
+
+    def first_round_teams(game_points):
+        schedule = build_league_schedule(teams)
+        league_scores = mock.Mock(positions = positions,
+                                  game_points = game_points)
+        knockout_scores = mock.Mock(resolved_positions = {})
+        scores = mock.Mock(league = league_scores, knockout = knockout_scores)
+        scheduler = KnockoutScheduler(schedule, scores, ['A', 'B'], teams,
+                                      config)
+        scheduler.add_knockouts()
+        return sorted(tla for match in scheduler.knockout_rounds[0]
+                      for tla in match.teams if tla is not None)
+
+    assert first_round_teams(game_points) == sorted(positions.keys())
+
+    del game_points[('B', 1)]
+    assert first_round_teams(game_points) == [UNKNOWABLE_TEAM] * 8
+
+
+def test_unscored_league_matches_from_schedule():
+    scheduler = get_scheduler()
+    scheduler.schedule.unscored_league_matches = 2
+    scheduler.schedule.count_unscored_league_matches = mock.Mock()
+
+    assert not scheduler._played_all_league_matches()
+    assert not scheduler.schedule.count_unscored_league_matches.called
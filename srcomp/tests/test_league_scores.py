@@ -1,6 +1,8 @@
 
 import mock
+import pickle
 
+from sr.comp.match_period import MatchType
 from sr.comp.scores import LeagueScores, TeamScore
 
 class FakeScorer(object):
@@ -207,3 +209,117 @@ def test_league_ranker_full_tie():
     assert expected_map == ranking
     order = list(ranking.keys())
     assert expected_order == order
+
+def test_pickle():
+    the_data = get_basic_data()
+
+    class LocalScorer(FakeScorer):
+        # Not importable, much like the scorer of a compstate
+        pass
+
+    teams = the_data['teams'].keys()
+    with mock.patch('sr.comp.matches.yaml_loader.load',
+                    return_value=the_data), \
+            mock.patch('sr.comp.scores.results_finder',
+                       return_value=['whatever.yaml']):
+        scores = LeagueScores('somewhere', teams, LocalScorer)
+
+    loaded = pickle.loads(pickle.dumps(scores, pickle.HIGHEST_PROTOCOL))
+
+    assert loaded.game_points == scores.game_points
+    assert loaded.ranked_points == scores.ranked_points
+    assert loaded.positions == scores.positions
+
+def test_game_points_in_corner_order():
+    scores = load_basic_data()
+
+    game = scores.game_points[('A', 123)]
+
+    assert ['RUN', 'ICE', 'JMS', 'PAS'] == list(game.keys())
+    assert [8, 2, 4, 0] == list(game.values())
+
+def test_game_and_league_points_share_teams():
+    scores = load_basic_data()
+
+    id_ = ('A', 123)
+    assert scores.game_points[id_].tlas is scores.ranked_points[id_].tlas
+
+def test_game_points_missing_team():
+    scores = load_basic_data()
+
+    game = scores.game_points[('A', 123)]
+
+    assert 'ABC' not in game
+    assert game.get('ABC') is None
+
+def test_disqualified():
+    scores = load_basic_data()
+
+    assert scores.disqualified[('A', 123)] == set(['JMS', 'PAS'])
+
+def test_table():
+    scores = load_basic_data()
+
+    rows = scores.table.select(team='JMS')
+    assert len(rows) == 1
+
+    row = rows[0]
+    assert row.type == MatchType.league
+    assert (row.arena, row.num) == ('A', 123)
+    assert row.game_points == 4
+    assert row.league_points == 0
+    assert row.disqualified
+
+def test_with_score_sheets():
+    scores = load_basic_data()
+    sheet = {
+        'match_number': 124,
+        'arena_id': 'A',
+        'teams': {
+            'PAS': {'score': 10, 'zone': 0},
+            'RUN': {'score': 0, 'zone': 1},
+        },
+    }
+
+    new_scores = scores.with_score_sheets([sheet], FakeScorer)
+
+    assert new_scores.game_points[('A', 124)] == {'PAS': 10, 'RUN': 0}
+    assert new_scores.teams['RUN'] == TeamScore(league=14, game=8)
+    assert new_scores.teams['PAS'] == TeamScore(league=8, game=10)
+    assert list(new_scores.positions.items()) == [
+        ('RUN', 1), ('PAS', 2), ('ICE', 3), ('JMS', 4),
+    ]
+    assert len(new_scores.table.select(num=124)) == 2
+
+    # The original scores are unchanged
+    assert ('A', 124) not in scores.game_points
+    assert scores.teams['RUN'] == TeamScore(league=8, game=8)
+    assert scores.teams['PAS'] == TeamScore(league=0, game=0)
+    assert list(scores.positions.keys()) == ['RUN', 'ICE', 'JMS', 'PAS']
+    assert len(scores.table.select(num=124)) == 0
+
+    # Teams whose points haven't changed are shared
+    assert new_scores.teams['ICE'] is scores.teams['ICE']
+
+def test_with_score_sheets_replaces():
+    scores = load_basic_data()
+    sheet = {
+        'match_number': 123,
+        'arena_id': 'A',
+        'teams': {
+            'RUN': {'score': 0, 'zone': 1},
+            'ICE': {'score': 5, 'zone': 2},
+            'JMS': {'score': 1, 'zone': 3},
+            'PAS': {'score': 3, 'zone': 4},
+        },
+    }
+
+    new_scores = scores.with_score_sheets([sheet], FakeScorer)
+
+    assert len(new_scores.game_points) == 1
+    assert new_scores.disqualified[('A', 123)] == set()
+    assert new_scores.teams['RUN'] == TeamScore(league=2, game=0)
+    assert new_scores.teams['ICE'] == TeamScore(league=8, game=5)
+    assert list(new_scores.positions.keys()) == ['ICE', 'PAS', 'JMS', 'RUN']
+
+    assert scores.teams['RUN'] == TeamScore(league=8, game=8)
@@ -3,7 +3,7 @@ from collections import defaultdict
 from datetime import datetime, timedelta
 
 from sr.comp.matches import MatchSchedule, parse_ranges
-from sr.comp.match_period import Match
+from sr.comp.match_period import Match, MatchPeriod, MatchType
 from sr.comp.teams import Team
 
 
@@ -375,6 +375,88 @@ def test_no_matches():
     n_league_matches = matches.n_league_matches
     assert n_league_matches == 0, "Number actually scheduled for the league"
 
+    assert matches.count_unscored_league_matches(FakeLeagueScores([])) == 0
+
+
+class FakeLeagueScores(object):
+    def __init__(self, match_ids):
+        self.game_points = dict((match_id, {}) for match_id in match_ids)
+
+
+class FakeScores(object):
+    def __init__(self, match_ids):
+        self.league = FakeLeagueScores(match_ids)
+
+
+class FakeKnockoutScheduler(object):
+    def __init__(self, schedule, scores, arenas, teams, config,
+                 previous=None):
+        self.schedule = schedule
+        self.scores = scores
+        self.arenas = arenas
+        self.teams = teams
+        self.config = config
+        self.previous = previous
+
+    def add_knockouts(self):
+        num = len(self.schedule.matches)
+        time = datetime(2014, 3, 27, 13)
+        match = Match(num, 'Final', 'A', [], time, time, MatchType.knockout,
+                      use_resolved_ranking=False)
+        slot = {'A': match}
+        self.knockout_rounds = [[match]]
+        self.period = MatchPeriod(time, time, time, 'Knockouts', [slot],
+                                  MatchType.knockout)
+        self.schedule.matches.append(slot)
+
+
+def test_with_scores():
+    the_data = get_basic_data()
+    schedule = load_data(the_data)
+    schedule._add_knockouts(FakeKnockoutScheduler, FakeScores([]), ['A'],
+                            schedule.teams, the_data)
+    matches = list(schedule.matches)
+
+    scores = FakeScores([('A', 0), ('B', 0)])
+    new_schedule = schedule.with_scores(scores)
+
+    # The league is shared, the knockouts scheduled again
+    assert new_schedule.matches[:3] == matches[:3]
+    for old, new in zip(matches[:3], new_schedule.matches):
+        assert old is new
+    assert len(new_schedule.matches) == 4
+    assert new_schedule.matches[3] is not matches[3]
+    assert new_schedule.final_match.num == 3
+
+    scheduler = new_schedule.knockout_scheduler
+    assert scheduler.scores is scores
+    assert scheduler.previous is schedule.knockout_scheduler
+    assert [p.type for p in new_schedule.match_periods] == \
+        [MatchType.league, MatchType.knockout]
+
+    assert new_schedule.unscored_league_matches == 3
+
+    # The original schedule is unchanged
+    assert schedule.matches == matches
+    assert schedule.unscored_league_matches is None
+    assert len(schedule.match_periods) == 2
+
+
+def test_unscored_league_matches():
+    matches = load_data(get_basic_data())
+
+    scores = FakeLeagueScores([])
+    assert matches.count_unscored_league_matches(scores) == 5, \
+        "All games are unscored"
+
+    # Scores for games which aren't in the league are ignored
+    scores = FakeLeagueScores([('A', 0), ('B', 1), ('B', 2), ('A', 7)])
+    assert matches.count_unscored_league_matches(scores) == 3
+
+    scores = FakeLeagueScores([('A', 0), ('B', 0), ('A', 1), ('B', 1),
+                               ('A', 2)])
+    assert matches.count_unscored_league_matches(scores) == 0
+
 
 def test_delay_at_no_period():
     match_sched = load_basic_data()
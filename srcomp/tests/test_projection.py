@@ -0,0 +1,171 @@
+from collections import OrderedDict
+from datetime import datetime
+import mock
+
+from nose.tools import eq_
+
+from sr.comp.match_period import Match, MatchType
+from sr.comp.projection import CHUNK_SIZE, KnockoutProjection
+from sr.comp.scores import KnockoutScores, TeamScore
+
+
+SEMIS_BRACKET = [
+    [[0, 3, 4, 7], [1, 2, 5, 6]],
+    [[(0, 0, 0), (0, 0, 1), (0, 1, 0), (0, 1, 1)]],
+]
+
+
+def get_positions(n_teams):
+    positions = OrderedDict()
+    for n in range(n_teams):
+        positions['T{0:0>2}'.format(n)] = n + 1
+    return positions
+
+
+def build_match(num, teams, type_=MatchType.league):
+    return Match(num, 'Match {0}'.format(num), 'A', teams,
+                 datetime(2014, 4, 27, 14, 30), datetime(2014, 4, 27, 14, 35),
+                 type_, use_resolved_ranking=False)
+
+
+def get_projection(bracket, points, positions=None, league_matches=(),
+                   knockout_rounds=(), resolved_positions=None):
+    """
+    Build a projection of a competition in which each team has only ever
+    scored the given (``points``) game points in the league, in one match
+    of its own (in arena 'B').
+    """
+    if positions is None:
+        positions = get_positions(len(points))
+
+    game_points = {('B', i): {tla: points[tla]}
+                   for i, tla in enumerate(sorted(points.keys()))}
+    league_teams = {tla: TeamScore(league=len(positions) - pos,
+                                   game=points[tla])
+                    for tla, pos in positions.items()}
+
+    league_scores = mock.Mock(positions=positions, teams=league_teams,
+                              game_points=game_points)
+    knockout_scores = mock.Mock(game_points={},
+                                resolved_positions=resolved_positions or {})
+    scores = mock.Mock(league=league_scores, knockout=knockout_scores)
+
+    scheduler = mock.Mock()
+    scheduler.get_bracket.return_value = bracket
+    scheduler.get_seeded_teams.side_effect = list
+
+    matches = [{'A': match} for match in league_matches]
+    schedule = mock.Mock(knockout_scheduler=scheduler, matches=matches,
+                         n_league_matches=len(matches),
+                         knockout_rounds=list(knockout_rounds))
+
+    return KnockoutProjection(schedule, scores)
+
+
+def test_certain():
+    points = {'T00': 9, 'T01': 8, 'T02': 7, 'T03': 6,
+              'T04': 5, 'T05': 4, 'T06': 3, 'T07': 2}
+    projection = get_projection(SEMIS_BRACKET, points)
+
+    result = projection.project(100, seed=1)
+
+    eq_(list(result.keys()), sorted(points.keys()))
+    eq_(result['T00'], [1, 1, 1])
+    eq_(result['T01'], [1, 1, 0])
+    eq_(result['T02'], [1, 1, 0])
+    eq_(result['T03'], [1, 1, 0])
+    eq_(result['T04'], [1, 0, 0])
+    eq_(result['T07'], [1, 0, 0])
+
+
+def test_ties_as_calculate_ranking():
+    # Everyone scores the same, so the knockouts go by league position
+    positions = get_positions(8)
+    positions['T01'] = 1
+    points = dict.fromkeys(positions.keys(), 3)
+    projection = get_projection(SEMIS_BRACKET, points, positions)
+
+    result = projection.project(10, seed=1)
+
+    expected = KnockoutScores.calculate_ranking(
+        {tla: 0 for tla in ['T00', 'T01', 'T02', 'T03']}, positions)
+    winner = list(expected.keys())[0]
+    eq_(winner, 'T00')
+    eq_(result[winner], [1, 1, 1])
+
+
+def test_uncertain():
+    points = {'T00': 9, 'T01': 8, 'T02': 7, 'T03': 6,
+              'T04': 5, 'T05': 4, 'T06': 3, 'T07': 2}
+    positions = get_positions(8)
+
+    # T00 has also scored nothing in a match, so only wins some of the time
+    projection = get_projection(SEMIS_BRACKET, points, positions)
+    projection._samples[0] = (0, 9)
+
+    result = projection.project(1000, seed=1)
+
+    assert 0 < result['T00'][2] < 1, result['T00']
+    assert 0 < result['T01'][2] < 1, result['T01']
+    eq_(sum(probs[2] for probs in result.values()), 1)
+    eq_(sum(probs[1] for probs in result.values()), 4)
+
+
+def test_played_knockout_kept():
+    points = {'T00': 9, 'T01': 8, 'T02': 7, 'T03': 6,
+              'T04': 5, 'T05': 4, 'T06': 3, 'T07': 2}
+    semi = build_match(8, ['T00', 'T03', 'T04', 'T07'], MatchType.knockout)
+    resolved_positions = {
+        ('A', 8): OrderedDict([('T07', 1), ('T04', 2), ('T03', 3),
+                               ('T00', 4)]),
+    }
+    projection = get_projection(SEMIS_BRACKET, points,
+                                knockout_rounds=[[semi]],
+                                resolved_positions=resolved_positions)
+
+    result = projection.project(100, seed=1)
+
+    eq_(result['T00'], [1, 0, 0])
+    eq_(result['T07'], [1, 1, 0])
+    eq_(result['T01'], [1, 1, 1])
+
+
+def test_unscored_league_matches():
+    points = {'T00': 1, 'T01': 2, 'T02': 3, 'T03': 4, 'T04': 5}
+    bracket = [[[0, 1]]]
+
+    # T04 is last, but beats T03 in a league match still to be played
+    league_matches = [
+        build_match(0, ['T00', None, None, None]),
+        build_match(1, ['T03', 'T04', None, None]),
+    ]
+    projection = get_projection(bracket, points,
+                                league_matches=league_matches)
+    projection._league_points[4] = 3
+
+    result = projection.project(100, seed=1)
+
+    eq_(result['T00'], [1, 0])
+    eq_(result['T04'], [1, 1])
+    eq_(result['T01'], [0, 0])
+    eq_(result['T03'], [0, 0])
+
+
+def test_seed_repeatable():
+    points = {'T00': 9, 'T01': 8, 'T02': 7, 'T03': 6,
+              'T04': 5, 'T05': 4, 'T06': 3, 'T07': 2}
+    projection = get_projection(SEMIS_BRACKET, points)
+    for i in range(8):
+        projection._samples[i] = (0, 1, 2, 3)
+
+    first = projection.project(CHUNK_SIZE + 10, seed=42)
+    second = projection.project(CHUNK_SIZE + 10, seed=42, processes=2)
+
+    eq_(first, second)
+
+
+def test_no_simulations():
+    points = {'T00': 9, 'T01': 8, 'T02': 7, 'T03': 6}
+    projection = get_projection([[[0, 1, 2, 3]]], points)
+
+    eq_(projection.project(0), {tla: [0, 0] for tla in sorted(points)})
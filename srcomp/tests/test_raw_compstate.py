@@ -1,10 +1,17 @@
 
 import os.path
+import shutil
 import subprocess
+import tempfile
+import time
+
+import mock
+from nose.tools import eq_
 
 from sr.comp.comp import SRComp
 from sr.comp.match_period import Match, MatchType
-from sr.comp.raw_compstate import RawCompstate
+from sr.comp.raw_compstate import batch_commit_message, RawCompstate, \
+    ScoreBatch, UPDATE_FILE
 
 
 DUMMY_PATH = os.path.dirname(os.path.abspath(__file__)) + '/dummy'
@@ -137,3 +144,202 @@ def test_git_converts_error():
     else:
         msg = "Should have errored about bad command (returned '{0}').".format(output)
         raise AssertionError(msg)
+
+
+class TempRepo(object):
+    """A git repository with a commit on each of two branches."""
+
+    def __enter__(self):
+        self.path = tempfile.mkdtemp()
+        self.git('init', '-q')
+        self.git('config', 'user.name', 'Test')
+        self.git('config', 'user.email', 'test@example.com')
+        self.base = self.commit('base')
+        self.git('checkout', '-q', '-b', 'other')
+        self.other = self.commit('other')
+        self.git('checkout', '-q', '-')
+        self.head = self.commit('head')
+        return self
+
+    def __exit__(self, *args):
+        shutil.rmtree(self.path)
+
+    def git(self, *args):
+        return subprocess.check_output(('git',) + args, cwd=self.path) \
+                         .decode('utf-8').strip()
+
+    def commit(self, message):
+        self.git('commit', '-q', '--allow-empty', '-m', message)
+        return self.git('rev-parse', 'HEAD')
+
+
+def test_rev_parse():
+    with TempRepo() as repo:
+        state = RawCompstate(repo.path, local_only=True)
+        eq_(state.rev_parse('HEAD'), repo.head)
+        eq_(state.rev_parse('HEAD^'), repo.base)
+        eq_(state.rev_parse(repo.other[:8]), repo.other)
+        state.close()
+
+
+def test_rev_parse_unknown():
+    with TempRepo() as repo:
+        state = RawCompstate(repo.path, local_only=True)
+        try:
+            state.rev_parse('bees')
+        except RuntimeError as re:
+            assert 'bees' in str(re)
+        else:
+            raise AssertionError("Should have errored about unknown revision.")
+        finally:
+            state.close()
+
+
+def test_git_error_includes_output():
+    with TempRepo() as repo:
+        state = RawCompstate(repo.path, local_only=True)
+        try:
+            state.push('nonexistent-remote', 'HEAD', err_msg="Push failed.",
+                       return_output=True)
+        except RuntimeError as re:
+            assert "Push failed." in str(re)
+            assert "nonexistent-remote" in str(re), str(re)
+        else:
+            raise AssertionError("Should have errored about the push.")
+
+
+def test_has_commit():
+    with TempRepo() as repo:
+        state = RawCompstate(repo.path, local_only=True)
+        assert state.has_commit(repo.other)
+        assert not state.has_commit('0' * 40)
+        assert not state.has_commit('HEAD^{tree}')
+        state.close()
+
+
+def test_has_ancestor_and_descendant():
+    with TempRepo() as repo:
+        state = RawCompstate(repo.path, local_only=True)
+
+        # Matches whether 'git rev-list' finds commits between the two
+        for commit in (repo.base, repo.head, repo.other):
+            eq_(state.has_ancestor(commit),
+                bool(repo.git('rev-list', '{0}..HEAD'.format(commit))))
+            eq_(state.has_descendant(commit),
+                bool(repo.git('rev-list', 'HEAD..{0}'.format(commit))))
+
+        assert state.has_ancestor(repo.base)
+        assert not state.has_descendant(repo.base)
+        assert not state.has_ancestor('0' * 40)
+        assert not state.has_descendant('0' * 40)
+        state.close()
+
+
+def test_has_ancestor_and_descendant_long_history():
+    # Beyond a short walk, git answers the question instead
+    with mock.patch('sr.comp.raw_compstate.MAX_HISTORY_WALK', 1):
+        test_has_ancestor_and_descendant()
+
+
+def test_sees_new_commits():
+    with TempRepo() as repo:
+        state = RawCompstate(repo.path, local_only=True)
+        eq_(state.rev_parse('HEAD'), repo.head)
+
+        state.commit('new', allow_empty=True)
+        eq_(state.rev_parse('HEAD^'), repo.head)
+        assert state.has_ancestor(repo.head)
+        state.close()
+
+
+def build_score(match):
+    return {'arena_id': match.arena, 'match_number': match.num,
+            'teams': {}}
+
+
+def test_batch_commit_message():
+    matches = [build_match(1, 'A', type_=MatchType.league),
+               build_match(2, 'B', type_=MatchType.league)]
+
+    eq_(batch_commit_message(matches[:1]),
+        "Update scores for League match 1 in arena A")
+    eq_(batch_commit_message(matches).splitlines(),
+        ["Update scores for 2 matches", "",
+         "- League match 1 in arena A", "- League match 2 in arena B"])
+
+
+def test_score_batch():
+    with TempRepo() as repo:
+        state = RawCompstate(repo.path, local_only=True)
+        matches = [build_match(num, 'A', type_=MatchType.league)
+                   for num in range(3)]
+
+        with state.score_batch(window=60) as batch:
+            for match in matches:
+                batch.save_score(match, build_score(match))
+            eq_(state.rev_parse('HEAD'), repo.head)
+            assert not os.path.exists(os.path.join(repo.path, UPDATE_FILE))
+
+        eq_(state.rev_parse('HEAD^'), repo.head)
+        eq_(repo.git('show', '--name-only', '--format=', 'HEAD').split(),
+            ['league/A/000.yaml', 'league/A/001.yaml', 'league/A/002.yaml'])
+        assert os.path.exists(os.path.join(repo.path, UPDATE_FILE))
+        state.close()
+
+
+def test_score_batch_window():
+    with TempRepo() as repo:
+        state = RawCompstate(repo.path, local_only=True)
+        batch = state.score_batch(window=0.05)
+        match = build_match(1, 'A', type_=MatchType.league)
+        batch.save_score(match, build_score(match))
+
+        deadline = time.time() + 5
+        while state.rev_parse('HEAD') == repo.head and time.time() < deadline:
+            time.sleep(0.05)
+
+        eq_(state.rev_parse('HEAD^'), repo.head)
+        batch.flush()
+        eq_(state.rev_parse('HEAD^'), repo.head)
+        state.close()
+
+
+def test_score_batch_no_window():
+    with TempRepo() as repo:
+        state = RawCompstate(repo.path, local_only=True)
+        batch = state.score_batch(window=0)
+        for num in range(2):
+            match = build_match(num, 'A', type_=MatchType.league)
+            batch.save_score(match, build_score(match))
+
+        eq_(state.rev_parse('HEAD~2'), repo.head)
+        state.close()
+
+
+def test_score_batch_retries_after_failure():
+    compstate = mock.Mock()
+    compstate.commit.side_effect = [RuntimeError("Git commit failed."), None]
+    compstate.push_changes.side_effect = [RuntimeError("Git push failed."),
+                                          None]
+    batch = ScoreBatch(compstate, window=60)
+    matches = [build_match(num, 'A', type_=MatchType.league)
+               for num in range(2)]
+    for match in matches:
+        batch.save_score(match, build_score(match))
+
+    for _ in range(2):
+        try:
+            batch.flush()
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("Should have failed to commit and push.")
+        assert not compstate.touch_update_file.called
+
+    batch.flush()
+    batch.flush()
+
+    eq_(compstate.commit.call_count, 2)
+    eq_(compstate.commit.call_args[0][0], batch_commit_message(matches))
+    eq_(compstate.push_changes.call_count, 2)
+    eq_(compstate.touch_update_file.call_count, 1)
@@ -0,0 +1,119 @@
+from collections import OrderedDict
+import pickle
+
+from nose.tools import eq_, raises
+
+from sr.comp.match_period import MatchType
+from sr.comp.score_table import ScoreRow, ScoreTable, mean
+
+
+def build_table():
+    rows = [
+        (MatchType.league, 'A', 0, 'ABC', 4, 6, 2, False),
+        (MatchType.league, 'A', 0, 'DEF', 9, 8, 1, False),
+        (MatchType.league, 'B', 0, 'GHI', 0, 0, 3, True),
+        (MatchType.league, 'A', 1, 'ABC', 7, 8, 1, False),
+        (MatchType.league, 'A', 1, 'GHI', 1, 6, 2, False),
+        (MatchType.knockout, 'A', 2, 'ABC', 3, 8, 1, False),
+    ]
+    columns = OrderedDict((name, list(values))
+                          for name, values in zip(ScoreRow._fields,
+                                                  zip(*rows)))
+    return ScoreTable(columns)
+
+
+def test_len():
+    eq_(len(build_table()), 6)
+
+
+def test_select_indexed():
+    table = build_table()
+    rows = table.select(team='GHI')
+    eq_(rows, [
+        ScoreRow(MatchType.league, 'B', 0, 'GHI', 0, 0, 3, True),
+        ScoreRow(MatchType.league, 'A', 1, 'GHI', 1, 6, 2, False),
+    ])
+
+
+def test_select_several():
+    table = build_table()
+    rows = table.select(team='ABC', arena='A', type=MatchType.league)
+    eq_([row.num for row in rows], [0, 1])
+
+
+def test_select_unindexed():
+    table = build_table()
+    rows = table.select(disqualified=True)
+    eq_([row.team for row in rows], ['GHI'])
+
+
+def test_select_missing():
+    table = build_table()
+    eq_(table.select(team='XYZ'), [])
+    eq_(table.select(team='ABC', arena='C'), [])
+
+
+@raises(ValueError)
+def test_select_unknown_column():
+    build_table().select(colour='red')
+
+
+def test_values():
+    table = build_table()
+    eq_(table.values('game_points', team='ABC'), [4, 7, 3])
+
+
+def test_aggregate():
+    table = build_table()
+    totals = table.aggregate('league_points', by='team',
+                             type=MatchType.league)
+    eq_(totals, {'ABC': 14, 'DEF': 8, 'GHI': 6})
+    eq_(list(totals.keys()), ['ABC', 'DEF', 'GHI'])
+
+
+def test_aggregate_mean_by_several():
+    table = build_table()
+    means = table.aggregate('game_points', by=('type', 'arena'),
+                            function=mean)
+    eq_(means, {
+        (MatchType.league, 'A'): 5.25,
+        (MatchType.league, 'B'): 0,
+        (MatchType.knockout, 'A'): 3,
+    })
+
+
+def test_concat():
+    table = build_table()
+    both = ScoreTable.concat([table, table])
+    eq_(len(both), 12)
+    eq_(both.values('num', team='DEF'), [0, 0])
+
+
+def test_pickle():
+    table = build_table()
+    loaded = pickle.loads(pickle.dumps(table, pickle.HIGHEST_PROTOCOL))
+    eq_(list(loaded), list(table))
+    eq_(loaded.select(team='ABC'), table.select(team='ABC'))
+
+
+def test_to_columns():
+    columns = build_table().to_columns()
+    eq_(list(columns.keys()), list(ScoreRow._fields))
+    eq_(columns['type'], ['league'] * 5 + ['knockout'])
+    eq_(columns['team'], ['ABC', 'DEF', 'GHI', 'ABC', 'GHI', 'ABC'])
+
+
+def test_write_csv():
+    try:
+        from StringIO import StringIO
+    except ImportError:
+        from io import StringIO
+
+    stream = StringIO()
+    build_table().write_csv(stream)
+
+    lines = stream.getvalue().splitlines()
+    eq_(lines[0], 'type,arena,num,team,game_points,league_points,position,'
+                  'disqualified')
+    eq_(lines[3], 'league,B,0,GHI,0,0,3,True')
+    eq_(len(lines), 7)
@@ -63,8 +63,16 @@ def get_scheduler(matches = None, positions = None, \
         positions['III'] = 9
         positions['JJJ'] = 10
 
+    def count_unscored_league_matches(league_scores):
+        return len([m for slot in matches for m in slot.values()
+                    if m.type == MatchType.league
+                    and (m.arena, m.num) not in league_scores.game_points])
+
     league_schedule = mock.Mock(matches = matches, delays = delays, \
-                                match_duration = match_duration)
+                                match_duration = match_duration,
+                                unscored_league_matches = None,
+                                count_unscored_league_matches = \
+                                    count_unscored_league_matches)
     league_scores = mock.Mock(positions = positions, game_points = league_game_points)
     knockout_scores = mock.Mock(resolved_positions = knockout_positions)
     scores = mock.Mock(league = league_scores, knockout = knockout_scores)
@@ -175,3 +183,18 @@ def test_partial_2():
                 ('DDD', 4)
             ])
     })
+
+def test_get_bracket():
+    scheduler = get_scheduler()
+    bracket = scheduler.get_bracket()
+
+    assert bracket == [
+        [[2, 4, 7, 9], [3, 5, 6, 8]],
+        [[1, (0, 0, 0), (0, 0, 2), (0, 1, 1)],
+         [0, (0, 0, 1), (0, 1, 0), (0, 1, 2)]],
+        [[(1, 0, 0), (1, 0, 1), (1, 1, 0), (1, 1, 1)]],
+    ], bracket
+
+def test_get_seeded_teams():
+    scheduler = get_scheduler()
+    assert scheduler.get_seeded_teams(['AAA', 'BBB']) == ['AAA', 'BBB']
@@ -113,3 +113,7 @@ def test_rich_comparisons_both_differ():
     ts1 = TeamScore(game = 25, league = 4)
     # Only care about league points really -- game are tie-break only
     assert_rich_comparisons(ts1, ts2)
+
+def test_no_dict():
+    ts = TeamScore(game = 5, league = 4)
+    assert not hasattr(ts, '__dict__')
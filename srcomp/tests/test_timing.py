@@ -0,0 +1,47 @@
+import contextlib
+
+from nose.tools import eq_, raises
+
+from sr.comp.timing import PhaseTimer
+
+
+def test_records_phases_in_order():
+    timer = PhaseTimer()
+    with timer.phase('b'):
+        pass
+    with timer.phase('a'):
+        pass
+
+    eq_(list(timer.durations.keys()), ['b', 'a'])
+    assert all(d >= 0 for d in timer.durations.values()), timer.durations
+
+@raises(ValueError)
+def test_records_failed_phase():
+    timer = PhaseTimer()
+    try:
+        with timer.phase('fails'):
+            raise ValueError()
+    finally:
+        assert 'fails' in timer.durations
+
+def test_hooks():
+    events = []
+
+    def make_hook(hook_name):
+        @contextlib.contextmanager
+        def hook(name):
+            events.append((hook_name, 'enter', name))
+            yield
+            events.append((hook_name, 'exit', name))
+        return hook
+
+    timer = PhaseTimer([make_hook('first'), make_hook('second')])
+    with timer.phase('a'):
+        events.append('phase')
+
+    eq_(events, [('first', 'enter', 'a'),
+                 ('second', 'enter', 'a'),
+                 'phase',
+                 ('second', 'exit', 'a'),
+                 ('first', 'exit', 'a')])
+    assert 'a' in timer.durations
@@ -12,7 +12,7 @@ except ImportError:
 from sr.comp.comp import SRComp
 from sr.comp.validation import validate, validate_match, validate_schedule_arenas, \
     validate_schedule_timings, validate_match_score, find_missing_scores, \
-    find_teams_without_league_matches
+    find_teams_without_league_matches, find_problems, Finding, Severity
 
 from sr.comp.knockout_scheduler import UNKNOWABLE_TEAM
 from sr.comp.match_period import MatchType
@@ -22,6 +22,7 @@ Match = namedtuple("Match", ["teams"])
 Match2 = namedtuple("Match2", ["num", "start_time"])
 Match3 = namedtuple('Match3', ['num', 'type'])
 Match4 = namedtuple('Match4', ['teams', 'type'])
+Match5 = namedtuple('Match5', ['num', 'teams', 'start_time', 'type'])
 
 
 def test_dummy_is_valid():
@@ -450,3 +451,79 @@ def test_teams_without_matches_err():
 
     teams = find_teams_without_league_matches(bad_matches, teams_a + teams_b + other_teams)
     assert set(other_teams) == teams, "Should have found teams without league matches"
+
+
+def build_problem_comp(league_points):
+    time = datetime(2014, 4, 26, 13, 0)
+    duration = timedelta(minutes=5)
+    matches = [
+        {'A': Match5(0, ['ABC', 'DEF'], time, MatchType.league),
+         'B': Match5(0, ['GHI', 'JKL'], time, MatchType.league)},
+        {'A': Match5(1, ['ABC', 'GHI'], time + duration, MatchType.league),
+         'C': Match5(1, ['DEF', 'JKL'], time + duration, MatchType.league)},
+    ]
+    schedule = mock.Mock(matches=matches, match_duration=duration,
+                         n_planned_league_matches=2, n_league_matches=2)
+
+    def no_scores():
+        return mock.Mock(game_points={}, ranked_points={},
+                         last_scored_match=None)
+
+    league = mock.Mock(game_points=league_points, ranked_points=league_points,
+                       last_scored_match=max(num for _, num in league_points))
+    scores = mock.Mock(league=league, knockout=no_scores(),
+                       tiebreaker=no_scores())
+
+    teams = dict.fromkeys(['ABC', 'DEF', 'GHI', 'JKL', 'MNO'])
+    arenas = dict.fromkeys(['A', 'B'])
+    return mock.Mock(schedule=schedule, scores=scores, teams=teams,
+                     arenas=arenas)
+
+
+def test_find_problems():
+    league_points = {
+        ('A', 0): {'ABC': 1, 'DEF': 2},
+        ('A', 1): {'ABC': 1, 'JKL': 2},
+    }
+    comp = build_problem_comp(league_points)
+
+    findings = find_problems(comp)
+
+    expected = [
+        Finding(Severity.error, 'Schedule', 'arenas',
+                "Match 1 (MatchType.league) references arena 'C'."),
+        Finding(Severity.error, 'Team', 'MNO', "Has no league matches."),
+        Finding(Severity.warning, 'League Match', 0,
+                "Scores missing for arenas B."),
+        Finding(Severity.warning, 'League Match', 1,
+                "Scores missing for arenas C."),
+    ]
+    errors = [f for f in findings if f.type in ('Game Score', 'League Points')]
+    assert set(findings) - set(errors) == set(expected), findings
+    assert set(f.id for f in errors) == set([('A', 1)]), errors
+    assert len(errors) == 4, errors
+
+
+def test_find_problems_counts_errors():
+    league_points = {('A', 0): {'ABC': 1, 'DEF': 2}}
+    comp = build_problem_comp(league_points)
+
+    fake_stderr = StringIO()
+    with mock.patch("sys.stderr", fake_stderr):
+        error_count = validate(comp)
+
+    assert error_count == 2, fake_stderr.getvalue()
+    output = fake_stderr.getvalue()
+    assert "Team MNO has the following errors:" in output, output
+    assert "League Match 0 has the following warnings:" in output, output
+
+
+def test_finding_as_dict():
+    finding = Finding(Severity.warning, 'Game Score', ('A', 3), 'Bees.')
+    assert finding.as_dict() == {'severity': 'warning', 'type': 'Game Score',
+                                 'id': ['A', 3], 'message': 'Bees.'}
+
+
+def test_finding_from_dict():
+    finding = Finding(Severity.error, 'Game Score', ('A', 3), 'Bees.')
+    assert Finding.from_dict(finding.as_dict()) == finding
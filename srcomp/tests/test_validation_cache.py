@@ -0,0 +1,200 @@
+import os.path
+import shutil
+import tempfile
+
+import mock
+from nose.tools import eq_
+
+from sr.comp.validation import Finding, Severity
+from sr.comp.validation_cache import CACHE_SIZE, classify_changes, \
+    DELAYS, LEAGUE_SCORES, revalidate, ValidationCache, VENUE
+
+
+SCHEDULE = '''
+delays:
+- delay: 15
+  time: 2014-04-26 13:02:00+01:00
+match_slot_lengths:
+  total: 300
+'''
+
+TEAMS = '''
+teams:
+  AAA: {name: Team AAA, rookie: false}
+  BBB: {name: Team BBB, rookie: false}
+  CCC: {name: Team CCC, rookie: false}
+  DDD: {name: Team DDD, rookie: false}
+'''
+
+ARENAS = '''
+arenas:
+  A: {display_name: Arena A}
+corners: {}
+'''
+
+LEAGUE = '''
+matches:
+  0:
+    A: [AAA, BBB, CCC, DDD]
+  1:
+    A: [DDD, CCC, BBB, AAA]
+'''
+
+FULL_SCHEDULE = '''
+delays:
+- delay: 15
+  time: 2014-04-26 13:02:00+01:00
+knockout:
+  final_delay: 300
+  round_spacing: 300
+  single_arena: {arenas: [A], rounds: 3}
+league: {extra_spacing: []}
+match_periods:
+  knockout:
+  - description: Knockouts
+    start_time: {knockout_start}
+    end_time: 2014-04-26 17:00:00+01:00
+  league:
+  - description: League
+    start_time: 2014-04-26 13:00:00+01:00
+    end_time: 2014-04-26 14:00:00+01:00
+match_slot_lengths: {match: 180, post: 60, pre: 60, total: 300}
+staging:
+  closes: 120
+  duration: 180
+  opens: 300
+  signal_shepherds: {}
+  signal_teams: 240
+'''
+
+FINDINGS = [
+    Finding(Severity.error, 'Game Score', ('A', 3), 'Bees.'),
+    Finding(Severity.warning, 'League Match', 2, 'Wasps.'),
+]
+
+
+class CompstateDir(object):
+    def __enter__(self):
+        self.path = tempfile.mkdtemp()
+        return self
+
+    def __exit__(self, *args):
+        shutil.rmtree(self.path)
+
+    def write(self, name, content=''):
+        path = os.path.join(self.path, name)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def compstate(self, old_schedule=SCHEDULE):
+        return mock.Mock(path=self.path,
+                         show_file=mock.Mock(return_value=old_schedule))
+
+
+def test_cache_round_trip():
+    with CompstateDir() as d:
+        path = os.path.join(d.path, 'cache.json')
+        ValidationCache(path).store('abc', FINDINGS)
+
+        cache = ValidationCache(path)
+        eq_(cache.get('abc'), FINDINGS)
+        eq_(cache.get('def'), None)
+        eq_(cache.latest, 'abc')
+
+
+def test_cache_limited():
+    with CompstateDir() as d:
+        path = os.path.join(d.path, 'cache.json')
+        cache = ValidationCache(path)
+        for i in range(CACHE_SIZE + 1):
+            cache.store(str(i), [])
+
+        cache = ValidationCache(path)
+        eq_(cache.get('0'), None)
+        eq_(cache.get('1'), [])
+        eq_(cache.latest, str(CACHE_SIZE))
+
+
+def test_cache_corrupt():
+    with CompstateDir() as d:
+        d.write('cache.json', '{bees')
+        eq_(ValidationCache(os.path.join(d.path, 'cache.json')).latest, None)
+
+
+def test_classify_league_scores():
+    with CompstateDir() as d:
+        rules = classify_changes(d.compstate(), 'abc',
+                                 ['league/A/003.yaml', 'deployments.yaml'])
+        eq_(rules, set([LEAGUE_SCORES]))
+
+
+def test_classify_league_scores_with_knockouts():
+    with CompstateDir() as d:
+        d.write('knockout/A/100.yaml')
+        rules = classify_changes(d.compstate(), 'abc', ['league/A/003.yaml'])
+        eq_(rules, None)
+
+
+def test_classify_delays():
+    with CompstateDir() as d:
+        d.write('schedule.yaml', SCHEDULE.replace('delay: 15', 'delay: 45'))
+        rules = classify_changes(d.compstate(), 'abc',
+                                 ['schedule.yaml', 'layout.yaml'])
+        eq_(rules, set([DELAYS, VENUE]))
+
+
+def test_classify_schedule():
+    with CompstateDir() as d:
+        d.write('schedule.yaml', SCHEDULE.replace('total: 300', 'total: 360'))
+        rules = classify_changes(d.compstate(), 'abc', ['schedule.yaml'])
+        eq_(rules, None)
+
+
+def test_classify_other():
+    with CompstateDir() as d:
+        eq_(classify_changes(d.compstate(), 'abc', ['teams.yaml']), None)
+        eq_(classify_changes(d.compstate(), 'abc', ['knockout/A/100.yaml']),
+            None)
+
+
+def test_revalidate_nothing():
+    eq_(revalidate('/nonexistent', FINDINGS, set(), []), FINDINGS)
+
+
+def write_compstate(d, knockout_start):
+    d.write('teams.yaml', TEAMS)
+    d.write('arenas.yaml', ARENAS)
+    d.write('league.yaml', LEAGUE)
+    d.write('schedule.yaml',
+            FULL_SCHEDULE.replace('{knockout_start}', knockout_start))
+
+
+def test_revalidate_delays_checks_knockout_timing():
+    with CompstateDir() as d:
+        # The knockouts overlap the league
+        write_compstate(d, '2014-04-26 13:00:00+01:00')
+        findings = revalidate(d.path, FINDINGS, set([DELAYS]),
+                              ['schedule.yaml'])
+
+        timing = [f for f in findings if f.type == 'Schedule']
+        assert timing, findings
+        assert all(f.severity == Severity.error for f in timing), timing
+        assert FINDINGS[0] in findings, findings
+
+
+def test_revalidate_delays_fixed():
+    with CompstateDir() as d:
+        write_compstate(d, '2014-04-26 15:00:00+01:00')
+        old = FINDINGS + [Finding(Severity.error, 'Schedule', 'timing',
+                                  'Overlap.')]
+        findings = revalidate(d.path, old, set([DELAYS]), ['schedule.yaml'])
+        eq_(findings, FINDINGS)
+
+
+def test_classify_delays_with_knockouts():
+    with CompstateDir() as d:
+        d.write('knockout/A/2.yaml')
+        d.write('schedule.yaml', SCHEDULE.replace('delay: 15', 'delay: 45'))
+        eq_(classify_changes(d.compstate(), 'abc', ['schedule.yaml']), None)